@@ -1,8 +1,64 @@
+import sys
+
 import numpy as np
 from rasterio.features import rasterize
 from shapely.geometry import Point as sPoint
 from shapely.geometry import Polygon as sPolygon
 
+from .cache import LRUCache, nbytes
+from .wrappers.buffers import write_out
+
+
+# Default size of mask_cache
+DEFAULT_MASK_CACHE_MB = 64
+
+
+def _mask_cache_size(value):
+    # Masks are counted by their bytes and (window, coordinates) entries
+    # by the python objects holding the polygon's vertices
+    if not isinstance(value, tuple):
+        return nbytes(value)
+
+    _, coordinates = value
+    size = sys.getsizeof(value)
+    if coordinates is not None:
+        size += sys.getsizeof(coordinates) + sum(
+            sys.getsizeof(vertex) + sum(sys.getsizeof(v) for v in vertex)
+            for vertex in coordinates)
+    return size
+
+
+# Windows and boolean masks of polygons keyed by (geometry, raster grid),
+# shared by every layer and time step on the same grid.
+mask_cache = LRUCache(DEFAULT_MASK_CACHE_MB * 1024 * 1024,
+                      sizeof=_mask_cache_size)
+
+# Recent subset() results keyed by (annotation, data, arguments).  It is
+# disabled (has a capacity of 0) unless 'subset_cache_mb' is set in the
+# [wrappers] section of geonotebook.ini
+subset_cache = LRUCache(0)
+
+
+def grid_key(raster_data):
+    """Return a hashable key for the pixel grid of raster_data.
+
+    Returns None if the reader doesn't expose its transform,  results
+    for such data are not cached.
+    """
+    rd = raster_data[0] if hasattr(raster_data, '_items') else raster_data
+    affine = getattr(rd.reader, 'affine', None)
+    if affine is None:
+        return None
+    return tuple(affine), rd.reader.height, rd.reader.width
+
+
+def _data_key(raster_data):
+    if hasattr(raster_data, '_items'):
+        uris = tuple(rd.uri for rd in raster_data)
+    else:
+        uris = (raster_data.uri,)
+    return uris, tuple(raster_data.band_indexes)
+
 
 class Annotation(object):
     def __init__(self, *args, **kwargs):
@@ -45,6 +101,38 @@ class Annotation(object):
     def _get_layer_collection(self):
         return self.layer.layer_collection if self.layer is not None else []
 
+    def _subset_key(self, raster_data, kwargs):
+        # None if the result shouldn't be cached
+        if not subset_cache.capacity or kwargs.get('out') is not None:
+            return None
+
+        try:
+            key = (type(self), self.wkb, _data_key(raster_data),
+                   tuple(sorted(kwargs.items())))
+            hash(key)
+        except (AttributeError, TypeError):
+            return None
+        return key
+
+    def _cached_subset(self, raster_data, subset, kwargs):
+        # Return subset(raster_data, **kwargs) from subset_cache if we can.
+        # Cached results are shared,  they must not be modified.
+        key = self._subset_key(raster_data, kwargs)
+        if key is None:
+            return subset(raster_data, **kwargs)
+
+        result = subset_cache.get(key)
+        if result is None:
+            result = subset_cache.put(key, subset(raster_data, **kwargs))
+        return result
+
+    def get_bounds_window(self, raster_data, bounds):
+        # Window of the pixels covering bounds,  both corners are
+        # transformed with a single call to index()
+        rows, cols = raster_data.index([bounds[0], bounds[2]],
+                                       [bounds[1], bounds[3]])
+        return self.get_data_window(rows[0], cols[0], rows[1], cols[1])
+
     def get_data_window(self, minx, miny, maxx, maxy):
         return ((
             int(min(minx, maxx)),
@@ -75,9 +163,10 @@ class Rectangle(Annotation, sPolygon):
         super(Rectangle, self).__init__(coordinates, holes, **kwargs)
 
     def subset(self, raster_data, **kwargs):
-        ul = raster_data.index(self.bounds[0], self.bounds[1])
-        lr = raster_data.index(self.bounds[2], self.bounds[3])
-        window = self.get_data_window(ul[0], ul[1], lr[0], lr[1])
+        return self._cached_subset(raster_data, self._subset, kwargs)
+
+    def _subset(self, raster_data, **kwargs):
+        window = self.get_bounds_window(raster_data, self.bounds)
 
         # TODO: Trim window to valid range for raster data if out of bounds
 
@@ -89,24 +178,65 @@ class Polygon(Annotation, sPolygon):
         super(Polygon, self).__init__(coordinates, holes, **kwargs)
 
     def subset(self, raster_data, **kwargs):
+        return self._cached_subset(raster_data, self._subset, kwargs)
+
+    def _window(self, raster_data):
+        """Return (window, coordinates) of the polygon on raster_data.
+
+        coordinates are the pixel coordinates of the polygon clipped to
+        the data,  relative to window.  They are None if the polygon is
+        completely outside the data.
+        """
         # It is possible our user has drawn a polygon where part of the
         # shape is outside the dataset,  intersect with the rasterdata
         # shape to make sure we don't try to select/mask data that is
         # outside the bounds of our dataset.
         clipped = self.intersection(raster_data.shape)
 
-        # Polygon is completely outside the dataset, return whatever
-        # would have been returned by get_data()
+        window = self.get_bounds_window(
+            raster_data, clipped.bounds if bool(clipped) else self.bounds)
+
         if not bool(clipped):
-            ul = raster_data.index(self.bounds[0], self.bounds[1])
-            lr = raster_data.index(self.bounds[2], self.bounds[3])
-            window = self.get_data_window(ul[0], ul[1], lr[0], lr[1])
+            return window, None
 
-            return raster_data.get_data(window=window, **kwargs)
+        # All the vertices are transformed at once
+        xs, ys = np.asarray(clipped.exterior.coords)[:, :2].T
+        rows, cols = raster_data.index(xs, ys)
+        coordinates = list(zip(
+            (np.asarray(cols) - window[0][1]).tolist(),
+            (np.asarray(rows) - window[0][0]).tolist()))
+
+        return window, coordinates
 
-        ul = raster_data.index(clipped.bounds[0], clipped.bounds[1])
-        lr = raster_data.index(clipped.bounds[2], clipped.bounds[3])
-        window = self.get_data_window(ul[0], ul[1], lr[0], lr[1])
+    def _mask(self, coordinates, out_shape):
+        # Boolean (rows, cols) mask that is True outside the polygon
+        mask = rasterize(
+            [({'type': 'Polygon',
+               'coordinates': [coordinates]}, 0)],
+            out_shape=out_shape, fill=1, all_touched=True, dtype=np.uint8)
+        mask = mask.view(bool)
+
+        # Masks are shared through mask_cache
+        mask.flags.writeable = False
+        return mask
+
+    def _subset(self, raster_data, **kwargs):
+        # Windows and masks only depend on the polygon and the grid,  so
+        # they are shared by every layer and time step on the same grid
+        grid = grid_key(raster_data)
+        key = None if grid is None else (self.wkb, grid)
+
+        window_and_coords = None if key is None else mask_cache.get(key)
+        if window_and_coords is None:
+            window_and_coords = self._window(raster_data)
+            if key is not None:
+                mask_cache.put(key, window_and_coords)
+        window, coordinates = window_and_coords
+
+        # Polygon is completely outside the dataset, return whatever
+        # would have been returned by get_data()
+        if coordinates is None:
+            return raster_data.get_data(window=window, **kwargs)
 
         data = raster_data.get_data(window=window, **kwargs)
 
@@ -123,27 +253,34 @@ class Polygon(Annotation, sPolygon):
         else:
             out_shape = data.shape[-2], data.shape[-1]
 
-        coordinates = []
-        for lat, lon in clipped.exterior.coords:
-            x, y = raster_data.index(lat, lon)
-            coordinates.append((y - window[0][1], x - window[0][0]))
-
-        # Mask the final polygon
-        mask = rasterize(
-            [({'type': 'Polygon',
-               'coordinates': [coordinates]}, 0)],
-            out_shape=out_shape, fill=1, all_touched=True, dtype=np.uint8)
-
-        # If we have more than one band,  expand the mask so it includes
-        # A "channel" dimension (e.g.  shape is now (lat, lon, channel))
+        mask = None if key is None else mask_cache.get(key + (out_shape,))
+        if mask is None:
+            # coordinates are in full resolution pixels of the window,  a
+            # decimated read (out_shape, resolution or downsample) needs
+            # them in its own pixels.
+            rows, cols = raster_data._window_shape(window)
+            if (rows, cols) != out_shape:
+                coordinates = [(x * out_shape[1] / float(cols),
+                                y * out_shape[0] / float(rows))
+                               for x, y in coordinates]
+            mask = self._mask(coordinates, out_shape)
+            if key is not None:
+                mask_cache.put(key + (out_shape,), mask)
+
+        # If we have more than one band,  add a "channel" dimension
+        # (e.g.  shape is now (lat, lon, 1)) so the mask broadcasts
+        # against data which may also have a time dimension
+        # (e.g.  shape could be (time, lat, lon),  or even
+        #  (time, lat, lon, channels)) without being copied.
         if num_bands > 1:
-            mask = mask[..., np.newaxis] * np.ones(num_bands)
+            mask = mask[..., np.newaxis]
 
-        # Finally broadcast mask to data because data may be from a
-        # Raster data collection and include a time component
-        # (e.g.  shape could be (time, lat, lon),  or even
-        #  (time, lat, lon, channels))
-        _, mask = np.broadcast_arrays(data, mask)
-        data[mask.astype(bool)] = raster_data.nodata
+        np.copyto(np.ma.getdata(data), raster_data.nodata,
+                  casting='unsafe', where=mask)
+
+        if kwargs.get('out') is None:
+            return np.ma.masked_equal(data, raster_data.nodata)
 
-        return np.ma.masked_equal(data, raster_data.nodata)
+        # data was read into an out= buffer,  mask it in place
+        return write_out(np.ma.masked_equal(data, raster_data.nodata,
+                                            copy=False), data)
@@ -0,0 +1,122 @@
+from collections import OrderedDict
+import sys
+import threading
+
+
+def nbytes(value):
+    """Return the approximate size of value in bytes."""
+    try:
+        return value.nbytes
+    except AttributeError:
+        pass
+
+    try:
+        return len(value)
+    except TypeError:
+        return sys.getsizeof(value)
+
+
+class LRUCache(object):
+    """A thread-safe least-recently-used cache with a byte budget.
+
+    Values are evicted, least recently used first, whenever the total
+    size of the cached values exceeds ``capacity`` bytes.  Values larger
+    than the whole budget are never stored.  Hit and miss counters are
+    kept so the budget can be sized against a real workload.
+    """
+
+    def __init__(self, capacity, sizeof=nbytes):
+        self._capacity = int(capacity)
+        self._sizeof = sizeof
+        self._items = OrderedDict()
+        self._lock = threading.RLock()
+
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @capacity.setter
+    def capacity(self, value):
+        with self._lock:
+            self._capacity = int(value)
+            self._evict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                size, value = self._items.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            # Re-insert so key becomes the most recently used item
+            self._items[key] = (size, value)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+
+        with self._lock:
+            self.pop(key)
+
+            if size > self._capacity:
+                return value
+
+            self._items[key] = (size, value)
+            self.nbytes += size
+            self._evict()
+
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            try:
+                size, value = self._items.pop(key)
+            except KeyError:
+                return default
+
+            self.nbytes -= size
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    @property
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'capacity': self._capacity,
+                'nbytes': self.nbytes,
+                'items': len(self._items),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': float(self.hits) / lookups if lookups else None
+            }
+
+    def _evict(self):
+        while self.nbytes > self._capacity and self._items:
+            _, (size, _) = self._items.popitem(last=False)
+            self.nbytes -= size
+            self.evictions += 1
@@ -55,6 +55,74 @@ class Config(object):
         except (AttributeError, configparser.NoOptionError):
             return logging.WARNING
 
+    def _get_size(self, section, option):
+        # Sizes are configured in megabytes, returns bytes or None if
+        # the option is not set.
+        try:
+            return int(float(self.config.get(section, option)) * 1024 * 1024)
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            return None
+
+    def _get_int(self, section, option):
+        try:
+            return self.config.getint(section, option)
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            return None
+
+    @property
+    def block_cache_size(self):
+        return self._get_size("wrappers", "block_cache_mb")
+
+    @property
+    def dataset_pool_size(self):
+        return self._get_int("wrappers", "dataset_pool_size")
+
+    @property
+    def max_read_size(self):
+        return self._get_size("wrappers", "max_read_mb")
+
+    @property
+    def downsample_large_reads(self):
+        try:
+            return self.config.getboolean("wrappers", "downsample_large_reads")
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            return None
+
+    @property
+    def scratch_dir(self):
+        try:
+            return os.path.expanduser(
+                self.config.get("wrappers", "scratch_dir"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            return None
+
+    @property
+    def read_executor(self):
+        try:
+            return self.config.get("wrappers", "read_executor")
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            return None
+
+    @property
+    def read_workers(self):
+        return self._get_int("wrappers", "read_workers")
+
+    @property
+    def mask_cache_size(self):
+        return self._get_size("wrappers", "mask_cache_mb")
+
+    @property
+    def subset_cache_size(self):
+        return self._get_size("wrappers", "subset_cache_mb")
+
+    @property
+    def prefetch_steps(self):
+        return self._get_int("layers", "prefetch_steps")
+
+    @property
+    def prefetch_workers(self):
+        return self._get_int("layers", "prefetch_workers")
+
     @property
     def vis_server(self):
         vis_server_section = self.config.get("default", "vis_server")
@@ -4,22 +4,26 @@ from types import MethodType
 from ipykernel.ipkernel import IPythonKernel
 from promise import Promise
 
+from . import annotations
 from . import jsonrpc
 from .config import Config
 from .jsonrpc import (is_request,
                       is_response,
                       json_rpc_request,
                       json_rpc_result)
-
 from .layers import (AnnotationLayer,
                      GeonotebookLayerCollection,
                      NoDataLayer,
+                     prefetch_executor,
                      SimpleLayer,
                      TimeSeriesLayer,
                      VectorLayer)
-
 from .utils import get_kernel_id
+from .wrappers import buffers
 from .wrappers import RasterData, RasterDataCollection, VectorData
+from .wrappers.executor import read_executor
+from .wrappers.file_reader import block_cache
+from .wrappers.pool import dataset_pool
 
 
 class Remote(object):
@@ -560,6 +564,9 @@ class GeonotebookKernel(IPythonKernel):
         config = Config()
         config.vis_server.shutdown_kernel(self)
 
+        read_executor.shutdown(wait=False)
+        dataset_pool.close_all()
+
         if restart:
             self.geonotebook = Geonotebook(self)
             self.shell.user_ns.update({'M': self.geonotebook})
@@ -572,6 +579,39 @@ class GeonotebookKernel(IPythonKernel):
         config = Config()
         self.log.setLevel(config.log_level)
 
+        if config.block_cache_size is not None:
+            block_cache.capacity = config.block_cache_size
+
+        if config.dataset_pool_size is not None:
+            dataset_pool.size = config.dataset_pool_size
+
+        if config.max_read_size is not None:
+            RasterData.max_read_bytes = config.max_read_size
+
+        if config.downsample_large_reads is not None:
+            RasterData.downsample_large_reads = config.downsample_large_reads
+
+        if config.scratch_dir is not None:
+            buffers.scratch_dir = config.scratch_dir
+
+        if config.read_executor is not None:
+            read_executor.kind = config.read_executor
+
+        if config.read_workers is not None:
+            read_executor.workers = config.read_workers
+
+        if config.mask_cache_size is not None:
+            annotations.mask_cache.capacity = config.mask_cache_size
+
+        if config.subset_cache_size is not None:
+            annotations.subset_cache.capacity = config.subset_cache_size
+
+        if config.prefetch_steps is not None:
+            TimeSeriesLayer.prefetch_steps = config.prefetch_steps
+
+        if config.prefetch_workers is not None:
+            prefetch_executor.workers = config.prefetch_workers
+
         config.vis_server.start_kernel(self)
 
     def __init__(self, **kwargs):
@@ -2,6 +2,7 @@ from collections import namedtuple
 from collections import OrderedDict
 
 import sys
+import threading
 
 import six
 
@@ -10,9 +11,16 @@ from .config import Config
 
 from .vis.utils import discrete_colors, RasterStyleOptions, \
     rgba2hex, VectorStyleOptions
+from .wrappers.executor import ReadExecutor
 
 BBox = namedtuple('BBox', ['ulx', 'uly', 'lrx', 'lry'])
 
+# Maximum number of time steps ingested in the background at once,
+# see TimeSeriesLayer.prefetch()
+DEFAULT_PREFETCH_WORKERS = 2
+
+prefetch_executor = ReadExecutor('thread', workers=DEFAULT_PREFETCH_WORKERS)
+
 
 class GeonotebookLayer(object):
     # Control whether or not a layer can be modified
@@ -252,18 +260,44 @@ class SimpleLayer(DataLayer):
 
 
 class TimeSeriesLayer(DataLayer):
+    # Number of time steps either side of the current one that are
+    # ingested in the background,  see prefetch()
+    prefetch_steps = 0
+
+    # Largest number of steps ingested by one background request
+    prefetch_batch = 32
+
+    # Tiles,  as (x, y, z) tuples,  rendered for each prefetched step if
+    # the vis server can warm its cache.  See vis.utils.tiles()
+    warm_tiles = None
+
     def __init__(self, name, remote, data, vis_url=None, **kwargs):
+        prefetch_steps = kwargs.pop('prefetch_steps', None)
+        if prefetch_steps is not None:
+            self.prefetch_steps = prefetch_steps
+
+        warm_tiles = kwargs.pop('warm_tiles', None)
+        if warm_tiles is not None:
+            self.warm_tiles = warm_tiles
+
         super(TimeSeriesLayer, self).__init__(
             name, remote, data=data, vis_url=None, **kwargs
         )
         self.__cur = 0
         self._vis_urls = [None] * len(data)
 
+        # Futures of the steps being ingested in the background,  and
+        # events set as soon as the url of each of them is known.  Guarded
+        # by _lock along with _vis_urls.
+        self._pending = {}
+        self._ready = {}
+        self._lock = threading.Lock()
+
         self._remote = remote
 
         if vis_url is None:
-            self._vis_urls[0] = self.config.vis_server.ingest(
-                self.current, name=self.name, **self.vis_options.serialize())
+            self._vis_urls[0] = self._ingest(0)
+            self.prefetch()
 
     def __repr__(self):
         return "<{}('{}')>".format(
@@ -271,14 +305,18 @@ class TimeSeriesLayer(DataLayer):
 
     @property
     def vis_url(self):
-        return self._vis_urls[self._cur]
+        with self._lock:
+            return self._vis_urls[self._cur]
 
-    @property
-    def name(self):
+    def _step_name(self, idx):
         return "{}_{}_{}".format(
-            self._name, self.current.name,
+            self._name, self.data[idx].name,
             hash(self.vis_options) + sys.maxsize + 1)
 
+    @property
+    def name(self):
+        return self._step_name(self._cur)
+
     @property
     def query_params(self):
         return self.config.vis_server.get_params(
@@ -288,6 +326,11 @@ class TimeSeriesLayer(DataLayer):
     def current(self):
         return self.data[self._cur]
 
+    def _ingest(self, idx):
+        return self.config.vis_server.ingest(
+            self.data[idx], name=self._step_name(idx),
+            **self.vis_options.serialize())
+
     @property
     def _cur(self):
         return self.__cur
@@ -302,9 +345,122 @@ class TimeSeriesLayer(DataLayer):
 
         self.__cur = value
 
-        if self._vis_urls[value] is None:
-            self._vis_urls[value] = self.config.vis_server.ingest(
-                self.current, name=self.name, **self.vis_options.serialize())
+        with self._lock:
+            vis_url = self._vis_urls[value]
+            future = self._pending.get(value)
+            ready = self._ready.get(value)
+            started = vis_url is None and future is not None and \
+                not self._cancel(future)
+
+        # Wait for a prefetch that has started rather than ingesting the
+        # step twice,  only until its url is known and not for the rest of
+        # its batch.  Ingest it here if the prefetch failed.
+        if started:
+            ready.wait()
+            with self._lock:
+                vis_url = self._vis_urls[value]
+
+        if vis_url is None:
+            vis_url = self._ingest(value)
+            with self._lock:
+                self._vis_urls[value] = vis_url
+
+        self.prefetch()
+
+    def _neighbours(self):
+        # Steps within prefetch_steps of the current one,  nearest first
+        # and the next step before the previous one.
+        steps = []
+        for offset in range(1, self.prefetch_steps + 1):
+            for idx in (self._cur + offset, self._cur - offset):
+                if 0 <= idx < len(self.data):
+                    steps.append(idx)
+        return steps
+
+    def _cancel(self, future):
+        # Cancel a prefetch that hasn't started,  call with _lock held
+        if not future.cancel():
+            return False
+
+        for idx in [i for i, f in self._pending.items() if f is future]:
+            del self._pending[idx]
+            self._ready.pop(idx).set()
+        return True
+
+    def prefetch(self, steps=None):
+        """Ingest time steps in the background.
+
+        By default these are the steps near the current one,  and queued
+        prefetches of steps that are no longer near it are cancelled.
+        Steps are ingested prefetch_batch at a time,  with one request if
+        the vis server supports it (see Ktile.ingest_many).  At most
+        prefetch_executor.workers batches are ingested at the same time.
+        If warm_tiles is set the tiles of each batch are rendered by a
+        task of their own once its urls are known.
+        """
+        with self._lock:
+            if steps is None:
+                steps = self._neighbours()
+                for future in set(self._pending.values()):
+                    if not any(self._pending.get(idx) is future
+                               for idx in steps):
+                        self._cancel(future)
+
+            missing = [idx for idx in steps if self._vis_urls[idx] is None and
+                       idx not in self._pending]
+
+            warm = self.warm_tiles and \
+                hasattr(self.config.vis_server, 'warm')
+
+            for start in range(0, len(missing), self.prefetch_batch):
+                batch = missing[start:start + self.prefetch_batch]
+                future = prefetch_executor.executor.submit(
+                    self._prefetch, batch)
+                for idx in batch:
+                    self._pending[idx] = future
+                    self._ready[idx] = threading.Event()
+
+                if warm:
+                    prefetch_executor.executor.submit(
+                        self._warm, batch,
+                        [self._ready[idx] for idx in batch])
+
+    def _set_vis_urls(self, steps, vis_urls):
+        # Record the urls of prefetched steps and wake anything waiting
+        # for them,  a url of None marks a step that failed.
+        with self._lock:
+            for idx, vis_url in zip(steps, vis_urls):
+                if vis_url is not None:
+                    self._vis_urls[idx] = vis_url
+                self._pending.pop(idx, None)
+                ready = self._ready.pop(idx, None)
+                if ready is not None:
+                    ready.set()
+
+    def _prefetch(self, steps):
+        try:
+            vis_server = self.config.vis_server
+            if len(steps) > 1 and hasattr(vis_server, 'ingest_many'):
+                self._set_vis_urls(steps, vis_server.ingest_many(
+                    [self.data[idx] for idx in steps],
+                    names=[self._step_name(idx) for idx in steps],
+                    **self.vis_options.serialize()))
+            else:
+                for idx in steps:
+                    self._set_vis_urls([idx], [self._ingest(idx)])
+        finally:
+            # Steps left after a failure
+            self._set_vis_urls(steps, [None] * len(steps))
+
+    def _warm(self, steps, ready):
+        # Render the warm_tiles of prefetched steps as their urls are known
+        for idx, event in zip(steps, ready):
+            event.wait()
+            with self._lock:
+                vis_url = self._vis_urls[idx]
+
+            if vis_url is not None:
+                self.config.vis_server.warm(vis_url, self.warm_tiles)
 
     def _replace_layer(self, idx):
         prev_name = self.name
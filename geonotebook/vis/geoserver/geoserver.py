@@ -177,7 +177,9 @@ class Geoserver(object):
 
         if name not in coverages:
             # Upload the file and convert it to a coveragestore etc
-            with open(data.reader.path, 'rb') as fh:
+            path = data.reader.spill() if hasattr(data.reader, 'spill') \
+                else data.reader.path
+            with open(path, 'rb') as fh:
                 uri = "/workspaces/{}/coveragestores/{}/file.geotiff"
                 self.c.put(uri.format(self.workspace, name),
                            params={"coverageName": name,
@@ -0,0 +1,120 @@
+from geonotebook.cache import LRUCache
+
+
+_missing = object()
+
+# Content-Type and url extension of the tiles of TileStache's formats
+FORMATS = {
+    'PNG': ('image/png', 'png'),
+    'JPEG': ('image/jpeg', 'jpg')
+}
+
+
+def tile_size(response):
+    """Return the approximate size of a (status, headers, content) tuple."""
+    _, headers, content = response
+    return len(content) + sum(len(k) + len(v) for k, v in headers.items())
+
+
+def _layer_stats(hits=0, misses=0):
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': float(hits) / lookups if lookups else None,
+        'nbytes': 0,
+        'items': 0
+    }
+
+
+class TileCache(LRUCache):
+    """An in-memory tier of rendered tiles in front of the TileStache cache.
+
+    Keys are (kernel_id, layer_name, z, x, y, extension) and values the
+    (status_code, headers, content) of the tile's response.  Layer names
+    include the hash of their style,  so a restyled layer never gets
+    stale tiles.  Hits and misses are counted for each layer as well as
+    for the whole tier.
+    """
+
+    def __init__(self, capacity):
+        super(TileCache, self).__init__(capacity, sizeof=tile_size)
+        self._layer_counts = {}
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = super(TileCache, self).get(key, _missing)
+
+            counts = self._layer_counts.setdefault(key[:2], [0, 0])
+            counts[value is _missing] += 1
+
+        return default if value is _missing else value
+
+    def layer_stats(self, kernel_id):
+        """Return hits, misses and memory use of each layer of a kernel."""
+        with self._lock:
+            stats = dict((layer, _layer_stats(hits, misses))
+                         for (kernel, layer), (hits, misses)
+                         in self._layer_counts.items()
+                         if kernel == kernel_id)
+
+            for key, (size, _) in self._items.items():
+                if key[0] == kernel_id:
+                    layer = stats.setdefault(key[1], _layer_stats())
+                    layer['nbytes'] += size
+                    layer['items'] += 1
+
+        return stats
+
+    def drop(self, kernel_id, layer_name=None):
+        """Remove the tiles of a kernel,  or of one of its layers."""
+        def dropped(key):
+            return key[0] == kernel_id and \
+                (layer_name is None or key[1] == layer_name)
+
+        with self._lock:
+            for key in [k for k in self._items if dropped(k)]:
+                self.pop(key)
+            for key in [k for k in self._layer_counts if dropped(k)]:
+                del self._layer_counts[key]
+
+
+class TierCache(object):
+    """A TileStache cache that also keeps the tiles it saves in a TileCache.
+
+    TileStache saves every tile cut from a metatile through its config's
+    cache,  keeping them in the in-memory tier as well makes requests for
+    the neighbours of a rendered tile hits.  Everything else is left to
+    the configured TileStache cache.
+    """
+
+    def __init__(self, cache, tile_cache, kernel_id):
+        self.cache = cache
+        self.tile_cache = tile_cache
+        self.kernel_id = kernel_id
+
+    def _key(self, layer, coord, format):
+        return (self.kernel_id, layer.name(), coord.zoom, coord.column,
+                coord.row, FORMATS[format][1])
+
+    def lock(self, layer, coord, format):
+        return self.cache.lock(layer, coord, format)
+
+    def unlock(self, layer, coord, format):
+        return self.cache.unlock(layer, coord, format)
+
+    def read(self, layer, coord, format):
+        return self.cache.read(layer, coord, format)
+
+    def remove(self, layer, coord, format):
+        if format in FORMATS:
+            self.tile_cache.pop(self._key(layer, coord, format))
+        return self.cache.remove(layer, coord, format)
+
+    def save(self, body, layer, coord, format):
+        self.cache.save(body, layer, coord, format)
+
+        if format in FORMATS:
+            self.tile_cache.put(self._key(layer, coord, format),
+                                (200, {'Content-Type': FORMATS[format][0]},
+                                 body))
@@ -1,32 +1,20 @@
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 from datetime import datetime, timedelta
 import json
 
 from ModestMaps.Core import Coordinate
 from notebook.base.handlers import IPythonHandler
-from tornado import concurrent, ioloop
 from tornado import gen
 from tornado import web
 
 from .utils import serialize_config, serialize_layer
 
 
-class KTileAsyncClient(object):
-    __instance = None
+# Layers of bulk ingest requests are parsed (and their VRTs generated) by
+# these threads so the IOLoop keeps serving tiles,  see KtileLayersHandler
+DEFAULT_INGEST_WORKERS = 4
 
-    def __new__(cls, *args, **kwargs):
-        if cls.__instance is None:
-            cls.__instance = super(
-                KTileAsyncClient, cls).__new__(cls, *args, **kwargs)
-        return cls.__instance
-
-    def __init__(self):
-        self.executor = ThreadPoolExecutor(max_workers=4)
-        self.io_loop = ioloop.IOLoop.current()
-
-    @concurrent.run_on_executor
-    def getTileResponse(self, layer, coord, extension):
-        return layer.getTileResponse(coord, extension)
+ingest_executor = ThreadPoolExecutor(max_workers=DEFAULT_INGEST_WORKERS)
 
 
 class KtileHandler(IPythonHandler):
@@ -131,26 +119,114 @@ class KtileLayerHandler(IPythonHandler):
         self.finish(serialize_layer(layer))
 
 
+class KtileLayersHandler(KtileLayerHandler):
+    """Add many layers of a kernel with one request.
+
+    The body is {"layers": {name: layer_dict, ...}} with each layer_dict
+    as it would be posted to KtileLayerHandler.  Responds with the url of
+    every layer that was added and the traceback of every layer that
+    could not be.  GET lists the kernel's layers along with the hits,
+    misses and memory use of each in the in-memory tile cache,  and the
+    kernel's queued tiles and render waits.
+    """
+
+    def _add_layer(self, kernel_id, layer_name, layer_dict):
+        # Returns the formatted traceback of an error, or None
+        try:
+            self.ktile_config_manager.add_layer(
+                kernel_id, layer_name, layer_dict)
+        except Exception:
+            import sys
+            import traceback
+            t, v, tb = sys.exc_info()
+
+            self.log.error(''.join(traceback.format_exception(t, v, tb)))
+            return traceback.format_exception(t, v, tb)
+
+    @gen.coroutine
+    def post(self, kernel_id):
+        if kernel_id not in self.ktile_config_manager:
+            raise web.HTTPError(404, u'Kernel %s not found' % kernel_id)
+
+        layers = (self.request.json or {}).get('layers', {})
+        names = list(layers)
+
+        errors = yield [ingest_executor.submit(
+            self._add_layer, kernel_id, name, layers[name])
+            for name in names]
+
+        base_url = "{}://{}{}".format(
+            self.request.protocol, self.request.host,
+            self.request.path.rsplit('/', 1)[0])
+
+        self.finish({
+            'layers': dict((name, "{}/{}".format(base_url, name))
+                           for name, error in zip(names, errors)
+                           if error is None),
+            'errors': dict((name, error)
+                           for name, error in zip(names, errors)
+                           if error is not None)
+        })
+
+    def get(self, kernel_id, **kwargs):
+        try:
+            config = self.ktile_config_manager[kernel_id]
+        except KeyError:
+            raise web.HTTPError(404, u'Kernel %s not found' % kernel_id)
+
+        self.finish({
+            'layers': sorted(config.layers),
+            'cache': self.ktile_config_manager.tile_cache.layer_stats(
+                kernel_id),
+            'scheduler': self.ktile_config_manager.scheduler.stats(kernel_id)
+        })
+
+
 class KtileTileHandler(IPythonHandler):
 
     def initialize(self, ktile_config_manager):
-        self.client = KTileAsyncClient()
         self.ktile_config_manager = ktile_config_manager
+        self._render = None
+
+    def on_connection_close(self):
+        # Nobody is waiting for the tile anymore,  drop it if it hasn't
+        # started rendering
+        if self._render is not None:
+            self._render.cancel()
 
     @gen.coroutine
     def get(self, kernel_id, layer_name, x, y, z, extension, **kwargs):
 
         config = self.ktile_config_manager[kernel_id]
+        tile_cache = self.ktile_config_manager.tile_cache
 
         layer = config.layers[layer_name]
         coord = Coordinate(int(y), int(x), int(z))
 
-        # To run synchronously:
-        # status_code, headers, content = layer.getTileResponse(
-        #     coord, extension)
+        key = (kernel_id, layer_name, int(z), int(x), int(y), extension)
+        response = tile_cache.get(key)
+
+        if response is None:
+            # To run synchronously:
+            # status_code, headers, content = layer.getTileResponse(
+            #     coord, extension)
+
+            self._render = self.ktile_config_manager.scheduler.submit(
+                kernel_id, coord.zoom, layer.getTileResponse, coord, extension)
+
+            try:
+                status_code, headers, content = yield self._render
+            except CancelledError:
+                return
+
+            # Write through,  TileStache has already stored the tile in
+            # the layer's own cache.
+            response = (status_code, dict(headers.items()), content)
+            if status_code == 200:
+                tile_cache.put(key, response)
 
-        status_code, headers, content = yield self.client.getTileResponse(
-            layer, coord, extension)
+        status_code, headers, content = response
+        headers = dict(headers)
 
         if layer.max_cache_age is not None:
             expires = datetime.utcnow() + timedelta(
@@ -11,10 +11,20 @@ import TileStache as ts
 from TileStache.Config import _parseConfigLayer as parseConfigLayer
 
 from geonotebook.utils import get_kernel_id
-
+from . import workers
+from .cache import TierCache, TileCache
 from .handler import (KtileHandler,
                       KtileLayerHandler,
+                      KtileLayersHandler,
                       KtileTileHandler)
+from .scheduler import DEFAULT_RENDER_WORKERS, TileScheduler
+
+
+# Size of the in-memory tile cache,  see TileCache
+DEFAULT_MEMORY_CACHE_MB = 64
+
+# Pixels rendered around metatiles,  see Ktile._layer_dict
+DEFAULT_METATILE_BUFFER = 0
 
 
 # Manage kernel_id => layer configuration section
@@ -26,14 +36,25 @@ class KtileConfigManager(MutableMapping):
         self.default_cache = default_cache
         self._configs = {}
 
+        # Rendered tiles of every kernel,  in front of each kernel's
+        # TileStache cache
+        self.tile_cache = TileCache(kwargs.get(
+            'memory_cache', DEFAULT_MEMORY_CACHE_MB * 1024 * 1024))
+
+        # Renders the tiles of every kernel
+        self.scheduler = TileScheduler(
+            kwargs.get('render_workers', DEFAULT_RENDER_WORKERS))
+
     def __getitem__(self, *args, **kwargs):
         return self._configs.__getitem__(*args, **kwargs)
 
     def __setitem__(self, _id, value):
         self._configs.__setitem__(_id, value)
 
-    def __delitem__(self, *args, **kwargs):
-        return self._configs.__delitem__(*args, **kwargs)
+    def __delitem__(self, _id):
+        self._configs.__delitem__(_id)
+        self.tile_cache.drop(_id)
+        self.scheduler.forget(_id)
 
     def __iter__(self, *args, **kwargs):
         return self._configs.__iter__(*args, **kwargs)
@@ -44,10 +65,13 @@ class KtileConfigManager(MutableMapping):
     def add_config(self, kernel_id, **kwargs):
         cache = kwargs.get("cache", self.default_cache)
 
-        self._configs[kernel_id] = ts.parseConfig({
+        config = ts.parseConfig({
             "cache": cache,
             "layers": {}
         })
+        config.cache = TierCache(config.cache, self.tile_cache, kernel_id)
+
+        self._configs[kernel_id] = config
 
     def add_layer(self, kernel_id, layer_name, layer_dict, dirpath=''):
         # NB: dirpath is actually not used in _parseConfigLayer So dirpath
@@ -78,10 +102,19 @@ class KtileConfigManager(MutableMapping):
 # different contexts!
 
 class Ktile(object):
-    def __init__(self, config, url=None, default_cache=None):
+    def __init__(self, config, url=None, default_cache=None,
+                 memory_cache_mb=None, render_workers=None,
+                 render_backend=workers.DEFAULT_RENDER_BACKEND,
+                 render_processes=None):
         self.config = config
         self.base_url = url
         self.default_cache_section = default_cache
+        self.memory_cache_mb = DEFAULT_MEMORY_CACHE_MB \
+            if memory_cache_mb is None else float(memory_cache_mb)
+        self.render_workers = DEFAULT_RENDER_WORKERS \
+            if render_workers is None else int(render_workers)
+        self.render_backend = render_backend
+        self.render_processes = render_processes
 
     @property
     def default_cache(self):
@@ -96,13 +129,29 @@ class Ktile(object):
         kernel_id = get_kernel_id(kernel)
         requests.delete("{}/{}".format(self.base_url, kernel_id))
 
+    def cache_stats(self, kernel):
+        """Return the in-memory tile cache statistics of each layer."""
+        kernel_id = get_kernel_id(kernel)
+        r = requests.get("{}/{}/layers".format(self.base_url, kernel_id))
+        return r.json()['cache']
+
+    def render_stats(self, kernel):
+        """Return the queue depth and render waits of a kernel's tiles."""
+        kernel_id = get_kernel_id(kernel)
+        r = requests.get("{}/{}/layers".format(self.base_url, kernel_id))
+        return r.json()['scheduler']
+
     # This function is caleld inside the tornado web app
     # from jupyter_load_server_extensions
     def initialize_webapp(self, config, webapp):
         base_url = webapp.settings['base_url']
 
+        workers.set_backend(self.render_backend, self.render_processes)
+
         webapp.ktile_config_manager = KtileConfigManager(
-            self.default_cache)
+            self.default_cache,
+            memory_cache=int(self.memory_cache_mb * 1024 * 1024),
+            render_workers=self.render_workers)
 
         webapp.add_handlers('.*$', [
             # kernel_name
@@ -110,6 +159,12 @@ class Ktile(object):
              KtileHandler,
              dict(ktile_config_manager=webapp.ktile_config_manager)),
 
+            # kernel_name,  bulk ingest of many layers.  Must come before
+            # the layer handler,  layer names always end with a hash.
+            (ujoin(base_url, r'/ktile/([^/]*)/layers'),
+             KtileLayersHandler,
+             dict(ktile_config_manager=webapp.ktile_config_manager)),
+
             # kernel_name, layer_name
             (ujoin(base_url, r'/ktile/([^/]*)/([^/]*)'),
              KtileLayerHandler,
@@ -133,6 +188,11 @@ class Ktile(object):
         # All paramater setup is handled on ingest
         return {}
 
+    def warm(self, vis_url, tiles):
+        """Render (x, y, z) tiles of a layer so they are in the tile cache."""
+        for x, y, z in tiles:
+            requests.get('{}/{}/{}/{}.png'.format(vis_url, x, y, z))
+
     def _static_vrt_options(self, data, kwargs):
         options = {
             'vrt_path': kwargs['vrt_path'],
@@ -142,30 +202,48 @@ class Ktile(object):
         return options
 
     def _dynamic_vrt_options(self, data, kwargs):
+        # Dataset metadata comes from the metadata catalog when data is
+        # part of a collection so ingesting doesn't reopen the file.
+        metadata = data.reader.metadata
+        path, bands = data.reader.path, data.band_indexes
+
+        # In-memory rasters and warped views are written to a file the
+        # tile server can read,  see memory_reader.py and warp.py
+        if hasattr(data.reader, 'spill'):
+            path = data.reader.spill()
+
+        # Paths on GDAL's virtual file systems (e.g. /vsicurl/ of
+        # http_reader.py) aren't local paths
+        if not path.startswith('/vsi'):
+            path = os.path.abspath(path)
+
+        # Readers of variables in multidimensional files name GDAL
+        # subdatasets and the bands of them to read,  see multidim.py
+        if hasattr(data.reader, 'source_bands'):
+            path, bands = data.reader.path, \
+                data.reader.source_bands(data.band_indexes)
+
         options = {
-            'path': os.path.abspath(data.reader.path),
-            'bands': data.band_indexes,
+            'path': path,
+            'bands': bands,
 
             'nodata': data.nodata,
             # TODO:  Needs to be moved into RasterData level API
-            'raster_x_size': data.reader.width,
-            'raster_y_size': data.reader.height,
-            'transform': data.reader.dataset.profile['transform'],
-            'dtype': data.reader.dataset.profile['dtype']
+            'raster_x_size': metadata['width'],
+            'raster_y_size': metadata['height'],
+            'transform': metadata['transform'],
+            'dtype': metadata['dtypes'][0]
         }
         if 'map_srs' in kwargs:
             options['map_srs'] = kwargs['map_srs']
 
         return options
 
-    def ingest(self, data, name=None, **kwargs):
-
-        # Verify that a kernel_id is present otherwise we can't
-        # post to the server extension to add the layer
-        kernel_id = kwargs.pop('kernel_id', None)
-        if kernel_id is None:
-            raise Exception(
-                "KTile vis server requires kernel_id as kwarg to ingest!")
+    def _layer_dict(self, data, name, kwargs):
+        # The KTile layer configuration of data,  as posted to the server
+        kwargs = dict(kwargs)
+        metatile = kwargs.pop('metatile', None)
+        metatile_buffer = kwargs.pop('metatile_buffer', None)
 
         options = {
             'name': data.name if name is None else name
@@ -200,17 +278,41 @@ class Ktile(object):
             # We don't have a static VRT, set options for a dynamic VRT
             options.update(self._dynamic_vrt_options(data, kwargs))
 
-        # Make the Request
-        base_url = '{}/{}/{}'.format(self.base_url, kernel_id, name)
-
-        r = requests.post(base_url, json={
+        layer_dict = {
             "provider": {
                 "class": "geonotebook.vis.ktile.provider:MapnikPythonProvider",
                 "kwargs": options
             }
             # NB: Other KTile layer options could go here
             #     See: http://tilestache.org/doc/#layers
-        })
+        }
+
+        # Render metatile x metatile tiles at once,  TileStache cuts them
+        # up and saves every one of them in the cache
+        if metatile is not None and metatile > 1:
+            layer_dict["metatile"] = {
+                "rows": int(metatile),
+                "columns": int(metatile),
+                "buffer": int(metatile_buffer or DEFAULT_METATILE_BUFFER)
+            }
+
+        return layer_dict
+
+    def ingest(self, data, name=None, **kwargs):
+
+        # Verify that a kernel_id is present otherwise we can't
+        # post to the server extension to add the layer
+        kernel_id = kwargs.pop('kernel_id', None)
+        if kernel_id is None:
+            raise Exception(
+                "KTile vis server requires kernel_id as kwarg to ingest!")
+
+        layer_dict = self._layer_dict(data, name, kwargs)
+
+        # Make the Request
+        base_url = '{}/{}/{}'.format(self.base_url, kernel_id, name)
+
+        r = requests.post(base_url, json=layer_dict)
 
         if r.status_code == 200:
             return base_url
@@ -218,3 +320,38 @@ class Ktile(object):
             raise RuntimeError(
                 "KTile.ingest() returned {} error:\n\n{}".format(
                     r.status_code, ''.join(r.json()['error'])))
+
+    def ingest_many(self, data, names=None, **kwargs):
+        """Ingest a list of RasterData with a single request.
+
+        Layers are added by the server's bulk ingest handler and the
+        list of their urls is returned.  kwargs are as for ingest() and
+        apply to every layer.
+        """
+        kernel_id = kwargs.pop('kernel_id', None)
+        if kernel_id is None:
+            raise Exception(
+                "KTile vis server requires kernel_id as kwarg to ingest!")
+
+        if names is None:
+            names = [d.name for d in data]
+
+        r = requests.post(
+            '{}/{}/layers'.format(self.base_url, kernel_id),
+            json={'layers': dict(
+                (name, self._layer_dict(d, name, kwargs))
+                for d, name in zip(data, names))})
+
+        if r.status_code != 200:
+            raise RuntimeError(
+                "KTile.ingest_many() returned {} error:\n\n{}".format(
+                    r.status_code, r.text))
+
+        result = r.json()
+        if result['errors']:
+            raise RuntimeError(
+                "KTile.ingest_many() could not add {}:\n\n{}".format(
+                    ", ".join(sorted(result['errors'])),
+                    "\n".join(''.join(e) for e in result['errors'].values())))
+
+        return [result['layers'][name] for name in names]
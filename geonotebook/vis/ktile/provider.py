@@ -1,10 +1,14 @@
+import hashlib
+import json
 import os
 import tempfile
+import threading
 
 import gdal
 import mapnik
 import osr
 
+from . import workers
 from .vrt import (
     ComplexSourceType,
     SourceFilenameType,
@@ -36,7 +40,12 @@ class MapnikPythonProvider(object):
         'float32': 'Float32'
     }
 
+    # Reuse each thread's styled Map between tiles,  see get_map
+    pool_maps = True
+
     def __init__(self, layer, **kwargs):
+        self._kwargs = kwargs
+
         # List of bands to display,  should be len == 1 or len == 3
         self._bands = kwargs.get('bands', [-1])
         self._layer_srs = None
@@ -86,6 +95,26 @@ class MapnikPythonProvider(object):
 
         self.scale_factor = None
 
+        # Styled Maps of the threads rendering this layer,  see get_map
+        self._maps = threading.local()
+
+        self._render_key = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a provider from the config() of another."""
+        provider = cls(None, **config['kwargs'])
+        provider.mapnik_band = config['mapnik_band']
+        return provider
+
+    def config(self):
+        # What a render process needs to build its own copy of the
+        # provider,  the VRT is generated here
+        return {
+            'kwargs': dict(self._kwargs, vrt_path=self.vrt_path),
+            'mapnik_band': self.mapnik_band
+        }
+
     def serialize(self):
         return {
             "filepath": self.filepath,
@@ -216,14 +245,42 @@ class MapnikPythonProvider(object):
     def renderArea(self, width, height, srs, xmin, ymin, xmax, ymax, zoom):
         '''
         '''
+        args = (width, height, srs, xmin, ymin, xmax, ymax, zoom)
 
+        if workers.render_pool is None:
+            return self.render_area(*args)
+
+        return workers.EncodedImage(workers.render_pool.render_layer(
+            self.render_key, self.config, args))
+
+    @property
+    def render_key(self):
+        # Identifies the layer to render processes,  which are only sent
+        # its config the first time they see it.  See workers.render_tile
+        if self._render_key is None:
+            self._render_key = hashlib.sha1(json.dumps(
+                self.config(), sort_keys=True).encode('utf-8')).hexdigest()
+        return self._render_key
+
+    def get_map(self, width, height, srs):
         # NB: To be thread-safe Map object cannot be stored in the class state.
         # see: https://groups.google.com/forum/#!topic/mapnik/USDlVfSk328
+        # Each thread keeps its own instead,  with its style, colorizer and
+        # open datasource,  so rendering a tile only moves it.
+        if not self.pool_maps:
+            return self.style_map(mapnik.Map(width, height, srs))
 
-        Map = mapnik.Map(width, height, srs)
-        Map.zoom_to_box(Box2d(xmin, ymin, xmax, ymax))
+        maps = self._maps.__dict__
+        try:
+            return maps[(width, height, srs)]
+        except KeyError:
+            Map = self.style_map(mapnik.Map(width, height, srs))
+            maps[(width, height, srs)] = Map
+            return Map
 
-        Map = self.style_map(Map)
+    def render_area(self, width, height, srs, xmin, ymin, xmax, ymax, zoom):
+        Map = self.get_map(width, height, srs)
+        Map.zoom_to_box(Box2d(xmin, ymin, xmax, ymax))
 
         img = mapnik.Image(width, height)
         # Don't even call render with scale factor if it's not
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import threading
+import time
+
+
+# Threads rendering tiles for all kernels of the notebook server
+DEFAULT_RENDER_WORKERS = 4
+
+
+class _Job(object):
+    # Compared by identity when removed from a queue
+    __slots__ = ('future', 'zoom', 'submitted', 'fn', 'args')
+
+    def __init__(self, future, zoom, submitted, fn, args):
+        self.future = future
+        self.zoom = zoom
+        self.submitted = submitted
+        self.fn = fn
+        self.args = args
+
+
+def _wait_stats(count=0, total=0.0, longest=0.0):
+    return {
+        'rendered': count,
+        'mean_wait': total / count if count else None,
+        'max_wait': longest
+    }
+
+
+class TileScheduler(object):
+    """Render tiles on a pool of threads,  fairly between kernels.
+
+    Every kernel has its own queue and workers take a tile from each
+    kernel with queued tiles in turn,  so one kernel panning around the
+    map can't starve the others.  Within a kernel,  tiles at the zoom of
+    its most recent request go before those of zooms it has left.  A
+    tile's render is dropped if its future is cancelled (e.g. because the
+    browser closed the connection) before a worker gets to it.
+    """
+
+    def __init__(self, workers=DEFAULT_RENDER_WORKERS):
+        self.workers = max(1, int(workers))
+
+        self._queues = OrderedDict()
+        self._zooms = {}
+        self._waits = {}
+        self._cond = threading.Condition()
+        self._threads = []
+
+        self.cancelled = 0
+
+    def submit(self, kernel_id, zoom, fn, *args):
+        """Queue fn(*args) for kernel_id,  return a Future of its result."""
+        future = Future()
+        job = _Job(future, zoom, time.time(), fn, args)
+
+        with self._cond:
+            self._start()
+            self._queues.setdefault(kernel_id, []).append(job)
+            self._zooms[kernel_id] = zoom
+            self._cond.notify()
+
+        future.add_done_callback(
+            lambda f: f.cancelled() and self._forget(kernel_id, job))
+        return future
+
+    def _start(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _forget(self, kernel_id, job):
+        with self._cond:
+            queue = self._queues.get(kernel_id, [])
+            if job in queue:
+                queue.remove(job)
+                self.cancelled += 1
+                if not queue:
+                    del self._queues[kernel_id]
+
+    def _next(self):
+        # The first kernel with queued tiles goes to the back of the line
+        kernel_id, queue = self._queues.popitem(last=False)
+
+        zoom = self._zooms[kernel_id]
+        job = next((j for j in queue if j.zoom == zoom), queue[0])
+        queue.remove(job)
+
+        if queue:
+            self._queues[kernel_id] = queue
+        return kernel_id, job
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queues:
+                    self._cond.wait()
+                kernel_id, job = self._next()
+
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+
+                count, total, longest = self._waits.get(
+                    kernel_id, (0, 0.0, 0.0))
+                wait = time.time() - job.submitted
+                self._waits[kernel_id] = (
+                    count + 1, total + wait, max(longest, wait))
+
+            try:
+                job.future.set_result(job.fn(*job.args))
+            except Exception as e:
+                job.future.set_exception(e)
+
+    def stats(self, kernel_id=None):
+        """Return queue depths and waits,  of one kernel or of all kernels."""
+        with self._cond:
+            if kernel_id is not None:
+                return dict(_wait_stats(*self._waits.get(kernel_id, ())),
+                            queued=len(self._queues.get(kernel_id, [])))
+
+            waits = list(self._waits.values())
+            return dict(
+                _wait_stats(sum(w[0] for w in waits),
+                            sum(w[1] for w in waits),
+                            max([w[2] for w in waits] or [0.0])),
+                queued=sum(len(q) for q in self._queues.values()),
+                kernels=len(self._queues),
+                workers=self.workers,
+                cancelled=self.cancelled)
+
+    def forget(self, kernel_id):
+        """Drop the queued tiles and statistics of a kernel."""
+        with self._cond:
+            queue = self._queues.pop(kernel_id, [])
+            self._zooms.pop(kernel_id, None)
+            self._waits.pop(kernel_id, None)
+            self.cancelled += len(queue)
+
+        for job in queue:
+            job.future.cancel()
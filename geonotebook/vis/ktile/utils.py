@@ -5,9 +5,14 @@ import ipykernel
 import requests
 
 
+def serialize_cache(kCache):
+    # The in-memory tier wraps the configured cache,  see cache.py
+    return getattr(kCache, 'cache', kCache).__dict__
+
+
 def serialize_config(kConfig):
     return {
-        "cache": kConfig.cache.__dict__,
+        "cache": serialize_cache(kConfig.cache),
         "layers": {n: serialize_layer(l) for n, l in kConfig.layers.items()}
     }
 
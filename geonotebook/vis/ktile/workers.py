@@ -0,0 +1,162 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import threading
+
+import six
+
+from geonotebook.cache import LRUCache
+
+try:
+    from concurrent.futures.process import BrokenProcessPool
+except ImportError:
+    # Python 2's futures backport has no way to tell
+    BrokenProcessPool = None
+
+try:
+    from PIL import Image
+except ImportError:
+    # On some systems, PIL.Image is known as Image.
+    import Image
+
+
+# How MapnikPythonProvider renders tiles,  'thread' on the threads of the
+# TileScheduler,  'process' in a pool of render processes (see RenderPool)
+DEFAULT_RENDER_BACKEND = 'thread'
+RENDER_BACKENDS = ('thread', 'process')
+
+# Providers each render process keeps built,  least recently used first
+MAX_PROCESS_PROVIDERS = 64
+
+# The pool tiles are rendered in,  None to render in the calling thread
+render_pool = None
+
+# Providers of a render process,  by their layer's key
+_providers = LRUCache(MAX_PROCESS_PROVIDERS, sizeof=lambda provider: 1)
+
+
+class EncodedImage(object):
+    """A tile image as encoded by a render process.
+
+    TileStache save()s the images of providers into its responses (and
+    caches),  saving in the format the image was encoded in writes the
+    bytes as they are.  Anything else decodes it with PIL first.
+    """
+
+    def __init__(self, data, format='PNG'):
+        self.data = data
+        self.format = format
+        self._image = None
+
+    @property
+    def image(self):
+        if self._image is None:
+            self._image = Image.open(six.BytesIO(self.data))
+            self._image.load()
+        return self._image
+
+    def save(self, out, format=None, **kwargs):
+        if format is None or format.upper() == self.format:
+            out.write(self.data)
+        else:
+            self.image.save(out, format, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.image, name)
+
+
+class UnknownLayerError(Exception):
+    """A render process hasn't built the provider of a layer yet."""
+
+
+def render_tile(key, args, config=None):
+    # Runs in a render process.  Providers are built from config the
+    # first time the process sees a layer's key,  after that only the
+    # key is sent (see RenderPool.render_layer).
+    provider = _providers.get(key)
+    if provider is None:
+        if config is None:
+            raise UnknownLayerError(key)
+
+        from .provider import MapnikPythonProvider
+        provider = _providers.put(
+            key, MapnikPythonProvider.from_config(config))
+
+    buff = six.BytesIO()
+    provider.render_area(*args).save(buff, 'PNG')
+    return buff.getvalue()
+
+
+class RenderPool(object):
+    """Render tiles in a pool of processes.
+
+    Each process has its own Mapnik state and builds the provider of a
+    layer the first time it renders one of its tiles.  Rendering is not
+    held back by the notebook server's GIL and a render fault only takes
+    down its process,  which is replaced for the next tile.
+    """
+
+    def __init__(self, processes=None, fn=render_tile):
+        self.processes = multiprocessing.cpu_count() \
+            if processes is None else max(1, int(processes))
+        self.fn = fn
+
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes)
+            return self._executor
+
+    def render(self, *args):
+        """Return fn(*args) as run in a render process."""
+        executor = self._pool()
+        try:
+            return executor.submit(self.fn, *args).result()
+        except Exception as e:
+            if BrokenProcessPool is None or \
+               not isinstance(e, BrokenProcessPool):
+                raise
+
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+
+            raise RuntimeError("A render process died: {}".format(e))
+
+    def render_layer(self, key, config, args):
+        """Return a tile of a layer as rendered in a render process.
+
+        key identifies the layer,  config is a function returning the
+        layer's config which is only called and sent along if the process
+        rendering the tile doesn't know the key.
+        """
+        try:
+            return self.render(key, args)
+        except UnknownLayerError:
+            return self.render(key, args, config())
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def set_backend(backend=DEFAULT_RENDER_BACKEND, processes=None):
+    """Choose how tiles are rendered,  see RENDER_BACKENDS."""
+    global render_pool
+    if backend not in RENDER_BACKENDS:
+        raise NotImplementedError(
+            "'{}' is not a valid render backend, choose one of: {}".format(
+                backend, ", ".join(RENDER_BACKENDS)))
+
+    if render_pool is not None:
+        render_pool.shutdown(wait=False)
+        render_pool = None
+
+    if backend == 'process':
+        render_pool = RenderPool(processes)
@@ -1,3 +1,8 @@
+import math
+
+
+# Latitude limit of web mercator tiles
+MAX_LATITUDE = 85.0511287798
 
 
 # A colormap can be a list of dicts
@@ -22,6 +27,28 @@ def range_count(start, stop, count):
     return [start + i * step for i in range(count)]
 
 
+def tiles(bounds, zoom):
+    """Return the (x, y, z) web mercator tiles that cover bounds.
+
+    bounds is (west, south, east, north) in degrees.
+    """
+    west, south, east, north = bounds
+    count = 2 ** zoom
+
+    def _clip(value):
+        return min(count - 1, max(0, int(value)))
+
+    def _row(lat):
+        lat = math.radians(min(MAX_LATITUDE, max(-MAX_LATITUDE, lat)))
+        return _clip((1 - math.log(math.tan(lat) + 1 / math.cos(lat)) /
+                      math.pi) / 2 * count)
+
+    return [(x, y, zoom)
+            for y in range(_row(north), _row(south) + 1)
+            for x in range(_clip((west + 180.0) / 360.0 * count),
+                           _clip((east + 180.0) / 360.0 * count) + 1)]
+
+
 def generate_colormap(colormap, minimum, maximum):
     # If colormap is an iterable return it
     # Sld code has checks for this anyway
@@ -57,7 +84,8 @@ def discrete_colors(colormap, count):
 class RasterStyleOptions(object):
     def __init__(self, opacity=1.0, gamma=1.0, projection='EPSG:3857',
                  kernel_id=None, zIndex=None, colormap=None, interval=None,
-                 layer_type=None, attribution=None, **kwargs):
+                 layer_type=None, attribution=None, metatile=None,
+                 metatile_buffer=None, **kwargs):
 
         # self.vis_url = vis_url
         self.opacity = opacity
@@ -69,6 +97,8 @@ class RasterStyleOptions(object):
         self.kernel_id = kernel_id
         self.layer_type = layer_type
         self.attribution = attribution
+        self.metatile = metatile
+        self.metatile_buffer = metatile_buffer
 
         if colormap is None:
             self.colormap = []
@@ -112,7 +142,9 @@ class RasterStyleOptions(object):
             'colormap': self.colormap,
             'kernel_id': self.kernel_id,
             'zIndex': self.zIndex,
-            'attribution': self.attribution
+            'attribution': self.attribution,
+            'metatile': self.metatile,
+            'metatile_buffer': self.metatile_buffer
         }
 
     def __hash__(self):
@@ -125,7 +157,9 @@ class RasterStyleOptions(object):
             tuple(tuple(c.items()) for c in self.colormap),
             self.kernel_id,
             self.zIndex,
-            self.attribution))
+            self.attribution,
+            self.metatile,
+            self.metatile_buffer))
 
 
 class VectorStyleOptions(object):
@@ -0,0 +1,109 @@
+import tempfile
+
+import numpy as np
+
+
+# Directory for the files backing memory mapped results,  None uses the
+# system's temporary directory.  Set from 'scratch_dir' in the [wrappers]
+# section of geonotebook.ini
+scratch_dir = None
+
+
+def _memmap(shape, dtype):
+    if not np.prod(shape, dtype=np.int64):
+        return np.empty(shape, dtype=dtype)
+
+    # The file is unlinked as soon as it is closed,  the mapping keeps
+    # its pages alive until the array is garbage collected.
+    with tempfile.TemporaryFile(dir=scratch_dir,
+                                prefix='geonotebook-') as fh:
+        return np.memmap(fh, dtype=dtype, mode='w+', shape=shape)
+
+
+def empty(shape, dtype, memmap=False, masked=False):
+    """Return an uninitialized array to pass as out= to get_data.
+
+    If memmap is True the array (and its mask) are backed by files in
+    scratch_dir rather than memory.  If masked is True a masked array is
+    returned,  get_data will then write the nodata mask into its mask.
+    """
+    alloc = _memmap if memmap else np.empty
+
+    data = alloc(shape, dtype)
+    if not masked:
+        return data
+
+    return np.ma.MaskedArray(data, mask=alloc(shape, bool), copy=False)
+
+
+def _as_dtype(value, dtype):
+    # value as a scalar of dtype,  None if dtype can't hold it exactly
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        if not info.min <= value <= info.max or value != int(value):
+            return None
+        return dtype.type(value)
+
+    with np.errstate(over='ignore'):
+        converted = dtype.type(value)
+    if np.isfinite(value) and not np.isfinite(converted):
+        return None
+    return converted
+
+
+def nodata_mask(data, nodata, out=None):
+    """Return a boolean array that is True where data equals nodata.
+
+    nodata is converted to the type of data first so e.g. a float64
+    nodata matches float32 data.  A nodata the type can't hold (e.g.
+    -9999 for uint8 data,  or 0.5 for integers) matches nothing,  and a
+    nodata of NaN matches NaN values.
+    """
+    if out is None:
+        out = np.empty(data.shape, dtype=bool)
+
+    if nodata is None:
+        out.fill(False)
+    elif np.isnan(nodata):
+        if np.issubdtype(data.dtype, np.floating):
+            np.isnan(data, out=out)
+        else:
+            out.fill(False)
+    else:
+        value = _as_dtype(nodata, data.dtype)
+        if value is None:
+            out.fill(False)
+        else:
+            np.equal(data, value, out=out)
+
+    return out
+
+
+def write_out(data, out):
+    """Return data stored in a caller supplied out= buffer.
+
+    Readers that support out= have already written into it,  for any
+    other reader data is copied into out.  If out is a masked array the
+    mask of data is written into its mask.  Returns out,  or a masked
+    view of out if data is masked.
+    """
+    if out is None:
+        return data
+
+    buf = np.ma.getdata(out)
+    if not np.may_share_memory(np.ma.getdata(data), buf):
+        np.copyto(buf, np.ma.getdata(data))
+
+    if not np.ma.isMaskedArray(data):
+        return out
+
+    mask = np.ma.getmaskarray(data)
+    if np.ma.isMaskedArray(out):
+        if out.mask is not np.ma.nomask:
+            if not np.may_share_memory(out.mask, mask):
+                np.copyto(out.mask, mask)
+        else:
+            out.mask = mask
+        return out
+
+    return np.ma.MaskedArray(out, mask=mask, copy=False)
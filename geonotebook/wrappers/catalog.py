@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import tempfile
+import threading
+
+from . import file_reader
+
+
+# Name of the index file written to each directory of catalogued data
+CATALOG_NAME = '.geonotebook_catalog.json'
+
+# Number of threads used to read the metadata of uncatalogued files
+DEFAULT_CATALOG_WORKERS = 8
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return st.st_mtime, st.st_size
+
+
+class MetadataCatalog(object):
+    """Dataset metadata gathered once and kept in an index next to the data.
+
+    Each directory gets a JSON index that maps file names to the metadata
+    of the file (see RasterIOReader.metadata) along with the modification
+    time and size of the file when it was read.  Entries are gathered again
+    if either has changed.  Readers that have no local file are left alone
+    and read their metadata from the dataset as usual.
+    """
+
+    def __init__(self, workers=DEFAULT_CATALOG_WORKERS, name=CATALOG_NAME):
+        self.workers = workers
+        self.name = name
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _index(self, directory):
+        with self._lock:
+            try:
+                return self._indexes[directory]
+            except KeyError:
+                index = self._read_index(directory)
+                self._indexes[directory] = index
+                return index
+
+    def _read_index(self, directory):
+        try:
+            with open(os.path.join(directory, self.name), 'r') as fh:
+                index = json.load(fh)
+        except (OSError, IOError, ValueError):
+            return {}
+
+        return index if isinstance(index, dict) else {}
+
+    def _write_index(self, directory, entries):
+        # Merge with the index on disk so entries added by other kernels
+        # since it was loaded are kept.
+        index = self._read_index(directory)
+        index.update(entries)
+
+        try:
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.json')
+        except (OSError, IOError):
+            return False
+
+        try:
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(index, fh)
+            os.chmod(tmp, 0o644)
+            os.rename(tmp, os.path.join(directory, self.name))
+        except (OSError, IOError, TypeError, ValueError):
+            os.remove(tmp)
+            return False
+
+        return True
+
+    def load(self, readers):
+        """Set the metadata of each reader from the catalog.
+
+        Metadata missing from the catalog (or out of date) is read from
+        the datasets in parallel and added to the on-disk indexes.
+        Returns the list of metadata dicts,  None for readers that could
+        not be catalogued.
+        """
+        results = [None] * len(readers)
+        missing = []
+
+        for k, reader in enumerate(readers):
+            # Readers of a part of a dataset (e.g. a time step,  see
+            # multidim.StepReader) share the metadata of the whole.
+            reader = getattr(reader, 'parent', reader)
+
+            # Look for 'metadata' on the class,  getting the attribute
+            # from the reader would read it from the dataset.
+            path = getattr(reader, 'path', None)
+            if path is None or not hasattr(type(reader), 'metadata'):
+                continue
+
+            st = _stat(path)
+            if st is None:
+                continue
+
+            directory, name = os.path.split(os.path.abspath(path))
+            entry = self._index(directory).get(name)
+
+            if entry is not None and \
+               (entry['mtime'], entry['size']) == st:
+                reader.metadata = results[k] = entry['metadata']
+            else:
+                missing.append((k, reader, directory, name, st))
+
+        if not missing:
+            return results
+
+        def _read(args):
+            # The pool's threads are gone once the metadata is read,  their
+            # dataset handles are closed rather than left to the pool.
+            try:
+                return args[1].metadata
+            finally:
+                file_reader.dataset_pool.clear()
+
+        with ThreadPoolExecutor(
+                max_workers=max(1, min(self.workers, len(missing)))) as pool:
+            metadata = list(pool.map(_read, missing))
+
+        updated = {}
+        for (k, reader, directory, name, st), md in zip(missing, metadata):
+            results[k] = md
+            entry = {'mtime': st[0], 'size': st[1], 'metadata': md}
+            self._index(directory)[name] = entry
+            updated.setdefault(directory, {})[name] = entry
+
+        for directory, entries in updated.items():
+            self._write_index(directory, entries)
+
+        return results
+
+    def clear(self):
+        """Forget the indexes loaded into memory."""
+        with self._lock:
+            self._indexes.clear()
+
+
+catalog = MetadataCatalog()
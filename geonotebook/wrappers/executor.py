@@ -0,0 +1,128 @@
+from collections import deque
+from concurrent.futures import (Future,
+                                ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+import multiprocessing
+import threading
+
+
+# Executor used for reading the time steps of a RasterDataCollection
+DEFAULT_EXECUTOR = 'thread'
+
+
+class SerialExecutor(object):
+    """Executor that runs each call immediately in the calling thread."""
+
+    def __init__(self, max_workers=None):
+        pass
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class ReadExecutor(object):
+    """Run independent reads (e.g. the time steps of a collection) in parallel.
+
+    GDAL releases the GIL while it reads and decodes,  so reads from a
+    thread pool run concurrently.  Process pools don't share the block
+    cache or open datasets with the kernel and results have to be pickled
+    back,  they can still help for CPU bound readers.  Other executors
+    may be added with register().
+    """
+
+    # name => (factory(max_workers), whether workers share our memory)
+    _executors = {}
+
+    @classmethod
+    def register(cls, name, factory, shares_memory=True):
+        cls._executors[name] = (factory, shares_memory)
+
+    def __init__(self, kind=DEFAULT_EXECUTOR, workers=None):
+        self._kind = None
+        self._workers = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+        self.kind = kind
+        self.workers = workers
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @kind.setter
+    def kind(self, value):
+        if value not in self._executors:
+            raise NotImplementedError(
+                "'{}' is not a valid executor, choose one of: {}".format(
+                    value, ", ".join(sorted(self._executors))))
+        self.shutdown()
+        self._kind = value
+
+    @property
+    def workers(self):
+        return self._workers
+
+    @workers.setter
+    def workers(self, value):
+        self.shutdown()
+        self._workers = multiprocessing.cpu_count() \
+            if value is None else max(1, int(value))
+
+    @property
+    def shares_memory(self):
+        """True if submitted functions run in this process."""
+        return self._executors[self._kind][1]
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                factory, _ = self._executors[self._kind]
+                self._executor = factory(self._workers)
+            return self._executor
+
+    def map(self, fn, iterable):
+        """Yield fn(item) for each item in iterable,  in order.
+
+        At most twice as many calls as there are workers are queued ahead
+        of the results that have been consumed,  so results that finish
+        early don't pile up in memory.
+        """
+        executor = self.executor
+        pending = deque()
+
+        try:
+            for item in iterable:
+                pending.append(executor.submit(fn, item))
+                if len(pending) > 2 * self._workers:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+ReadExecutor.register('serial', SerialExecutor)
+ReadExecutor.register('thread', ThreadPoolExecutor)
+ReadExecutor.register('process', ProcessPoolExecutor, shares_memory=False)
+
+
+read_executor = ReadExecutor()
@@ -1,45 +1,78 @@
 from collections import namedtuple
 from functools import wraps
+import math
 import os
 import re
 
+from affine import Affine
 import numpy as np
 import pkg_resources as pr
-import rasterio as rio
+
+from .buffers import nodata_mask
+from .pool import dataset_pool
+from .stats import (BandStats,
+                    compute_stats,
+                    read_sidecar,
+                    write_sidecar)
+from ..cache import LRUCache
+
+
+# Default size of the process-wide cache of decoded raster blocks
+DEFAULT_BLOCK_CACHE_MB = 256
+
+# Decoded blocks are shared by every reader in the kernel and keyed by
+# (dataset, band, block row, block column).  See RasterIOReader._get_block
+block_cache = LRUCache(DEFAULT_BLOCK_CACHE_MB * 1024 * 1024)
+
+# Approximate number of bytes read at a time by reads that bypass the
+# block cache,  i.e. computing statistics and very large windows
+CHUNK_SIZE = 64 * 1024 * 1024
+
+
+# numpy versions of the rounding functions passed to index()
+_UFUNCS = {math.floor: np.floor, math.ceil: np.ceil}
 
 
 BBox = namedtuple('BBox', ['ulx', 'uly', 'lrx', 'lry'])
 
 
-class BandStats(object):
-    MIN = u'STATISTICS_MINIMUM'
-    MAX = u'STATISTICS_MAXIMUM'
-    MEAN = u'STATISTICS_MEAN'
-    STDDEV = u'STATISTICS_STDDEV'
+def check_index(reader, index):
+    assert not index < 1, \
+        IndexError("Bands are indexed from 1")
+
+    assert not index > reader.count, \
+        IndexError("Band index out of range")
 
 
 def validate_index(func):
     @wraps(func)
     def _validate_index(self, index, *args, **kwargs):
-        assert not index < 1, \
-            IndexError("Bands are indexed from 1")
-
-        assert not index > self.count, \
-            IndexError("Band index out of range")
-
+        check_index(self, index)
         return func(self, index, *args, **kwargs)
     return _validate_index
 
 
+# Map of file extension to reader class,  loaded from the
+# 'geonotebook.wrappers.raster.file' entry points on first use.
+_file_readers = {}
+
+
 def FileIOReader(uri):
     ext = os.path.splitext(uri)[1][1:]
 
-    for ep in pr.iter_entry_points(group='geonotebook.wrappers.raster.file'):
-        if ep.name == ext:
-            return ep.load()(uri)
+    if not _file_readers:
+        for ep in pr.iter_entry_points(
+                group='geonotebook.wrappers.raster.file'):
+            _file_readers.setdefault(ep.name, ep.load())
 
-    raise NotImplementedError(
-        "Could not parse '{}', extension '{}' has no reader.".format(uri, ext))
+    try:
+        reader = _file_readers[ext]
+    except KeyError:
+        raise NotImplementedError(
+            "Could not parse '{}', extension '{}' has no reader.".format(
+                uri, ext))
+
+    return reader(uri)
 
 
 class RasterIOReader(object):
@@ -48,13 +81,26 @@ class RasterIOReader(object):
     def __init__(self, uri, band_names=None):
         self.uri = uri
         self.band_names = []
-        self._dataset = None
+        self._cache_key = None
+        self._metadata = None
+        self._stats = {}
 
     @property
     def dataset(self):
-        if self._dataset is None:
-            self._dataset = rio.open(self.path)
-        return self._dataset
+        # Handles are owned by the pool,  which closes them when they
+        # have not been used recently.  Don't hold on to this object.
+        return dataset_pool.get(self.path)
+
+    @property
+    def cache_key(self):
+        # Include the modification time so blocks cached from a file
+        # are not served after that file has been rewritten on disk.
+        if self._cache_key is None:
+            try:
+                self._cache_key = (self.path, os.path.getmtime(self.path))
+            except OSError:
+                self._cache_key = (self.path, None)
+        return self._cache_key
 
     @property
     def path(self):
@@ -65,34 +111,100 @@ class RasterIOReader(object):
             # and that our path does not include scheme portion
             return self.uri
 
-    def __del__(self):
-        self.dataset.close()
-
-    def index(self, *args, **kwargs):
-        return self.dataset.index(*args, **kwargs)
+    def index(self, x, y, op=math.floor):
+        """Return the (row, col) of the pixel holding coordinates x, y.
+
+        If x or y are arrays every point is transformed in one numpy
+        operation and arrays of rows and cols are returned.  op rounds
+        the fractional pixel position,  math.floor and math.ceil are
+        replaced by their numpy ufuncs for arrays.
+        """
+        if not (np.ndim(x) or np.ndim(y)):
+            col, row = ~self.affine * (x, y)
+            return int(op(row)), int(op(col))
+
+        op = _UFUNCS.get(op, op)
+        a, b, c, d, e, f = tuple(~self.affine)[:6]
+        xs, ys = np.asarray(x, dtype=np.float64), \
+            np.asarray(y, dtype=np.float64)
+        return (op(d * xs + e * ys + f).astype(np.int64),
+                op(a * xs + b * ys + c).astype(np.int64))
 
     def read(self, *args, **kwargs):
         return self.dataset.read(*args, **kwargs)
 
+    @property
+    def metadata(self):
+        """Dataset level metadata as a dict of JSON serializable values.
+
+        Read from the dataset the first time it is needed unless it has
+        already been provided by the metadata catalog (see catalog.py).
+        """
+        if self._metadata is None:
+            self._metadata = self._read_metadata()
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, value):
+        self._metadata = value
+
+    def _read_metadata(self):
+        dataset = self.dataset
+
+        try:
+            # rasterio < 1.0 has the Affine as 'affine',  and a GDAL
+            # geotransform as 'transform'
+            affine = dataset.affine
+        except AttributeError:
+            affine = dataset.transform
+
+        return {
+            'count': dataset.count,
+            'height': dataset.height,
+            'width': dataset.width,
+            'dtypes': list(dataset.dtypes),
+            'nodata': list(dataset.nodatavals),
+            'bounds': list(dataset.bounds),
+            'res': list(dataset.res),
+            # GDAL geotransform order,  as used by VRTs
+            'transform': list(affine.to_gdal()),
+            'crs': dataset.crs.to_string() if dataset.crs else None,
+            'block_shapes': [list(s) for s in dataset.block_shapes]
+        }
+
     # Dataset level API
     @property
     def count(self):
-        return self.dataset.count
+        return self.metadata['count']
 
     @property
     def height(self):
-        return self.dataset.height
+        return self.metadata['height']
 
     @property
     def width(self):
-        return self.dataset.width
+        return self.metadata['width']
+
+    @property
+    def res(self):
+        return tuple(self.metadata['res'])
+
+    @property
+    def dtype(self):
+        return np.result_type(*self.metadata['dtypes'])
+
+    @property
+    def affine(self):
+        return Affine.from_gdal(*self.metadata['transform'])
+
+    @property
+    def crs(self):
+        return self.metadata['crs']
 
     @property
     def bounds(self):
-        return BBox(self.dataset.bounds.left,
-                    self.dataset.bounds.top,
-                    self.dataset.bounds.right,
-                    self.dataset.bounds.bottom)
+        left, bottom, right, top = self.metadata['bounds']
+        return BBox(left, top, right, bottom)
 
     def _get_band_tag(self, index, prop, convert=float):
         return convert(self.dataset.tags(index)[prop])
@@ -100,38 +212,140 @@ class RasterIOReader(object):
     def get_band_ix(self, indexes, x, y):
         return list(self.dataset.sample([(x, y)], indexes=indexes))[0]
 
+    def sample(self, indexes, xs, ys, masked=True):
+        """Sample bands at arrays of x and y coordinates.
+
+        Returns an array of shape (len(xs), len(indexes)).  Points are
+        grouped by the block they fall in so every block is fetched (from
+        the block cache or the dataset) once.  If masked is True points
+        outside the raster or on nodata are masked.
+        """
+        for index in indexes:
+            check_index(self, index)
+
+        rows, cols = self.index(np.ravel(xs), np.ravel(ys))
+
+        dtype = np.result_type(
+            *[self.metadata['dtypes'][i - 1] for i in indexes])
+        data = np.zeros((len(rows), len(indexes)), dtype=dtype)
+
+        inside = (rows >= 0) & (rows < self.height) & \
+            (cols >= 0) & (cols < self.width)
+
+        block_rows, block_cols = \
+            self.metadata['block_shapes'][indexes[0] - 1]
+
+        points = np.flatnonzero(inside)
+        block_i, block_j = rows[points] // block_rows, \
+            cols[points] // block_cols
+
+        order = np.lexsort((block_j, block_i))
+        points, block_i, block_j = \
+            points[order], block_i[order], block_j[order]
+
+        breaks = np.flatnonzero((np.diff(block_i) != 0) |
+                                (np.diff(block_j) != 0)) + 1
+
+        for start, stop in zip([0] + breaks.tolist(),
+                               breaks.tolist() + [len(points)]):
+            if start == stop:
+                continue
+
+            i, j = int(block_i[start]), int(block_j[start])
+            found = self._get_blocks(indexes, [(i, j)])
+
+            p = points[start:stop]
+            r, c = rows[p] - i * block_rows, cols[p] - j * block_cols
+            for k, index in enumerate(indexes):
+                data[p, k] = found[(index, i, j)][r, c]
+
+        if not masked:
+            return data
+
+        mask = np.empty(data.shape, dtype=bool)
+        for k, index in enumerate(indexes):
+            nodata_mask(data[:, k], self.get_band_nodata(index),
+                        out=mask[:, k])
+        mask[~inside] = True
+
+        return np.ma.MaskedArray(data, mask=mask)
+
     # Band level API
     @validate_index
     def get_band_min(self, index, **kwargs):
-        try:
-            return self._get_band_tag(index, BandStats.MIN)
-        except KeyError:
-            return self.get_band_data(index, masked=True).min()
+        return self._get_band_stat(index, BandStats.MIN)
 
     @validate_index
     def get_band_max(self, index, **kwargs):
-        try:
-            return self._get_band_tag(index, BandStats.MAX)
-        except KeyError:
-            return self.get_band_data(index, masked=True).max()
+        return self._get_band_stat(index, BandStats.MAX)
 
     @validate_index
     def get_band_mean(self, index, **kwargs):
-        try:
-            return self._get_band_tag(index, BandStats.MEAN)
-        except KeyError:
-            return self.get_band_data(index, masked=True).mean()
+        return self._get_band_stat(index, BandStats.MEAN)
 
     @validate_index
     def get_band_stddev(self, index, **kwargs):
+        return self._get_band_stat(index, BandStats.STDDEV)
+
+    @validate_index
+    def get_band_count(self, index, **kwargs):
+        return self.get_band_stats(index)[BandStats.COUNT]
+
+    def _get_band_stat(self, index, prop):
         try:
-            return self._get_band_tag(index, BandStats.STDDEV)
+            return self._get_band_tag(index, prop)
         except KeyError:
-            return self.get_band_data(index, masked=True).std()
+            return self.get_band_stats(index)[prop]
+
+    @validate_index
+    def get_band_stats(self, index):
+        """Return a dict of statistics for a band.
+
+        Statistics are looked up in memory, then in the dataset's PAM
+        sidecar.  If neither has them they are computed for all bands in
+        one streaming pass over the dataset and written to the sidecar
+        so later sessions can reuse them.
+        """
+        if index not in self._stats:
+            self._stats.update(read_sidecar(self.path))
+
+        if index not in self._stats:
+            indexes = range(1, self.count + 1)
+            stats = compute_stats(self._iter_stats_chunks(indexes),
+                                  indexes, self.width * self.height)
+            write_sidecar(self.path, stats)
+            self._stats.update(stats)
+
+        return self._stats[index]
+
+    def _strip_rows(self, indexes, cols, chunk_size=None):
+        # Number of rows (a multiple of the block height) to read at a time
+        # so a strip of 'cols' columns holds about chunk_size bytes.
+        if chunk_size is None:
+            chunk_size = CHUNK_SIZE
+
+        block_rows = self.metadata['block_shapes'][indexes[0] - 1][0]
+        row_bytes = len(indexes) * cols * max(
+            np.dtype(self.metadata['dtypes'][i - 1]).itemsize for i in indexes)
+        return max(1, chunk_size // max(1, row_bytes * block_rows)) * \
+            block_rows
+
+    def _iter_stats_chunks(self, indexes, chunk_size=None):
+        """Yield masked full width strips of rows for computing statistics.
+
+        Strips are aligned to the block layout and hold about
+        ``chunk_size`` bytes.  They are read directly from the dataset so
+        a statistics pass doesn't flush the shared block cache.
+        """
+        rows = self._strip_rows(indexes, self.width, chunk_size)
+
+        for row in range(0, self.height, rows):
+            window = ((row, min(row + rows, self.height)), (0, self.width))
+            yield self._mask(self._read_raw(indexes, window), indexes, 0)
 
     @validate_index
     def get_band_nodata(self, index):
-        return self.dataset.nodatavals[index - 1]
+        return self.metadata['nodata'][index - 1]
 
     @validate_index
     def get_band_name(self, index, default=None):
@@ -144,22 +358,219 @@ class RasterIOReader(object):
             return default
 
     @validate_index
-    def get_band_data(self, index, window=None, masked=True, **kwargs):
-
-        def _get_band_data():
-            if window is None:
-                return self.dataset.read(index)
-
-            (ulx, uly), (lrx, lry) = window
-
-            return self.dataset.read(index, window=((ulx, lrx), (uly, lry)))
+    def get_band_data(self, index, window=None, masked=True,
+                      out_shape=None, out=None, **kwargs):
+        if out is not None:
+            out = out[np.newaxis]
+
+        return self.get_data([index], window=window, masked=masked, axis=0,
+                             out_shape=out_shape, out=out)[0]
+
+    def get_data(self, indexes, window=None, masked=True, axis=2,
+                 out_shape=None, out=None, **kwargs):
+        """Read several bands into a single array.
+
+        All bands are fetched together and written into one array with
+        the band dimension on ``axis``.  If ``masked`` is True each band
+        is masked with its own nodata value.  If ``out_shape`` is given the
+        window is resampled to (rows, cols),  see _read_window.
+
+        If ``out`` is given the data is written into it and no other array
+        of its size is allocated.  If it is a masked array the nodata mask
+        is written into its mask.  See buffers.empty()
+        """
+        for index in indexes:
+            check_index(self, index)
+
+        mask = None
+        if np.ma.isMaskedArray(out):
+            if out.mask is not np.ma.nomask:
+                mask = out.mask
+            out = out.data
+
+        data = self._read_window(indexes, window, axis=axis,
+                                 out_shape=out_shape, out=out)
 
         if masked:
-            return np.ma.masked_values(
-                _get_band_data(), self.get_band_nodata(index)
-            )
+            return self._mask(data, indexes, axis, mask=mask)
         else:
-            return _get_band_data()
+            return data
+
+    def _mask(self, data, indexes, axis, mask=None):
+        if mask is None:
+            mask = np.empty(data.shape, dtype=bool)
+
+        bands, band_masks = np.moveaxis(data, axis, 0), \
+            np.moveaxis(mask, axis, 0)
+
+        for band, band_mask, index in zip(bands, band_masks, indexes):
+            nodata_mask(band, self.get_band_nodata(index), out=band_mask)
+
+        return np.ma.array(data, mask=mask, copy=False)
+
+    # Block level API
+    #
+    # Note: The block layout of the first requested band is used for all
+    #       bands in a read.  GDAL formats that support per band block
+    #       sizes virtually never use them.
+    def _clip_window(self, window):
+        """Convert a ((ulx, uly), (lrx, lry)) window to clipped ranges.
+
+        Returns ((row_start, row_stop), (col_start, col_stop)) limited
+        to the extent of the dataset.
+        """
+        if window is None:
+            return (0, self.height), (0, self.width)
+
+        (ulx, uly), (lrx, lry) = window
+
+        def _clip(start, stop, size):
+            start = min(max(start, 0), size)
+            return start, min(max(stop, start), size)
+
+        return _clip(ulx, lrx, self.height), _clip(uly, lry, self.width)
+
+    def _block_window(self, index, i, j):
+        block_rows, block_cols = self.metadata['block_shapes'][index - 1]
+        return ((i * block_rows, min((i + 1) * block_rows, self.height)),
+                (j * block_cols, min((j + 1) * block_cols, self.width)))
+
+    def _read_raw(self, indexes, window, out=None):
+        """Read a ((row_start, row_stop), (col_start, col_stop)) window.
+
+        Every read that isn't served by the block cache goes through
+        here.  If out is given the window is resampled to its shape.
+        """
+        if out is None:
+            return self.dataset.read(list(indexes), window=window)
+        return self.dataset.read(list(indexes), window=window, out=out)
+
+    def _get_blocks(self, indexes, blocks):
+        """Return a {(index, i, j): ndarray} dict of decoded blocks.
+
+        Blocks are served from the shared block cache where possible.  The
+        missing blocks are fetched for all bands with a single read of the
+        smallest block-aligned window that contains all of them, then split
+        up and added to the cache.
+        """
+        found, missing, missing_bands = {}, set(), set()
+        for index in set(indexes):
+            for i, j in blocks:
+                block = block_cache.get(self.cache_key + (index, i, j))
+                if block is None:
+                    missing.add((i, j))
+                    missing_bands.add(index)
+                else:
+                    found[(index, i, j)] = block
+
+        if not missing:
+            return found
+
+        (row_start, _), (col_start, _) = self._block_window(
+            indexes[0], min(i for i, _ in missing),
+            min(j for _, j in missing))
+        (_, row_stop), (_, col_stop) = self._block_window(
+            indexes[0], max(i for i, _ in missing),
+            max(j for _, j in missing))
+
+        missing_bands = sorted(missing_bands)
+        data = self._read_raw(
+            missing_bands, ((row_start, row_stop), (col_start, col_stop)))
+
+        for band, index in zip(data, missing_bands):
+            for i, j in missing:
+                if (index, i, j) in found:
+                    continue
+
+                (r0, r1), (c0, c1) = self._block_window(indexes[0], i, j)
+                # Copy so the cached block doesn't keep all of 'data' alive
+                block = band[r0 - row_start:r1 - row_start,
+                             c0 - col_start:c1 - col_start].copy()
+                found[(index, i, j)] = block_cache.put(
+                    self.cache_key + (index, i, j), block)
+
+        return found
+
+    def _read_window(self, indexes, window, axis=0, out_shape=None,
+                     out=None):
+        """Read a window of bands into one array.
+
+        The result has the band dimension on ``axis``.  It is assembled
+        from cached blocks unless it is too large to ever fit in the cache,
+        in which case it is read from the dataset in strips.  If ``out`` is
+        given the result is written into it.
+
+        If ``out_shape`` is a (rows, cols) tuple the window is resampled
+        to that shape by GDAL.  Decimated reads are served from the
+        dataset's internal or external (.ovr) overviews when they exist.
+        """
+        (row_start, row_stop), (col_start, col_stop) = \
+            self._clip_window(window)
+
+        rows, cols = row_stop - row_start, col_stop - col_start
+        dtype = np.result_type(
+            *[self.metadata['dtypes'][i - 1] for i in indexes])
+
+        shape = [rows, cols] if out_shape is None else list(out_shape)
+        shape.insert(axis, len(indexes))
+
+        if out is None:
+            out = np.empty(shape, dtype=dtype)
+        elif out.shape != tuple(shape):
+            raise ValueError(
+                "out has shape {}, the read needs {}".format(
+                    out.shape, tuple(shape)))
+
+        if rows == 0 or cols == 0:
+            return out
+
+        # View with the band dimension first, writes go straight to 'out'
+        bands = np.moveaxis(out, axis, 0)
+
+        if out_shape is not None:
+            window = ((row_start, row_stop), (col_start, col_stop))
+            if bands.flags.c_contiguous and bands.dtype == dtype:
+                self._read_raw(indexes, window, out=bands)
+            else:
+                data = np.empty(bands.shape, dtype=dtype)
+                self._read_raw(indexes, window, out=data)
+                bands[...] = data
+            return out
+
+        # Reads that could never fit in the cache go straight to the
+        # dataset rather than flushing every other cached block.
+        if len(indexes) * rows * cols * dtype.itemsize > \
+           block_cache.capacity:
+            step = self._strip_rows(indexes, cols)
+            for row in range(row_start // step * step, row_stop, step):
+                r0, r1 = max(row, row_start), min(row + step, row_stop)
+                bands[:, r0 - row_start:r1 - row_start] = self._read_raw(
+                    indexes, ((r0, r1), (col_start, col_stop)))
+            return out
+
+        block_rows, block_cols = \
+            self.metadata['block_shapes'][indexes[0] - 1]
+        blocks = [(i, j)
+                  for i in range(row_start // block_rows,
+                                 (row_stop - 1) // block_rows + 1)
+                  for j in range(col_start // block_cols,
+                                 (col_stop - 1) // block_cols + 1)]
+
+        found = self._get_blocks(indexes, blocks)
+
+        for i, j in blocks:
+            (r0, r1), (c0, c1) = self._block_window(indexes[0], i, j)
+            r0, r1 = max(r0, row_start), min(r1, row_stop)
+            c0, c1 = max(c0, col_start), min(c1, col_stop)
+
+            for band, index in zip(bands, indexes):
+                band[r0 - row_start:r1 - row_start,
+                     c0 - col_start:c1 - col_start] = \
+                    found[(index, i, j)][
+                        r0 - i * block_rows:r1 - i * block_rows,
+                        c0 - j * block_cols:c1 - j * block_cols]
+
+        return out
 
 
 class VRTReader(RasterIOReader):
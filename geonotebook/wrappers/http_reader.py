@@ -0,0 +1,201 @@
+from functools import wraps
+
+import numpy as np
+import rasterio as rio
+import requests
+
+from . import file_reader
+from .file_reader import RasterIOReader, validate_index
+from .stats import BandStats, compute_stats
+from ..cache import LRUCache
+
+
+# GDAL configuration used while reading over HTTP,  see
+# https://trac.osgeo.org/gdal/wiki/ConfigOptions
+GDAL_HTTP_OPTIONS = {
+    # Don't look for sidecar files (.ovr, .aux.xml, ...) by listing the
+    # "directory",  object stores rarely support it
+    'GDAL_DISABLE_READDIR_ON_OPEN': 'EMPTY_DIR',
+    # Fetch the header and tile index of a COG with the first request
+    'GDAL_INGESTED_BYTES_AT_OPEN': '65536',
+    # Coalesce requests for adjacent byte ranges (e.g. neighbouring tiles)
+    'GDAL_HTTP_MERGE_CONSECUTIVE_RANGES': 'YES',
+    'GDAL_HTTP_MULTIPLEX': 'YES',
+    # Keep fetched byte ranges in memory,  decoded blocks are kept in the
+    # shared block cache (see file_reader.block_cache)
+    'VSI_CACHE': 'TRUE',
+    'VSI_CACHE_SIZE': str(64 * 1024 * 1024),
+    'CPL_VSIL_CURL_CACHE_SIZE': str(64 * 1024 * 1024),
+}
+
+
+# Number of uris whose statistics and validators are kept
+MAX_CACHED_URIS = 1024
+
+# Seconds to wait for the headers of an object
+VALIDATOR_TIMEOUT = 10
+
+# Statistics of remote rasters by (uri, validator),  there is no sidecar to
+# keep them in and every reader of a uri shares them
+_stats = LRUCache(MAX_CACHED_URIS, sizeof=lambda stats: 1)
+
+# The validator last seen for a uri,  a reader that sees another one knows
+# the object was rewritten
+_validators = LRUCache(MAX_CACHED_URIS, sizeof=lambda validator: 1)
+
+
+def _fetch_validator(uri):
+    # The ETag (or Last-Modified) of the object at uri,  None if the
+    # server sends neither or can't be asked
+    try:
+        response = requests.head(uri, allow_redirects=True,
+                                 timeout=VALIDATOR_TIMEOUT)
+    except requests.RequestException:
+        return None
+
+    if not response.ok:
+        return None
+    return response.headers.get('ETag') or \
+        response.headers.get('Last-Modified')
+
+
+def _in_env(func):
+    # Run func with GDAL configured for HTTP reads
+    @wraps(func)
+    def _wrapper(self, *args, **kwargs):
+        with rio.Env(**self.gdal_options):
+            return func(self, *args, **kwargs)
+    return _wrapper
+
+
+class HTTPReader(RasterIOReader):
+    """Read rasters (ideally Cloud Optimized GeoTIFFs) over http(s).
+
+    Datasets are opened through GDAL's /vsicurl/ driver which fetches
+    byte ranges as they are needed.  The header is read once when the
+    metadata is first needed and handles stay open in the dataset pool.
+    Missing blocks of a read are fetched together (see _get_blocks) so
+    GDAL can merge their byte ranges into a single request,  and decoded
+    blocks are kept in the shared block cache.  If prefetch_overviews is
+    True the smallest overview is read along with the metadata so zoomed
+    out views and decimated reads are served without more requests.
+
+    Cached blocks and statistics are keyed by the object's ETag (or
+    Last-Modified) as it was when the reader first needed it,  readers
+    created after the object was rewritten don't see the old data.
+    """
+
+    prefetch_overviews = True
+
+    def __init__(self, uri, band_names=None, gdal_options=None):
+        super(HTTPReader, self).__init__(uri, band_names=band_names)
+        self.gdal_options = dict(GDAL_HTTP_OPTIONS, **(gdal_options or {}))
+
+    @property
+    def path(self):
+        return '/vsicurl/' + self.uri
+
+    @property
+    def cache_key(self):
+        if self._cache_key is None:
+            validator = _fetch_validator(self.uri)
+            previous = _validators.get(self.uri)
+            _validators.put(self.uri, validator)
+
+            if previous is not None and previous != validator:
+                self._refresh()
+            self._cache_key = (self.path, validator)
+        return self._cache_key
+
+    @property
+    def dataset(self):
+        # Check the object wasn't rewritten before its first use
+        self.cache_key
+        return super(HTTPReader, self).dataset
+
+    @_in_env
+    def _refresh(self):
+        # Close the handles on the old object and have GDAL fetch the new
+        # one rather than serve the byte ranges it cached.  GDAL splits
+        # CPL_VSIL_CURL_NON_CACHED on ':',  which only widens it to the
+        # other urls of the scheme for the duration of this open.
+        file_reader.dataset_pool.invalidate(self.path)
+        with rio.Env(CPL_VSIL_CURL_NON_CACHED=self.path):
+            file_reader.dataset_pool.get(self.path)
+
+    @_in_env
+    def _read_metadata(self):
+        metadata = super(HTTPReader, self)._read_metadata()
+
+        dataset = self.dataset
+        metadata['overviews'] = [dataset.overviews(i)
+                                 for i in range(1, dataset.count + 1)]
+
+        if self.prefetch_overviews and metadata['overviews'][0]:
+            self._prefetch(metadata)
+
+        return metadata
+
+    def _prefetch(self, metadata):
+        # A decimated read of the whole dataset is served from the
+        # overview with the given factor,  GDAL keeps the bytes it fetched
+        # in its cache.
+        factor = metadata['overviews'][0][-1]
+        shape = (max(1, metadata['height'] // factor),
+                 max(1, metadata['width'] // factor))
+
+        dtype = np.result_type(*metadata['dtypes'])
+        out = np.empty((metadata['count'],) + shape, dtype=dtype)
+        self.dataset.read(list(range(1, metadata['count'] + 1)), out=out)
+        return out
+
+    @validate_index
+    @_in_env
+    def get_band_stats(self, index):
+        """Return a dict of statistics for a band.
+
+        Statistics are estimated from the smallest overview (the one
+        prefetched with the metadata) rather than streaming the whole
+        object,  rasters without overviews are read at full resolution.
+        """
+        key = (self.uri, self.cache_key[1])
+        stats = _stats.get(key)
+
+        if stats is None:
+            indexes = list(range(1, self.count + 1))
+            if self.metadata['overviews'][0]:
+                data = self._mask(self._prefetch(self.metadata), indexes, 0)
+                stats = compute_stats([data], indexes, data[0].size)
+
+                # Valid pixels of the overview stand for factor ** 2 each
+                for band in stats.values():
+                    band[BandStats.COUNT] = int(round(
+                        band[BandStats.VALID_PERCENT] / 100.0 *
+                        self.width * self.height))
+            else:
+                stats = compute_stats(self._iter_stats_chunks(indexes),
+                                      indexes, self.width * self.height)
+
+            _stats.put(key, stats)
+
+        return stats[index]
+
+    @_in_env
+    def _read_raw(self, indexes, window, out=None):
+        return super(HTTPReader, self)._read_raw(indexes, window, out=out)
+
+    @_in_env
+    def read(self, *args, **kwargs):
+        return super(HTTPReader, self).read(*args, **kwargs)
+
+    @_in_env
+    def _get_band_tag(self, index, prop, convert=float):
+        return super(HTTPReader, self)._get_band_tag(index, prop, convert)
+
+    @_in_env
+    def get_band_ix(self, indexes, x, y):
+        return super(HTTPReader, self).get_band_ix(indexes, x, y)
+
+    @_in_env
+    def get_band_name(self, index, default=None):
+        return super(HTTPReader, self).get_band_name(index, default)
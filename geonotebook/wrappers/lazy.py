@@ -0,0 +1,315 @@
+import numpy as np
+
+
+# Dimensions of every LazyArray,  dimensions a source doesn't have
+# (time for a RasterData,  bands for single band data) are hidden.
+TIME, ROWS, COLS, BANDS = range(4)
+
+
+def _chunk_slices(seq, size):
+    """Split positions in seq into slices that each fall in one chunk."""
+    if len(seq) == 0:
+        return []
+
+    ids = np.asarray(seq) // size
+    breaks = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+    bounds = [0] + breaks.tolist() + [len(seq)]
+    return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def _bounds(seq):
+    # Smallest (start, stop) containing seq,  and the slice of that
+    # range that gives seq.
+    if len(seq) == 0:
+        return (0, 0), slice(0, 0)
+    lo, hi = min(seq[0], seq[-1]), max(seq[0], seq[-1]) + 1
+    step = seq[1] - seq[0] if len(seq) > 1 else 1
+    return (lo, hi), slice(seq[0] - lo, None if step < 0 else hi - lo, step)
+
+
+class LazyArray(object):
+    """A chunked,  read-on-demand view of a RasterData or collection.
+
+    Indexing with ints and slices returns another LazyArray without
+    reading anything.  Data is read by np.asarray() / read(),  and by the
+    reductions (sum, min, max, mean, std, count) which work through the
+    view one chunk at a time.  Only the blocks a view touches are read.
+
+    Chunks are aligned to the native block size of the data,  a chunk
+    holds a single time step and all bands.  Dimensions are ordered like
+    the result of get_data:  (time, rows, cols, bands) without the time
+    dimension for a RasterData and without bands for single band data.
+    """
+
+    def __init__(self, source, masked=True, _dims=None):
+        self.source = source
+        self.masked = masked
+
+        if _dims is not None:
+            self._dims = _dims
+            return
+
+        # Each dimension is a (sequence of source indexes, visible) pair
+        rd = source if not hasattr(source, '_items') else source[0]
+        collection = rd is not source
+
+        self._dims = [
+            (range(len(source)) if collection else range(1), collection),
+            (range(rd.reader.height), True),
+            (range(rd.reader.width), True),
+            (list(source.band_indexes), len(source.band_indexes) > 1)
+        ]
+
+    @property
+    def _rd(self):
+        return self.source if not hasattr(self.source, '_items') \
+            else self.source[0]
+
+    @property
+    def _visible(self):
+        return [d for d, (_, visible) in enumerate(self._dims) if visible]
+
+    @property
+    def shape(self):
+        return tuple(len(self._dims[d][0]) for d in self._visible)
+
+    @property
+    def ndim(self):
+        return len(self._visible)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def dtype(self):
+        return np.dtype(getattr(self._rd.reader, 'dtype', np.float64))
+
+    @property
+    def _block_shape(self):
+        try:
+            return tuple(self._rd.reader.metadata['block_shapes'][
+                self._dims[BANDS][0][0] - 1])
+        except (AttributeError, IndexError, KeyError):
+            return self._rd.reader.height, self._rd.reader.width
+
+    @property
+    def chunks(self):
+        """The chunk size of each dimension."""
+        sizes = (1,) + self._block_shape + (len(self._dims[BANDS][0]),)
+        return tuple(sizes[d] for d in self._visible)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return "LazyArray(shape={}, dtype={}, chunks={})".format(
+            self.shape, self.dtype, self.chunks)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        if any(k is Ellipsis for k in key):
+            i = key.index(Ellipsis)
+            key = key[:i] + (slice(None),) * (self.ndim - len(key) + 1) + \
+                key[i + 1:]
+
+        if len(key) > self.ndim:
+            raise IndexError("too many indices for LazyArray")
+
+        dims = list(self._dims)
+        for d, k in zip(self._visible, key):
+            seq, _ = dims[d]
+            if isinstance(k, slice):
+                dims[d] = (seq[k], True)
+            elif isinstance(k, (int, np.integer)):
+                dims[d] = ([seq[k]], False)
+            else:
+                raise IndexError(
+                    "LazyArray may only be indexed by ints and slices")
+
+        view = LazyArray(self.source, self.masked, _dims=dims)
+
+        # Nothing left to be lazy about
+        if view.ndim == 0:
+            return view.read()[()]
+
+        return view
+
+    def _read_step(self, t, out):
+        # Read time step t (a source index) of the view into out,  an
+        # array of shape (rows, cols, bands).
+        rows, cols, bands = [self._dims[d][0] for d in (ROWS, COLS, BANDS)]
+        if not (len(rows) and len(cols) and len(bands)):
+            return
+
+        (r0, r1), rslice = _bounds(rows)
+        (c0, c1), cslice = _bounds(cols)
+
+        if hasattr(self.source, '_items'):
+            rd = self.source[t, list(bands)]
+        else:
+            rd = self.source[list(bands)]
+
+        # Single band reads return (rows, cols)
+        data = rd.get_data(window=((r0, c0), (r1, c1)), masked=self.masked,
+                           axis=2, max_bytes=0)
+        if np.ndim(data) == 2:
+            data = data[..., np.newaxis]
+
+        out[...] = data[rslice, cslice]
+
+    def read(self):
+        """Read the view into a numpy (masked) array."""
+        times = self._dims[TIME][0]
+        shape = tuple(len(self._dims[d][0]) for d in range(4))
+
+        data = np.empty(shape, dtype=self.dtype)
+        mask = np.zeros(shape, dtype=bool) if self.masked else None
+
+        for i, t in enumerate(times):
+            if self.masked:
+                out = np.ma.MaskedArray(data[i], mask=mask[i], copy=False)
+                self._read_step(t, out)
+                mask[i] = np.ma.getmaskarray(out)
+            else:
+                self._read_step(t, data[i])
+
+        # Drop the hidden dimensions,  they all have a length of one
+        data = data.reshape(self.shape)
+
+        if self.masked:
+            return np.ma.MaskedArray(data, mask=mask.reshape(self.shape),
+                                     copy=False)
+        return data
+
+    def __array__(self, dtype=None):
+        data = np.ma.getdata(self.read())
+        return data if dtype is None else data.astype(dtype)
+
+    def iter_chunks(self):
+        """Yield (index, LazyArray) pairs for each chunk of the view.
+
+        index is a tuple of slices giving the position of the chunk in
+        the view.
+        """
+        rows, cols = self._block_shape
+        sizes = {TIME: 1, ROWS: rows, COLS: cols}
+
+        splits = []
+        for d in range(4):
+            seq = self._dims[d][0]
+            if d == BANDS:
+                splits.append([slice(None)])
+            else:
+                splits.append(_chunk_slices(seq, sizes[d]))
+
+        for t in splits[TIME]:
+            for r in splits[ROWS]:
+                for c in splits[COLS]:
+                    dims = [(self._dims[d][0][s], self._dims[d][1])
+                            for d, s in enumerate((t, r, c, slice(None)))]
+                    index = tuple(s for d, s in enumerate((t, r, c,
+                                                           slice(None)))
+                                  if self._dims[d][1])
+                    yield index, LazyArray(self.source, self.masked,
+                                           _dims=dims)
+
+    def _reduce(self, axis):
+        """Return the count, sum, mean, M2, min and max over axis.
+
+        Partial results are computed per chunk,  so only one chunk is in
+        memory at a time.  Means and M2 (the sum of squared differences
+        from the mean) are merged with the update of Chan et al.
+        """
+        if axis is None:
+            axis = tuple(range(self.ndim))
+        elif not isinstance(axis, tuple):
+            axis = (axis,)
+        axis = tuple(a % self.ndim for a in axis)
+
+        shape = tuple(1 if a in axis else n
+                      for a, n in enumerate(self.shape))
+
+        count = np.zeros(shape, dtype=np.int64)
+        total = np.zeros(shape, dtype=np.float64)
+        mean = np.zeros(shape, dtype=np.float64)
+        m2 = np.zeros(shape, dtype=np.float64)
+        low = np.full(shape, np.inf)
+        high = np.full(shape, -np.inf)
+
+        for index, chunk in self.iter_chunks():
+            data = chunk.read()
+            if not np.size(data):
+                continue
+
+            valid = ~np.ma.getmaskarray(data)
+            values = np.ma.getdata(data).astype(np.float64)
+
+            target = tuple(slice(None) if a in axis else s
+                           for a, s in enumerate(index))
+
+            n = valid.sum(axis=axis, keepdims=True)
+            chunk_total = np.where(valid, values, 0).sum(
+                axis=axis, keepdims=True)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                chunk_mean = np.where(n > 0, chunk_total / n, 0)
+            chunk_m2 = np.where(valid, (values - chunk_mean) ** 2, 0).sum(
+                axis=axis, keepdims=True)
+
+            n_a = count[target]
+            merged = n_a + n
+            with np.errstate(invalid='ignore', divide='ignore'):
+                delta = chunk_mean - mean[target]
+                mean[target] = np.where(
+                    merged > 0, mean[target] + delta * n / merged, 0)
+                m2[target] += chunk_m2 + np.where(
+                    merged > 0, delta ** 2 * n_a * n / merged, 0)
+
+            count[target] = merged
+            total[target] += chunk_total
+            low[target] = np.minimum(low[target], np.where(
+                valid, values, np.inf).min(axis=axis, keepdims=True))
+            high[target] = np.maximum(high[target], np.where(
+                valid, values, -np.inf).max(axis=axis, keepdims=True))
+
+        return [a.squeeze(axis=axis)
+                for a in (count, total, mean, m2, low, high)]
+
+    def _result(self, value, count, dtype=None):
+        if dtype is not None:
+            with np.errstate(invalid='ignore'):
+                value = value.astype(dtype)
+
+        if self.masked:
+            value = np.ma.masked_where(count == 0, value)
+
+        return value[()] if np.ndim(value) == 0 else value
+
+    def count(self, axis=None):
+        count = self._reduce(axis)[0]
+        return count[()] if np.ndim(count) == 0 else count
+
+    def sum(self, axis=None):
+        total = self._reduce(axis)[1]
+        if not np.issubdtype(self.dtype, np.floating):
+            total = total.astype(np.int64)
+        return total[()] if np.ndim(total) == 0 else total
+
+    def mean(self, axis=None):
+        count, _, mean = self._reduce(axis)[:3]
+        return self._result(mean, count)
+
+    def std(self, axis=None):
+        count, _, _, m2 = self._reduce(axis)[:4]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._result(np.sqrt(m2 / count), count)
+
+    def min(self, axis=None):
+        count, _, _, _, low, _ = self._reduce(axis)
+        return self._result(low, count, self.dtype)
+
+    def max(self, axis=None):
+        count, _, _, _, _, high = self._reduce(axis)
+        return self._result(high, count, self.dtype)
@@ -0,0 +1,207 @@
+import itertools
+import os
+import tempfile
+import threading
+import weakref
+
+from affine import Affine
+import numpy as np
+import rasterio as rio
+from rasterio.crs import CRS
+import six
+
+from .file_reader import RasterIOReader, validate_index
+from .stats import compute_stats
+
+
+# Block size of the files in-memory rasters are written to
+SPILL_BLOCK_SIZE = 256
+
+# Readers of the in-memory rasters that are alive,  by name.  Rasters
+# are forgotten when the last RasterData using them is gone.
+_readers = weakref.WeakValueDictionary()
+_readers_lock = threading.Lock()
+
+_ids = itertools.count()
+
+
+def _crs(crs):
+    if crs is None or isinstance(crs, six.string_types):
+        return crs
+    return CRS(crs).to_string()
+
+
+class MemoryReader(RasterIOReader):
+    """Read a raster held in a numpy array.
+
+    data is a (rows, cols) array or an array of bands with the band
+    dimension on axis (as returned by RasterData.get_data).  It is not
+    copied.  Masked arrays are filled with nodata (their fill_value if
+    nodata is None).  The raster is registered as mem://name for as long
+    as the reader is alive.
+
+    Tile servers can't see the kernel's memory,  spill() writes the
+    raster to a tiled, compressed GeoTIFF the first time one needs it.
+    """
+
+    def __init__(self, data, transform=Affine.identity(), crs=None,
+                 nodata=None, name=None, axis=2):
+        if np.ma.isMaskedArray(data):
+            if nodata is None:
+                nodata = data.fill_value
+            data = data.filled(nodata)
+
+        data = np.asarray(data)
+        if data.ndim == 2:
+            data = data[np.newaxis]
+        elif data.ndim == 3:
+            data = np.moveaxis(data, axis, 0)
+        else:
+            raise ValueError(
+                "Can only read arrays of 2 or 3 dimensions, not {}".format(
+                    data.ndim))
+
+        if not isinstance(transform, Affine):
+            transform = Affine.from_gdal(*transform)
+
+        self._id = next(_ids)
+        name = 'array{}'.format(self._id) if name is None else name
+        super(MemoryReader, self).__init__('mem://' + name)
+
+        self.name = name
+        self.data = data
+        self._spill_path = None
+        self._lock = threading.Lock()
+
+        count, height, width = data.shape
+        xs, ys = zip(transform * (0, 0), transform * (width, height))
+
+        self.metadata = {
+            'count': count,
+            'height': height,
+            'width': width,
+            'dtypes': [data.dtype.name] * count,
+            'nodata': [None if nodata is None else
+                       data.dtype.type(nodata).item()] * count,
+            'bounds': [min(xs), min(ys), max(xs), max(ys)],
+            'res': [abs(transform.a), abs(transform.e)],
+            'transform': list(transform.to_gdal()),
+            'crs': _crs(crs),
+            'block_shapes': [[min(height, SPILL_BLOCK_SIZE),
+                              min(width, SPILL_BLOCK_SIZE)]] * count
+        }
+
+        with _readers_lock:
+            _readers[name] = self
+
+    @classmethod
+    def from_uri(cls, uri):
+        try:
+            return _readers[uri.split('://', 1)[-1]]
+        except KeyError:
+            raise ValueError("There is no in-memory raster {}".format(uri))
+
+    @property
+    def path(self):
+        return self.uri
+
+    @property
+    def cache_key(self):
+        # Unique to this array,  a name can be reused by a new array
+        return (self.uri, self._id)
+
+    @property
+    def dataset(self):
+        raise NotImplementedError(
+            "{} is held in memory,  it has no dataset".format(self.uri))
+
+    def _read_raw(self, indexes, window, out=None):
+        (r0, r1), (c0, c1) = window
+        if out is None:
+            return self.data[:, r0:r1, c0:c1][[i - 1 for i in indexes]]
+
+        # Nearest neighbour resampling to the shape of out
+        rows, cols = out.shape[-2:]
+        ix = r0 + ((np.arange(rows) + 0.5) * (r1 - r0) // rows).astype(int)
+        jx = c0 + ((np.arange(cols) + 0.5) * (c1 - c0) // cols).astype(int)
+        for band, index in zip(out, indexes):
+            band[...] = self.data[index - 1][ix[:, np.newaxis], jx]
+        return out
+
+    def _get_blocks(self, indexes, blocks):
+        # Views of the array,  there is nothing to cache
+        found = {}
+        for index in set(indexes):
+            for i, j in blocks:
+                (r0, r1), (c0, c1) = self._block_window(indexes[0], i, j)
+                found[(index, i, j)] = self.data[index - 1, r0:r1, c0:c1]
+        return found
+
+    def read(self, indexes, window=None, out=None):
+        if window is None:
+            window = ((0, self.height), (0, self.width))
+
+        if isinstance(indexes, int):
+            return self._read_raw([indexes], window, out=None if out is None
+                                  else out[np.newaxis])[0]
+        return self._read_raw(indexes, window, out=out)
+
+    def get_band_ix(self, indexes, x, y):
+        return self.sample(indexes, [x], [y], masked=False)[0]
+
+    def _get_band_tag(self, index, prop, convert=float):
+        raise KeyError(prop)
+
+    @validate_index
+    def get_band_name(self, index, default=None):
+        return "Band {}".format(index) if default is None else default
+
+    @validate_index
+    def get_band_stats(self, index):
+        # There is no sidecar,  statistics are only kept in memory
+        if index not in self._stats:
+            indexes = range(1, self.count + 1)
+            self._stats.update(compute_stats(
+                self._iter_stats_chunks(indexes), indexes,
+                self.width * self.height))
+
+        return self._stats[index]
+
+    def spill(self, directory=None):
+        """Return the path of a tiled GeoTIFF holding the raster.
+
+        The file is written the first time it is needed and removed with
+        the reader.  Changes made to the array after that aren't seen.
+        """
+        with self._lock:
+            if self._spill_path is None:
+                fd, path = tempfile.mkstemp(prefix='geonb', suffix='.tif',
+                                            dir=directory)
+                os.close(fd)
+                self._write(path)
+                self._spill_path = path
+
+        return self._spill_path
+
+    def _write(self, path):
+        count, height, width = self.data.shape
+        tiled = height >= SPILL_BLOCK_SIZE and width >= SPILL_BLOCK_SIZE
+
+        options = dict(driver='GTiff', count=count, height=height,
+                       width=width, dtype=self.data.dtype,
+                       crs=self.crs, transform=self.affine,
+                       nodata=self.metadata['nodata'][0],
+                       compress='deflate', tiled=tiled)
+        if tiled:
+            options.update(blockxsize=SPILL_BLOCK_SIZE,
+                           blockysize=SPILL_BLOCK_SIZE)
+
+        with rio.open(path, 'w', **options) as dst:
+            dst.write(self.data)
+
+    def __del__(self):
+        if getattr(self, '_spill_path', None) is not None:
+            try:
+                os.remove(self._spill_path)
+            except OSError:
+                pass
@@ -0,0 +1,250 @@
+import os
+import re
+import threading
+import weakref
+
+from six.moves.urllib.parse import parse_qs, urlencode, urlparse
+
+from . import file_reader
+from .file_reader import RasterIOReader, validate_index
+from .stats import compute_stats
+
+
+# GDAL driver of each URI scheme and file extension.
+DRIVERS = {
+    'netcdf': 'NETCDF',
+    'nc': 'NETCDF',
+    'nc4': 'NETCDF',
+    'hdf5': 'HDF5',
+    'h5': 'HDF5',
+    'he5': 'HDF5',
+    'zarr': 'ZARR'
+}
+
+SCHEMES = {'NETCDF': 'netcdf', 'HDF5': 'hdf5', 'ZARR': 'zarr'}
+
+# Band tags that hold the value of a non spatial dimension (e.g. time),
+# NetCDF's and Zarr's respectively
+_dim_parser = re.compile(r'^(?:NETCDF_DIM_(\w+)|DIM_(\w+)_VALUE)$')
+
+
+def _parse(uri):
+    # Returns (driver, container path, variable, step) of a uri
+    parsed = urlparse(uri)
+    path = parsed.netloc + parsed.path
+    ext = os.path.splitext(path)[1][1:].lower()
+
+    driver = DRIVERS.get(parsed.scheme, DRIVERS.get(ext))
+    if driver is None:
+        raise NotImplementedError(
+            "Could not parse '{}', no multidimensional driver for it.".format(
+                uri))
+
+    query = parse_qs(parsed.query)
+    variable = query.get('variable', [None])[0]
+    step = query.get('step', [None])[0]
+
+    return driver, os.path.abspath(path), variable, \
+        None if step is None else int(step)
+
+
+def _subdataset(driver, path, variable):
+    # GDAL's name for a variable of a container
+    if variable is None:
+        return path
+    elif driver == 'ZARR':
+        return 'ZARR:"{}":/{}'.format(path, variable.lstrip('/'))
+    elif driver == 'HDF5':
+        return 'HDF5:"{}"://{}'.format(path, variable.lstrip('/'))
+    return '{}:"{}":{}'.format(driver, path, variable)
+
+
+def make_uri(uri, variable=None, step=None):
+    """Return the uri of a variable (or a step of it) of a container."""
+    driver, path, _variable, _ = _parse(uri)
+    query = [(k, v) for k, v in (('variable', variable or _variable),
+                                 ('step', step)) if v is not None]
+
+    uri = '{}://{}'.format(SCHEMES[driver], path)
+    return uri + '?' + urlencode(query) if query else uri
+
+
+def variables(uri):
+    """Return the names of the variables in a NetCDF, HDF5 or Zarr file."""
+    driver, path, _, _ = _parse(uri)
+    return [name.rsplit(':', 1)[1].lstrip('/') for name in
+            file_reader.dataset_pool.get(path).subdatasets]
+
+
+class VariableReader(RasterIOReader):
+    """Read a variable of a NetCDF, HDF5 or Zarr file.
+
+    The variable is opened through GDAL,  which presents every step along
+    its non spatial dimensions (e.g. time) as a band.  The handle is shared
+    by all of the steps (see StepReader) and blocks are the variable's
+    native chunks,  so the shared block cache serves as the chunk cache.
+    Variables are addressed as netcdf:///path/file.nc?variable=name,  or
+    as file:// uris of files that hold a single variable.
+    """
+
+    def __init__(self, uri, band_names=None):
+        super(VariableReader, self).__init__(uri, band_names=band_names)
+        self.driver, self.container, self.variable, _ = _parse(uri)
+
+    @property
+    def path(self):
+        return _subdataset(self.driver, self.container, self.variable)
+
+    @property
+    def cache_key(self):
+        if self._cache_key is None:
+            try:
+                self._cache_key = (self.path,
+                                   os.path.getmtime(self.container))
+            except OSError:
+                self._cache_key = (self.path, None)
+        return self._cache_key
+
+    def _read_metadata(self):
+        dataset = self.dataset
+        if not dataset.count and dataset.subdatasets:
+            raise ValueError(
+                "{} holds several variables,  choose one of {}".format(
+                    self.container, ", ".join(variables(self.uri))))
+
+        metadata = super(VariableReader, self)._read_metadata()
+
+        # [dimension, value] pairs of each band
+        metadata['steps'] = []
+        for index in range(1, dataset.count + 1):
+            steps = []
+            for tag, value in dataset.tags(index).items():
+                match = _dim_parser.match(tag)
+                if match is not None:
+                    steps.append([match.group(1) or match.group(2), value])
+            metadata['steps'].append(sorted(steps))
+
+        return metadata
+
+    @property
+    def name(self):
+        return self.variable or \
+            os.path.splitext(os.path.basename(self.container))[0]
+
+    def step_name(self, index):
+        return '_'.join([self.name] + [
+            '{}={}'.format(dim, value)
+            for dim, value in self.metadata['steps'][index - 1]])
+
+    def step_uri(self, index):
+        return make_uri(self.uri, self.variable, index - 1)
+
+    def source_bands(self, indexes):
+        return list(indexes)
+
+    @validate_index
+    def get_band_stats(self, index):
+        if self.variable is None:
+            return super(VariableReader, self).get_band_stats(index)
+
+        # Variables have no sidecar of their own,  statistics are only
+        # kept in memory.  Bands are steps,  showing one of them shouldn't
+        # read the others.
+        if index not in self._stats:
+            self._stats.update(compute_stats(
+                self._iter_stats_chunks([index]), [index],
+                self.width * self.height))
+
+        return self._stats[index]
+
+
+# Variable readers shared by the readers of their steps
+_variables = weakref.WeakValueDictionary()
+_variables_lock = threading.Lock()
+
+
+def variable_reader(uri):
+    """Return the shared reader of the variable uri names."""
+    driver, path, variable, _ = _parse(uri)
+    key = (driver, path, variable)
+    with _variables_lock:
+        reader = _variables.get(key)
+        if reader is None:
+            reader = VariableReader(make_uri(uri))
+            _variables[key] = reader
+    return reader
+
+
+class StepReader(RasterIOReader):
+    """Read one step of a variable as a single band dataset.
+
+    Steps are addressed as netcdf:///path/file.nc?variable=name&step=n
+    with n counted from 0.  All steps of a variable share the reader of
+    the variable (its open handle, metadata, statistics and cached
+    blocks),  so moving between steps doesn't reopen the file.
+    """
+
+    def __init__(self, uri, band_names=None):
+        super(StepReader, self).__init__(uri, band_names=band_names)
+        self.parent = variable_reader(uri)
+        self.band = _parse(uri)[3] + 1
+
+    @property
+    def path(self):
+        return self.parent.path
+
+    @property
+    def cache_key(self):
+        return self.parent.cache_key
+
+    def _read_metadata(self):
+        metadata = dict(self.parent.metadata, count=1)
+        file_reader.check_index(self.parent, self.band)
+
+        for key in ('dtypes', 'nodata', 'block_shapes', 'steps'):
+            metadata[key] = [metadata[key][self.band - 1]]
+
+        return metadata
+
+    @property
+    def name(self):
+        return self.parent.step_name(self.band)
+
+    def source_bands(self, indexes):
+        return [self.band for _ in indexes]
+
+    def _read_raw(self, indexes, window, out=None):
+        return self.parent._read_raw(self.source_bands(indexes), window,
+                                     out=out)
+
+    def _get_blocks(self, indexes, blocks):
+        found = self.parent._get_blocks([self.band], blocks)
+        return dict(((index, i, j), found[(self.band, i, j)])
+                    for index in set(indexes) for i, j in blocks)
+
+    def read(self, indexes, *args, **kwargs):
+        if isinstance(indexes, int):
+            return self.parent.read(self.band, *args, **kwargs)
+        return self.parent.read(self.source_bands(indexes), *args, **kwargs)
+
+    def get_band_ix(self, indexes, x, y):
+        return self.parent.get_band_ix(self.source_bands(indexes), x, y)
+
+    def _get_band_tag(self, index, prop, convert=float):
+        return self.parent._get_band_tag(self.band, prop, convert)
+
+    @validate_index
+    def get_band_stats(self, index):
+        return self.parent.get_band_stats(self.band)
+
+    @validate_index
+    def get_band_name(self, index, default=None):
+        return self.parent.get_band_name(
+            self.band, self.name if default is None else default)
+
+
+def MultidimIOReader(uri):
+    """Return a reader of a variable,  or of a step if uri names one."""
+    if _parse(uri)[3] is None:
+        return VariableReader(uri)
+    return StepReader(uri)
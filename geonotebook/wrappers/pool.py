@@ -0,0 +1,173 @@
+from collections import OrderedDict
+import itertools
+import threading
+import weakref
+
+import rasterio as rio
+
+
+# Default number of dataset handles kept open by all threads together
+DEFAULT_POOL_SIZE = 64
+
+
+class _Handles(OrderedDict):
+    # OrderedDict subclass so a thread's handles can be weakly referenced.
+    # expired holds the paths the pool asked the thread to close.
+    def __init__(self, key):
+        super(_Handles, self).__init__()
+        self.key = key
+        self.expired = set()
+
+
+class DatasetPool(object):
+    """A bounded pool of open datasets keyed by path.
+
+    GDAL dataset handles must not be used by two threads at once, so each
+    thread gets its own handles and a thread never closes a handle that
+    belongs to another thread.  At most ``size`` handles are kept open by
+    all threads together.  When a thread needs another handle the least
+    recently used handles are expired,  a thread closes its own expired
+    handles straight away and the others' when they next use the pool.
+    Threads that are done reading (e.g. the catalog's workers) should
+    close their handles with clear().
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, opener=rio.open):
+        self._size = int(size)
+        self._opener = opener
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all_handles = weakref.WeakValueDictionary()
+
+        # (thread's handles key, path) of the unexpired handles of every
+        # thread,  least recently used first.  Guarded by _lock.
+        self._lru = OrderedDict()
+        self._keys = itertools.count()
+
+        self.opens = 0
+        self.hits = 0
+
+    @property
+    def _handles(self):
+        try:
+            return self._local.handles
+        except AttributeError:
+            with self._lock:
+                self._local.handles = _Handles(next(self._keys))
+                self._all_handles[self._local.handles.key] = \
+                    self._local.handles
+            return self._local.handles
+
+    @property
+    def size(self):
+        return self._size
+
+    @size.setter
+    def size(self, value):
+        with self._lock:
+            self._size = int(value)
+            self._expire()
+        self._close_expired(self._handles)
+
+    def get(self, path):
+        """Return an open dataset for path,  opening it if needed."""
+        handles = self._handles
+
+        # Handles expired or invalidated by other threads
+        self._close_expired(handles)
+
+        try:
+            dataset = handles.pop(path)
+            self.hits += 1
+        except KeyError:
+            dataset = self._opener(path)
+            self.opens += 1
+
+        handles[path] = dataset
+
+        with self._lock:
+            handles.expired.discard(path)
+            self._lru.pop((handles.key, path), None)
+            self._lru[(handles.key, path)] = None
+            self._expire()
+        self._close_expired(handles)
+
+        return dataset
+
+    def _expire(self):
+        # Expire the least recently used handles beyond size,  call with
+        # _lock held.  Handles of threads that are gone were closed with
+        # them.
+        for key in [k for k in self._lru if k[0] not in self._all_handles]:
+            del self._lru[key]
+
+        while len(self._lru) > max(self._size, 1):
+            (handles_key, path), _ = self._lru.popitem(last=False)
+            handles = self._all_handles.get(handles_key)
+            if handles is not None:
+                handles.expired.add(path)
+
+    def _close_expired(self, handles):
+        # Close the current thread's expired handles
+        with self._lock:
+            paths = list(handles.expired)
+            handles.expired.clear()
+
+        for path in paths:
+            dataset = handles.pop(path, None)
+            if dataset is not None:
+                dataset.close()
+
+    def invalidate(self, path):
+        """Close the handles of path in every thread (e.g. it changed).
+
+        Other threads close theirs before they next use the pool.
+        """
+        with self._lock:
+            for key in [k for k in self._lru if k[1] == path]:
+                del self._lru[key]
+                handles = self._all_handles.get(key[0])
+                if handles is not None:
+                    handles.expired.add(path)
+        self._close_expired(self._handles)
+
+    def _close(self, handles):
+        with self._lock:
+            for path in handles:
+                self._lru.pop((handles.key, path), None)
+            handles.expired.clear()
+
+        while handles:
+            _, dataset = handles.popitem()
+            dataset.close()
+
+    def clear(self):
+        """Close all handles opened by the current thread."""
+        self._close(self._handles)
+
+    def close_all(self):
+        """Close every handle in the pool.
+
+        Only call this when no other thread is reading, e.g. at kernel
+        shutdown.
+        """
+        with self._lock:
+            all_handles = list(self._all_handles.values())
+
+        for handles in all_handles:
+            self._close(handles)
+
+    @property
+    def stats(self):
+        with self._lock:
+            open_handles = sum(len(h) for h in self._all_handles.values())
+
+        return {
+            'size': self._size,
+            'open': open_handles,
+            'opens': self.opens,
+            'hits': self.hits
+        }
+
+
+dataset_pool = DatasetPool()
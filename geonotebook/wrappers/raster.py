@@ -1,12 +1,24 @@
 import collections
+import math
 import os
 import re
 
+from affine import Affine
 import numpy as np
 
 import pkg_resources as pr
 
 from shapely.geometry import Polygon
+import six
+
+from . import buffers, multidim
+from .buffers import nodata_mask, write_out
+from .catalog import catalog
+from .executor import read_executor
+from .lazy import LazyArray
+from .memory_reader import MemoryReader
+from .warp import WarpedReader
+from .zonal import zonal_stats
 
 
 class RasterData(collections.Sequence):
@@ -16,6 +28,12 @@ class RasterData(collections.Sequence):
 
     _concrete_schema = {}
 
+    # Reads estimated to need more than this many bytes are refused,  or
+    # downsampled to fit if downsample_large_reads is True.  A value of
+    # zero disables the check.  See RasterData.read_shape()
+    max_read_bytes = 2 * 1024 * 1024 * 1024
+    downsample_large_reads = False
+
     @classmethod
     def register(cls, name, concrete_class):
         # TODO: some kind of validation on the API provided
@@ -37,25 +55,48 @@ class RasterData(collections.Sequence):
         else:
             return True
 
-    def __init__(self, uri, indexes=None):
+    @classmethod
+    def get_reader(cls, uri):
+        """Return a reader for uri from the registered schemas."""
         try:
 
-            scheme = self._schema_parser.match(uri)
+            scheme = cls._schema_parser.match(uri)
 
             if scheme is None:
-                scheme = self._default_schema
+                scheme = cls._default_schema
             else:
                 scheme = scheme.group(1)
 
-            self.reader = self._concrete_schema[scheme](uri)
+            return cls._concrete_schema[scheme](uri)
 
         except KeyError:
             raise NotImplementedError(
                 "{} cannot parse files of type '{}'".format(
-                    self.__class__.__name__, scheme))
+                    cls.__name__, scheme))
         except AttributeError:
             raise RuntimeError('Must pass in URI with schema.')
 
+    def __init__(self, uri, indexes=None):
+        self._set_reader(self.get_reader(uri), indexes)
+
+    @classmethod
+    def from_reader(cls, reader, indexes=None):
+        """Create a RasterData from an existing reader object."""
+        rd = cls.__new__(cls)
+        rd._set_reader(reader, indexes)
+        return rd
+
+    @classmethod
+    def from_array(cls, data, transform=Affine.identity(), crs=None,
+                   nodata=None, name=None, axis=2, indexes=None):
+        """Create a RasterData of a numpy array,  see MemoryReader."""
+        return cls.from_reader(
+            MemoryReader(data, transform=transform, crs=crs, nodata=nodata,
+                         name=name, axis=axis), indexes=indexes)
+
+    def _set_reader(self, reader, indexes):
+        self.reader = reader
+
         self.band_indexes = range(1, self.reader.count + 1) \
             if indexes is None else indexes
 
@@ -65,49 +106,245 @@ class RasterData(collections.Sequence):
         assert not max(self.band_indexes) > self.reader.count, \
             IndexError("Band index out of range")
 
-    def index(self, *args, **kwargs):
-        return self.reader.index(*args, **kwargs)
+        # Band subsets of this RasterData,  see __getitem__
+        self._views = {}
+        # Reprojected views of this RasterData,  see warp()
+        self._warped = {}
+
+    def _view(self, indexes):
+        # Views share this object's reader (and so its open dataset
+        # and computed statistics) and are only created once.
+        key = tuple(indexes)
+        try:
+            return self._views[key]
+        except KeyError:
+            view = RasterData.from_reader(self.reader, indexes=list(key))
+            self._views[key] = view
+            return view
+
+    def index(self, x, y, **kwargs):
+        """Return the (row, col) of the pixel holding coordinates x, y.
+
+        x and y may be arrays of coordinates,  see RasterIOReader.index
+        """
+        return self.reader.index(x, y, **kwargs)
+
+    def subset(self, annotation, dst_crs=None, **kwargs):
+        # With a dst_crs the annotation (in dst_crs coordinates) is taken
+        # from a warped view,  resolution and resampling configure the warp
+        if dst_crs is not None:
+            return annotation.subset(
+                self.warp(dst_crs, kwargs.pop('resolution', None),
+                          kwargs.pop('resampling', 'nearest')), **kwargs)
 
-    def subset(self, annotation, **kwargs):
         return annotation.subset(self, **kwargs)
 
+    def warp(self, dst_crs, resolution=None, resampling='nearest'):
+        """Return this data reprojected to dst_crs.
+
+        The result is a RasterData on a grid covering this data in
+        dst_crs with the given resolution (in the units of dst_crs,  a
+        single value or an (x, y) pair),  by default the resolution GDAL
+        suggests.  resampling is the name of a rasterio Resampling method.
+        Blocks are warped as they are read and cached,  see warp.py.  The
+        view is created once and reused by later calls.
+        """
+        key = (str(dst_crs), tuple(np.atleast_1d(resolution).tolist())
+               if resolution is not None else None, resampling)
+        try:
+            return self._warped[key]
+        except KeyError:
+            rd = RasterData.from_reader(
+                WarpedReader(self.reader, dst_crs, resolution, resampling),
+                indexes=self.band_indexes)
+            self._warped[key] = rd
+            return rd
+
+    def zonal_stats(self, zones, **kwargs):
+        """Return statistics of the data under each of zones.
+
+        See zonal.zonal_stats()
+        """
+        return zonal_stats(self, zones, **kwargs)
+
     def ix(self, x, y):
+        if np.ndim(x) or np.ndim(y):
+            return self._ix_points(x, y)
+
         if len(self) == 1:
             return self.reader.get_band_ix(self.band_indexes, x, y)[0]
         else:
             return self.reader.get_band_ix(self.band_indexes, x, y)
 
-    def get_data(self, window=None, masked=True, axis=2, **kwargs):
+    def _ix_points(self, x, y):
+        # Sample arrays of coordinates,  returns a masked array shaped
+        # like x and y with a trailing band dimension if len(self) > 1.
+        # Points outside the raster or on nodata are masked.
+        xs, ys = np.broadcast_arrays(x, y)
+
+        if hasattr(self.reader, 'sample'):
+            data = self.reader.sample(self.band_indexes, xs, ys)
+        else:
+            data = np.ma.masked_values(
+                np.array([self.reader.get_band_ix(self.band_indexes, _x, _y)
+                          for _x, _y in zip(xs.ravel(), ys.ravel())],
+                         ndmin=2).reshape(-1, len(self)), self.nodata)
+
+        data = data.reshape(xs.shape + (len(self),))
+        return data[..., 0] if len(self) == 1 else data
+
+    def _window_shape(self, window):
+        if window is None:
+            return self.reader.height, self.reader.width
+
+        (ulx, uly), (lrx, lry) = window
+        return (max(0, min(lrx, self.reader.height) - max(ulx, 0)),
+                max(0, min(lry, self.reader.width) - max(uly, 0)))
+
+    def read_shape(self, window=None, out_shape=None, resolution=None,
+                   max_bytes=None, downsample=None, steps=1):
+        """Return the (rows, cols) shape a read of window should produce.
+
+        The shape is taken from out_shape,  or derived from a target
+        resolution (a single value or an (x, y) pair in the units of the
+        dataset's CRS).  If the read of 'steps' time steps would need more
+        than max_bytes (default: RasterData.max_read_bytes) it is either
+        refused with a RuntimeError or, if downsample is True, shrunk to
+        fit.  Returns None when the read should be at full resolution.
+        """
+        rows, cols = self._window_shape(window)
+
+        if out_shape is None and resolution is not None:
+            try:
+                xres, yres = resolution
+            except TypeError:
+                xres = yres = resolution
+
+            src_xres, src_yres = self.reader.res
+            out_shape = (
+                max(1, int(math.ceil(rows * src_yres / float(yres)))),
+                max(1, int(math.ceil(cols * src_xres / float(xres)))))
+
+        shape = (rows, cols) if out_shape is None else tuple(out_shape)
+
+        if max_bytes is None:
+            max_bytes = self.max_read_bytes
+
+        itemsize = np.dtype(getattr(self.reader, 'dtype', np.float64)).itemsize
+        nbytes = steps * len(self) * shape[0] * shape[1] * itemsize
+
+        if max_bytes and nbytes > max_bytes:
+            if downsample is None:
+                downsample = self.downsample_large_reads
+
+            if not downsample:
+                raise RuntimeError(
+                    "Reading {}x{} pixels from '{}' needs {:.0f}MB which "
+                    "exceeds the {:.0f}MB read budget. Pass out_shape or "
+                    "resolution to read a decimated copy, downsample=True to "
+                    "fit the budget or max_bytes=0 to disable this check."
+                    .format(shape[0], shape[1], self.name,
+                            nbytes / 1048576., max_bytes / 1048576.))
+
+            scale = math.sqrt(float(max_bytes) / nbytes)
+            shape = (max(1, int(shape[0] * scale)),
+                     max(1, int(shape[1] * scale)))
+
+        return None if shape == (rows, cols) else shape
+
+    def empty(self, window=None, axis=2, out_shape=None, resolution=None,
+              memmap=False, masked=False):
+        """Return an uninitialized array to pass as out= to get_data.
+
+        The array has the shape and type get_data returns for the same
+        window,  axis and out_shape/resolution.  See buffers.empty()
+        """
+        shape = list(self.read_shape(window, out_shape, resolution,
+                                     max_bytes=0) or
+                     self._window_shape(window))
+        if len(self) > 1:
+            shape.insert(axis, len(self))
+
+        return buffers.empty(tuple(shape),
+                             getattr(self.reader, 'dtype', np.float64),
+                             memmap=memmap, masked=masked)
+
+    def get_data(self, window=None, masked=True, axis=2, out_shape=None,
+                 resolution=None, max_bytes=None, downsample=None, out=None,
+                 dst_crs=None, resampling='nearest', **kwargs):
+        # Reprojected reads come from a warped view of the data,  window
+        # is then in pixels of the warped grid and resolution is the
+        # resolution of that grid.  See warp()
+        if dst_crs is not None:
+            return self.warp(dst_crs, resolution, resampling).get_data(
+                window, masked, axis, out_shape, max_bytes=max_bytes,
+                downsample=downsample, out=out, **kwargs)
+
+        # If the read has to be decimated,  readers use the dataset's
+        # overviews where they are available.
+        out_shape = self.read_shape(window, out_shape, resolution,
+                                    max_bytes, downsample)
+        if out_shape is not None:
+            kwargs['out_shape'] = out_shape
+
+        # out is an array to read into (see empty()) or 'memmap' to read
+        # into a memory mapped array in buffers.scratch_dir
+        if isinstance(out, six.string_types):
+            if out != 'memmap':
+                raise ValueError("out must be an array or 'memmap'")
+            out = self.empty(window, axis=axis, out_shape=out_shape,
+                             memmap=True, masked=masked)
+
         if len(self) == 1:
-            return self.reader.get_band_data(self.band_indexes[0],
+            data = self.reader.get_band_data(self.band_indexes[0],
                                              window=window,
-                                             maksed=masked,
+                                             masked=masked,
+                                             out=out,
                                              **kwargs)
+        elif hasattr(self.reader, 'get_data'):
+            # Reader can fetch all bands in a single call and mask
+            # each band with its own nodata value.
+            data = self.reader.get_data(self.band_indexes,
+                                        window=window,
+                                        masked=masked,
+                                        axis=axis,
+                                        out=out,
+                                        **kwargs)
         else:
             if masked:
                 # TODO: fix masked array hack here
                 # Note that this also assumes nodata for first band is the
                 # same for all other bands.  all around kind of a hack
                 kwargs["masked"] = False
-                return np.ma.masked_values(
+                data = np.ma.masked_values(
                     np.stack([
                         self.reader.get_band_data(i, window=window, **kwargs)
                         for i in self.band_indexes
                     ], axis=axis), self.nodata)
             else:
-                return np.stack([self.reader.get_band_data(i, window=window,
+                data = np.stack([self.reader.get_band_data(i, window=window,
                                                            masked=masked,
                                                            **kwargs)
                                  for i in self.band_indexes], axis=axis)
 
+        # Readers that don't support out= return a new array
+        return write_out(data, out)
+
+    def to_lazy(self, masked=True):
+        """Return a LazyArray that reads blocks of this data on demand.
+
+        The array has the shape get_data() would return.
+        """
+        return LazyArray(self, masked=masked)
+
     def __len__(self):
         return len(self.band_indexes)
 
     def __getitem__(self, keys):
         if isinstance(keys, int):
-            return RasterData(self.uri, indexes=[keys])
+            return self._view([keys])
         elif all([isinstance(k, int) for k in keys]):
-            return RasterData(self.uri, indexes=keys)
+            return self._view(keys)
         else:
             raise IndexError(
                 "Bands may only be indexed by an int or a list of ints"
@@ -141,6 +378,13 @@ class RasterData(collections.Sequence):
         else:
             return [self.reader.get_band_stddev(i) for i in self.band_indexes]
 
+    @property
+    def valid_count(self):
+        if len(self) == 1:
+            return self.reader.get_band_count(self.band_indexes[0])
+        else:
+            return [self.reader.get_band_count(i) for i in self.band_indexes]
+
     @property
     def nodata(self):
         # HACK,  we assume first band index's nodata is same
@@ -167,24 +411,48 @@ class RasterData(collections.Sequence):
 
     @property
     def name(self):
-        return os.path.splitext(os.path.basename(self.uri))[0]
+        try:
+            return self.reader.name
+        except AttributeError:
+            return os.path.splitext(os.path.basename(self.uri))[0]
 
 
 RasterData.discover_concrete_types()
 
 
+def _call_step(args):
+    # Module level so it can be pickled for executors that run
+    # in other processes,  see RasterDataCollection._map
+    uri, indexes, method, margs, kwargs = args
+    return getattr(RasterData(uri, indexes=indexes), method)(*margs, **kwargs)
+
+
 class RasterDataCollection(collections.Sequence):
-    def __init__(self, items, verify=True, indexes=None):
+    def __init__(self, items, verify=True, indexes=None, readers=None):
+        self._items = items
+
+        # Readers of every item,  slices of the collection share them.
+        # Metadata for every item is taken from the catalog (and gathered
+        # in parallel if it isn't there yet) the first time the collection
+        # needs all of it,  see _load().  Until then only the first item's
+        # is needed for its shape, nodata etc.
+        self._readers = [RasterData.get_reader(i) for i in items] \
+            if readers is None else readers
+        self._loaded = False
+
+        # RasterData objects for each item,  see _item()
+        self._views = {}
 
         if verify:
-            assert len(set([RasterData(i).count for i in items])) == 1, \
+            self._load()
+            assert len(set([r.count for r in self._readers])) == 1, \
                 "Not all items have the same number of bands!"
 
-        self._items = items
-
         # All band counts will be the same unless verify=False
         # in which case you've made your own bed.
-        band_count = RasterData(self._items[0]).count
+        if not self._loaded:
+            catalog.load(self._readers[:1])
+        band_count = self._item(0).count
 
         self.band_indexes = range(1, band_count + 1) \
             if indexes is None else indexes
@@ -195,9 +463,40 @@ class RasterDataCollection(collections.Sequence):
         assert not max(self.band_indexes) > band_count, \
             IndexError("Band index out of range")
 
+    @classmethod
+    def from_variable(cls, uri, variable=None, **kwargs):
+        """Return a collection of the steps (e.g. times) of a variable.
+
+        uri is a NetCDF, HDF5 or Zarr file,  see multidim.py.  Every step
+        reads through the same open variable.
+        """
+        reader = multidim.variable_reader(multidim.make_uri(uri, variable))
+        return cls([reader.step_uri(i) for i in range(1, reader.count + 1)],
+                   **kwargs)
+
+    def _item(self, idx, bands=None):
+        # Memoize RasterData objects so repeated indexing and iteration
+        # (e.g. by a TimeSeriesLayer) doesn't construct new readers.
+        # Band subsets are memoized views of the item's RasterData.
+        idx = range(len(self._items))[idx]
+        try:
+            rd = self._views[idx]
+        except KeyError:
+            rd = RasterData.from_reader(self._readers[idx])
+            self._views[idx] = rd
+
+        return rd if bands is None else rd._view(bands)
+
+    def _load(self):
+        # Metadata of every item from the catalog,  see __init__
+        if not self._loaded:
+            catalog.load(self._readers)
+            self._loaded = True
+
     def __iter__(self):
-        for i in self._items:
-            yield RasterData(i, indexes=self.band_indexes)
+        self._load()
+        for i in range(len(self._items)):
+            yield self._item(i, self.band_indexes)
 
     def __len__(self):
         return len(self._items)
@@ -212,17 +511,18 @@ class RasterDataCollection(collections.Sequence):
             bands = [bands]
 
         if isinstance(key, slice):
-            idx = key.indices(len(self._items))
-            return RasterDataCollection(
-                [self._items[i] for i in range(*idx)],
+            steps = range(*key.indices(len(self._items)))
+            rdc = RasterDataCollection(
+                [self._items[i] for i in steps],
                 indexes=self.band_indexes if bands is None else bands,
-                verify=False
+                verify=False,
+                readers=[self._readers[i] for i in steps]
             )
+            rdc._loaded = self._loaded
+            return rdc
         elif isinstance(key, int):
-            return RasterData(
-                self._items[key],
-                indexes=self.band_indexes if bands is None else bands
-            )
+            return self._item(
+                key, self.band_indexes if bands is None else bands)
         else:
             raise IndexError("{} must be of type slice, or int")
 
@@ -259,35 +559,186 @@ class RasterDataCollection(collections.Sequence):
         else:
             return [rd.stddev for rd in self]
 
+    @property
+    def valid_count(self):
+        if len(self) == 1:
+            return self[0].valid_count
+        else:
+            return [rd.valid_count for rd in self]
+
     @property
     def nodata(self):
         # HACK: assume nodata is consistent across
         #       all RasterData/bands.
-        return [rd.nodata for rd in self][0]
+        return self[0].nodata
+
+    def _map(self, method, args=(), kwargs=None, out=None):
+        """Call a RasterData method on every time step with read_executor.
+
+        Yields the results in time order.  If out is given out[t] is passed
+        as the out= argument of the call for time step t,  unless the
+        executor runs calls in another process.
+        """
+        kwargs = {} if kwargs is None else kwargs
+        self._load()
+
+        def _call(t):
+            kw = kwargs if out is None else dict(kwargs, out=out[t])
+            return getattr(self._item(t, self.band_indexes),
+                           method)(*args, **kw)
+
+        if read_executor.shares_memory:
+            return read_executor.map(_call, range(len(self)))
+
+        # In-memory rasters (see memory_reader.py) can't be reopened from
+        # their uri in another process,  they are read here one by one.
+        if any(hasattr(rd.reader, 'spill') for rd in self):
+            return (_call(t) for t in range(len(self)))
+
+        return read_executor.map(
+            _call_step, [(rd.uri, list(rd.band_indexes), method,
+                          args, kwargs) for rd in self])
+
+    def _stack(self, results, out=None):
+        # Copy results into one (t, ...) array as they arrive rather
+        # than collecting them in a list and copying them all again.
+        for t, data in enumerate(results):
+            if out is None:
+                out = np.empty((len(self),) + np.shape(data),
+                               dtype=np.asarray(data).dtype)
+            if not np.may_share_memory(out[t], np.ma.getdata(data)):
+                out[t] = data
+        return out
+
+    def empty(self, window=None, axis=2, out_shape=None, resolution=None,
+              memmap=False, masked=False):
+        """Return an uninitialized array to pass as out= to get_data.
+
+        See RasterData.empty()
+        """
+        item = self[0].empty(window, axis, out_shape, resolution)
+        return buffers.empty((len(self),) + item.shape, item.dtype,
+                             memmap=memmap, masked=masked)
 
     def ix(self, *args, **kwargs):
         if len(self) == 1:
             return self[0].ix(*args, **kwargs)
-        else:
-            return np.ma.masked_values(
-                [rd.ix(*args, **kwargs) for rd in self],
-                self.__getitem__((0, 1)).nodata)
 
-    def get_data(self, *args, **kwargs):
-        masked = kwargs.get("masked", True)
+        # Keep the masks of samples taken at arrays of points
+        data, mask = None, None
+        for t, values in enumerate(self._map('ix', args, kwargs)):
+            if data is None:
+                data = np.empty((len(self),) + np.shape(values),
+                                dtype=np.asarray(values).dtype)
+                mask = np.zeros(data.shape, dtype=bool)
+            data[t] = np.ma.getdata(values)
+            mask[t] = np.ma.getmaskarray(values)
+
+        return np.ma.MaskedArray(
+            data, mask=mask | nodata_mask(
+                data, self.__getitem__((0, 1)).nodata))
+
+    def extract_points(self, points):
+        """Extract the time series of every band at many points at once.
+
+        points may be an (N, 2) array or list of (x, y) coordinates,  or a
+        list of Point annotations (e.g. AnnotationLayer.points).  All points
+        are sampled from a time step with one vectorized read and time
+        steps are read concurrently,  see executor.py
+
+        Returns (data, names) where data is a masked array of shape
+        (points, time, bands) and names holds the name of each time step.
+        Points outside the data or on nodata are masked.
+        """
+        coords = np.array([p.coords[0] if hasattr(p, 'coords') else p
+                           for p in points], dtype=np.float64).reshape(-1, 2)
+        xs, ys = coords[:, 0], coords[:, 1]
+
+        data, mask = None, None
+        for t, values in enumerate(self._map('ix', (xs, ys))):
+            values = values.reshape(len(coords), -1)
+            if data is None:
+                shape = (len(coords), len(self), values.shape[1])
+                data = np.empty(shape, dtype=values.dtype)
+                mask = np.empty(shape, dtype=bool)
+            data[:, t] = np.ma.getdata(values)
+            mask[:, t] = np.ma.getmaskarray(values)
+
+        mask |= nodata_mask(data, self.__getitem__((0, 1)).nodata)
+
+        return np.ma.MaskedArray(data, mask=mask), self.get_names()
+
+    def get_data(self, window=None, masked=True, out_shape=None,
+                 resolution=None, max_bytes=None, downsample=None, out=None,
+                 dst_crs=None, resampling='nearest', **kwargs):
+        first = self[0]
+        if dst_crs is not None:
+            # Every time step is read from its own warped view,  see
+            # RasterData.get_data.  resolution is used by the warp.
+            first = first.warp(dst_crs, resolution, resampling)
+            kwargs.update(dst_crs=dst_crs, resolution=resolution,
+                          resampling=resampling)
+            resolution = None
+
+        # The read budget applies to the collection as a whole, so every
+        # time step is read with the same (possibly decimated) shape.
+        kwargs['out_shape'] = first.read_shape(
+            window, out_shape, resolution, max_bytes, downsample,
+            steps=len(self))
+        kwargs['window'] = window
+        kwargs['max_bytes'] = 0
+
+        if isinstance(out, six.string_types):
+            if out != 'memmap':
+                raise ValueError("out must be an array or 'memmap'")
+            item = first.empty(window, kwargs.get('axis', 2),
+                               kwargs['out_shape'])
+            out = buffers.empty((len(self),) + item.shape, item.dtype,
+                                memmap=True, masked=masked)
+
+        buf, mask = out, None
+        if np.ma.isMaskedArray(out):
+            buf = out.data
+            if out.mask is not np.ma.nomask:
+                mask = out.mask
+
+        # Time steps are read concurrently,  see executor.py
         # TODO: fixed masked array hack here
+        kwargs["masked"] = False
+        data = self._stack(self._map('get_data', kwargs=kwargs, out=buf),
+                           out=buf)
+
         if masked:
-            kwargs["masked"] = False
-            return np.ma.masked_values(
-                np.array([rd.get_data(*args, **kwargs) for rd in self]),
-                self.__getitem__((0, 1)).nodata)
-        else:
-            return np.array([rd.get_data(*args, **kwargs) for rd in self])
+            data = np.ma.MaskedArray(
+                data, copy=False, mask=nodata_mask(
+                    data, self.__getitem__((0, 1)).nodata, out=mask))
+
+        return write_out(data, out)
+
+    def zonal_stats(self, zones, **kwargs):
+        """Return statistics of every time step under each of zones.
+
+        See zonal.zonal_stats()
+        """
+        return zonal_stats(self, zones, **kwargs)
+
+    def to_lazy(self, masked=True):
+        """Return a LazyArray that reads blocks of the collection on demand.
+
+        The array has the (time, rows, cols[, bands]) shape get_data()
+        would return.
+        """
+        return LazyArray(self, masked=masked)
 
     def get_names(self):
         return [rd.name for rd in self]
 
-    def index(self, *args, **kwargs):
+    def index(self, x, y, **kwargs):
         # TODO: Fix this so it doesn't just assume
         #       index is consistent across timesteps
-        return self.__getitem__(0).index(*args, **kwargs)
+        # The memoized first time step,  not a view of its bands
+        return self._item(0).index(x, y, **kwargs)
+
+    def _window_shape(self, window):
+        # NOTE: Assumes all datasets in collection have the same shape
+        return self._item(0)._window_shape(window)
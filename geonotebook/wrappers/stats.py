@@ -0,0 +1,183 @@
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+
+class BandStats(object):
+    MIN = u'STATISTICS_MINIMUM'
+    MAX = u'STATISTICS_MAXIMUM'
+    MEAN = u'STATISTICS_MEAN'
+    STDDEV = u'STATISTICS_STDDEV'
+    COUNT = u'STATISTICS_VALID_COUNT'
+    VALID_PERCENT = u'STATISTICS_VALID_PERCENT'
+
+
+class StatsAccumulator(object):
+    """Accumulate min/max/mean/stddev and a valid count over chunks.
+
+    Chunk results are merged with the pairwise update of Chan et al. so
+    the mean and variance stay accurate over many chunks without keeping
+    more than one chunk in memory.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, values):
+        """Add a one dimensional array of valid values."""
+        n = values.size
+        if n == 0:
+            return
+
+        values = values.astype(np.float64, copy=False)
+        mean = values.mean()
+        m2 = np.square(values - mean).sum()
+
+        _min, _max = values.min(), values.max()
+        self.min = _min if self.min is None else min(self.min, _min)
+        self.max = _max if self.max is None else max(self.max, _max)
+
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    @property
+    def stddev(self):
+        return np.sqrt(self._m2 / self.count) if self.count else None
+
+    def result(self, size):
+        """Return the statistics as a dict keyed by BandStats names.
+
+        ``size`` is the total number of pixels in the band and is used
+        to compute the valid percentage.
+        """
+        if self.count == 0:
+            return {BandStats.MIN: None, BandStats.MAX: None,
+                    BandStats.MEAN: None, BandStats.STDDEV: None,
+                    BandStats.COUNT: 0, BandStats.VALID_PERCENT: 0.0}
+
+        return {BandStats.MIN: float(self.min),
+                BandStats.MAX: float(self.max),
+                BandStats.MEAN: float(self.mean),
+                BandStats.STDDEV: float(self.stddev),
+                BandStats.COUNT: int(self.count),
+                BandStats.VALID_PERCENT: 100.0 * self.count / size}
+
+
+def compute_stats(chunks, indexes, size):
+    """Compute statistics for several bands in a single pass.
+
+    ``chunks`` is an iterable of masked arrays with the band dimension
+    first, in the order given by ``indexes``.  Returns a dict mapping
+    band index to a statistics dict.
+    """
+    accumulators = [StatsAccumulator() for _ in indexes]
+
+    for chunk in chunks:
+        for accumulator, band in zip(accumulators, chunk):
+            accumulator.update(np.ma.compressed(band))
+
+    return {index: accumulator.result(size)
+            for index, accumulator in zip(indexes, accumulators)}
+
+
+# Statistics are persisted in a GDAL PAM (.aux.xml) sidecar,  GDAL will
+# also report them as band metadata on subsequent opens of the dataset.
+def sidecar_path(path):
+    return path + '.aux.xml'
+
+
+def read_sidecar(path):
+    """Read statistics from the PAM sidecar of path.
+
+    Returns a dict mapping band index to a statistics dict.  Sidecars
+    that are older than the dataset they describe are ignored.
+    """
+    aux = sidecar_path(path)
+
+    try:
+        if os.path.getmtime(aux) < os.path.getmtime(path):
+            return {}
+        tree = ET.parse(aux)
+    except (OSError, IOError, ET.ParseError):
+        return {}
+
+    ret = {}
+    for band in tree.getroot().findall('PAMRasterBand'):
+        metadata = {mdi.get('key'): mdi.text
+                    for mdi in band.findall('Metadata/MDI')}
+
+        try:
+            stats = {key: float(metadata[key]) for key in
+                     (BandStats.MIN, BandStats.MAX,
+                      BandStats.MEAN, BandStats.STDDEV)}
+            stats[BandStats.COUNT] = int(metadata[BandStats.COUNT])
+            stats[BandStats.VALID_PERCENT] = \
+                float(metadata.get(BandStats.VALID_PERCENT, 'nan'))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+        ret[int(band.get('band'))] = stats
+
+    return ret
+
+
+def write_sidecar(path, stats):
+    """Merge band statistics into the PAM sidecar of path.
+
+    Existing content of the sidecar is preserved.  The file is replaced
+    atomically so other kernels never see a partial write.  Returns False
+    if the sidecar could not be written (e.g. a read-only directory).
+    """
+    aux = sidecar_path(path)
+
+    try:
+        root = ET.parse(aux).getroot()
+    except (OSError, IOError, ET.ParseError):
+        root = ET.Element('PAMDataset')
+
+    for index, band_stats in stats.items():
+        if not band_stats[BandStats.COUNT]:
+            continue
+
+        band = next((b for b in root.findall('PAMRasterBand')
+                     if b.get('band') == str(index)), None)
+        if band is None:
+            band = ET.SubElement(root, 'PAMRasterBand', band=str(index))
+
+        metadata = band.find('Metadata')
+        if metadata is None:
+            metadata = ET.SubElement(band, 'Metadata')
+
+        for key, value in sorted(band_stats.items()):
+            mdi = next((m for m in metadata.findall('MDI')
+                        if m.get('key') == key), None)
+            if mdi is None:
+                mdi = ET.SubElement(metadata, 'MDI', key=key)
+            mdi.text = repr(value)
+
+    try:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(aux)),
+                                   suffix='.aux.xml')
+    except (OSError, IOError):
+        return False
+
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            ET.ElementTree(root).write(fh)
+        # mkstemp creates files only readable by their owner
+        os.chmod(tmp, 0o644)
+        os.rename(tmp, aux)
+    except (OSError, IOError):
+        os.remove(tmp)
+        return False
+
+    return True
@@ -0,0 +1,234 @@
+import math
+import os
+import tempfile
+import threading
+
+from affine import Affine
+import numpy as np
+import rasterio as rio
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.warp import (calculate_default_transform,
+                           reproject,
+                           transform_bounds)
+
+from .file_reader import RasterIOReader
+from .stats import compute_stats
+
+
+# Block size of warped grids,  warped blocks are kept in the shared
+# block cache (see file_reader.block_cache) like any other block.
+DEFAULT_BLOCK_SIZE = 256
+
+# Extra source pixels read around the footprint of a warped window so
+# resampling kernels (bilinear, cubic, ...) have their neighbours.
+SOURCE_PADDING = 2
+
+
+def _crs(value):
+    if isinstance(value, CRS):
+        return value
+    if isinstance(value, dict):
+        return CRS(value)
+    return CRS.from_string(value)
+
+
+class WarpedReader(RasterIOReader):
+    """A reader of another reader's data reprojected to a new grid.
+
+    The grid covers the source in dst_crs at the given resolution
+    (GDAL's suggested resolution by default).  Blocks of the grid are
+    reprojected on demand from the window of the source that covers
+    them,  which is itself read through the block cache,  and kept in the
+    block cache under a key of the source and the grid.  Every view of
+    the same source on the same grid shares the warped blocks.
+    """
+
+    def __init__(self, source, dst_crs, resolution=None,
+                 resampling='nearest', block_size=DEFAULT_BLOCK_SIZE):
+        if getattr(source, 'crs', None) is None or \
+           not hasattr(source, 'get_data'):
+            raise NotImplementedError(
+                "Can only warp data with a CRS from a reader that "
+                "supports get_data")
+
+        super(WarpedReader, self).__init__(source.uri)
+
+        self.source = source
+        self.resampling = resampling
+        self.src_crs = _crs(source.crs)
+        self.dst_crs = _crs(dst_crs)
+        self._resampling = Resampling[resampling]
+        self._spill_path = None
+        self._lock = threading.Lock()
+
+        src = source.metadata
+        left, bottom, right, top = src['bounds']
+        transform, width, height = calculate_default_transform(
+            self.src_crs, self.dst_crs, src['width'], src['height'],
+            left, bottom, right, top, resolution=resolution)
+
+        # Bounds of the warped grid
+        xs, ys = zip(transform * (0, 0), transform * (width, height))
+
+        self.metadata = {
+            'count': src['count'],
+            'height': height,
+            'width': width,
+            'dtypes': list(src['dtypes']),
+            'nodata': list(src['nodata']),
+            'bounds': [min(xs), min(ys), max(xs), max(ys)],
+            'res': [abs(transform.a), abs(transform.e)],
+            'transform': list(transform.to_gdal()),
+            'crs': self.dst_crs.to_string(),
+            'block_shapes': [[block_size, block_size]] * src['count']
+        }
+
+    @property
+    def cache_key(self):
+        return self.source.cache_key + (
+            'warp', self.metadata['crs'], tuple(self.metadata['transform']),
+            self.width, self.height, self.resampling)
+
+    def _source_window(self, window, out_shape):
+        # The window of the source that covers a window of the grid,  or
+        # None if they don't overlap.
+        (r0, r1), (c0, c1) = window
+        xs, ys = zip(self.affine * (c0, r0), self.affine * (c1, r1))
+
+        bounds = transform_bounds(self.dst_crs, self.src_crs,
+                                  min(xs), min(ys), max(xs), max(ys))
+        if not np.all(np.isfinite(bounds)):
+            return (0, self.source.height), (0, self.source.width)
+
+        left, bottom, right, top = bounds
+        rows, cols = self.source.index([left, right], [top, bottom])
+
+        # Downsampled reads need the source pixels under a whole
+        # output pixel.
+        pad = SOURCE_PADDING + int(math.ceil(max(
+            float(r1 - r0) / out_shape[0], float(c1 - c0) / out_shape[1])))
+
+        sr0 = max(0, min(rows) - pad)
+        sr1 = min(self.source.height, max(rows) + pad + 1)
+        sc0 = max(0, min(cols) - pad)
+        sc1 = min(self.source.width, max(cols) + pad + 1)
+
+        if sr0 >= sr1 or sc0 >= sc1:
+            return None
+        return (sr0, sr1), (sc0, sc1)
+
+    def _read_raw(self, indexes, window, out=None):
+        (r0, r1), (c0, c1) = window
+        if out is None:
+            dtype = np.result_type(
+                *[self.metadata['dtypes'][i - 1] for i in indexes])
+            out = np.empty((len(indexes), r1 - r0, c1 - c0), dtype=dtype)
+
+        rows, cols = out.shape[-2:]
+        source_window = None
+        if rows and cols:
+            source_window = self._source_window(window, (rows, cols))
+
+        if source_window is None:
+            for band, index in zip(out, indexes):
+                nodata = self.get_band_nodata(index)
+                band.fill(0 if nodata is None else nodata)
+            return out
+
+        (sr0, sr1), (sc0, sc1) = source_window
+        data = self.source.get_data(indexes, window=((sr0, sc0), (sr1, sc1)),
+                                    masked=False, axis=0)
+
+        src_transform = self.source.affine * Affine.translation(sc0, sr0)
+        # Out may be decimated,  scale the grid to its shape
+        dst_transform = self.affine * Affine.translation(c0, r0) * \
+            Affine.scale((c1 - c0) / float(cols), (r1 - r0) / float(rows))
+
+        # Bands are warped one at a time,  GDAL treats a pixel of a multi
+        # band warp as nodata only if it is nodata in every band.
+        for src, band, index in zip(data, out, indexes):
+            nodata = self.get_band_nodata(index)
+            band.fill(0 if nodata is None else nodata)
+            reproject(src, band,
+                      src_transform=src_transform,
+                      src_crs=self.src_crs,
+                      src_nodata=nodata,
+                      dst_transform=dst_transform,
+                      dst_crs=self.dst_crs,
+                      dst_nodata=nodata,
+                      resampling=self._resampling)
+        return out
+
+    def read(self, indexes, window=None, out=None):
+        # Like dataset.read(),  without going through the block cache
+        if window is None:
+            window = ((0, self.height), (0, self.width))
+
+        if isinstance(indexes, int):
+            return self._read_raw([indexes], window, out=None if out is None
+                                  else out[np.newaxis])[0]
+        return self._read_raw(indexes, window, out=out)
+
+    def spill(self, directory=None):
+        """Return the path of a tiled GeoTIFF holding the warped grid.
+
+        Readers of the source's path (e.g. the tile server) would see it
+        on the source's grid,  the warped grid is written to a file the
+        first time it is needed and removed with the reader.
+        """
+        with self._lock:
+            if self._spill_path is None:
+                fd, path = tempfile.mkstemp(prefix='geonb', suffix='.tif',
+                                            dir=directory)
+                os.close(fd)
+                self._write(path)
+                self._spill_path = path
+
+        return self._spill_path
+
+    def _write(self, path):
+        block_size = self.metadata['block_shapes'][0][0]
+        tiled = self.height >= block_size and self.width >= block_size
+
+        indexes = list(range(1, self.count + 1))
+        options = dict(driver='GTiff', count=self.count, height=self.height,
+                       width=self.width,
+                       dtype=np.result_type(*self.metadata['dtypes']),
+                       crs=self.dst_crs, transform=self.affine,
+                       nodata=self.metadata['nodata'][0],
+                       compress='deflate', tiled=tiled)
+        if tiled:
+            options.update(blockxsize=block_size, blockysize=block_size)
+
+        # Written a row of blocks at a time
+        with rio.open(path, 'w', **options) as dst:
+            for r0 in range(0, self.height, block_size):
+                r1 = min(self.height, r0 + block_size)
+                dst.write(self.read(indexes, ((r0, r1), (0, self.width))),
+                          window=((r0, r1), (0, self.width)))
+
+    def __del__(self):
+        if getattr(self, '_spill_path', None) is not None:
+            try:
+                os.remove(self._spill_path)
+            except OSError:
+                pass
+
+    def get_band_ix(self, indexes, x, y):
+        return self.sample(indexes, [x], [y], masked=False)[0]
+
+    def _get_band_tag(self, index, prop, convert=float):
+        # The source's tags describe the source,  not the warped grid
+        raise KeyError(prop)
+
+    def get_band_stats(self, index):
+        # Computed from the warped data,  they aren't written to the
+        # source's sidecar.
+        if index not in self._stats:
+            indexes = range(1, self.count + 1)
+            self._stats.update(compute_stats(
+                self._iter_stats_chunks(indexes), indexes,
+                self.width * self.height))
+
+        return self._stats[index]
@@ -0,0 +1,309 @@
+import math
+
+from affine import Affine
+import numpy as np
+from rasterio.features import rasterize
+from shapely.geometry import shape
+
+from . import file_reader
+
+
+STATS = ('count', 'min', 'max', 'mean', 'std', 'sum')
+
+
+def _geometries(zones):
+    # Return a list of GeoJSON like geometries,  one per zone.  Every
+    # feature of a VectorData is a zone,  even if it is a MultiPolygon.
+    if hasattr(zones, 'polygons') and hasattr(zones, 'reader'):
+        return [feature['geometry'] for feature in zones.reader]
+
+    if hasattr(zones, '__geo_interface__') or isinstance(zones, dict):
+        zones = [zones]
+
+    geometries = []
+    for zone in zones:
+        # Features (e.g. from VectorData or fiona) hold their geometry
+        if isinstance(zone, dict) and zone.get('type') == 'Feature':
+            zone = zone['geometry']
+        geometries.append(getattr(zone, '__geo_interface__', zone))
+    return geometries
+
+
+def _pixel_bounds(affine, bounds, height, width):
+    # ((row_start, col_start), (row_stop, col_stop)) covering bounds,
+    # clipped to the raster.
+    minx, miny, maxx, maxy = bounds
+    inverse = ~affine
+    cols, rows = zip(*[inverse * (x, y) for x in (minx, maxx)
+                       for y in (miny, maxy)])
+
+    r0 = min(height, max(0, int(math.floor(min(rows)))))
+    c0 = min(width, max(0, int(math.floor(min(cols)))))
+    r1 = min(height, int(math.ceil(max(rows))))
+    c1 = min(width, int(math.ceil(max(cols))))
+    return (r0, c0), (max(r0, r1), max(c0, c1))
+
+
+def _layers(polygons, bounds, all_touched):
+    # Split zones into layers of zones that share no pixels so each layer
+    # can be burned into one label raster.  Zones go to the first layer
+    # they don't overlap,  with all_touched zones whose pixel bounds
+    # overlap may share the pixels along their edges.
+    boxes = np.array([(r0, c0, r1, c1) for (r0, c0), (r1, c1) in bounds],
+                     dtype=np.int64).reshape(-1, 4)
+    layer_of = np.zeros(len(polygons), dtype=np.int64)
+    layers = []
+
+    for zone, (r0, c0, r1, c1) in enumerate(boxes):
+        # Earlier zones whose pixel bounds overlap,  checked all at once
+        near = np.nonzero((boxes[:zone, 0] < r1) & (boxes[:zone, 2] > r0) &
+                          (boxes[:zone, 1] < c1) & (boxes[:zone, 3] > c0))[0]
+        taken = set(layer_of[other] for other in near
+                    if all_touched or
+                    polygons[zone].intersects(polygons[other]))
+
+        layer = min(set(range(len(layers) + 1)) - taken)
+        if layer == len(layers):
+            layers.append([])
+        layers[layer].append(zone)
+        layer_of[zone] = layer
+
+    return layers
+
+
+class ZonalAccumulator(object):
+    """Accumulate per zone statistics over blocks of labelled pixels.
+
+    Statistics are kept for every (time step, zone, band).  Means and
+    variances are merged with the update of Chan et al. like
+    StatsAccumulator,  minimums and maximums with ufunc.at.
+    """
+
+    def __init__(self, steps, zones, bands, dtype, edges=None):
+        shape = (steps, zones, bands)
+        self.dtype = np.dtype(dtype)
+        self.edges = edges
+
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.total = np.zeros(shape, dtype=np.float64)
+        self.mean = np.zeros(shape, dtype=np.float64)
+        self.m2 = np.zeros(shape, dtype=np.float64)
+        self.low = np.full(shape, np.inf)
+        self.high = np.full(shape, -np.inf)
+
+        self.histogram = None
+        if edges is not None:
+            self.histogram = np.zeros(shape + (len(edges) - 1,),
+                                      dtype=np.int64)
+
+    def update(self, t, labels, data):
+        """Add a block of data for time step t.
+
+        labels is a (rows, cols) array holding the zone of each pixel
+        plus one (zero outside every zone),  data is a masked array of
+        shape (rows, cols, bands).
+        """
+        _, zones, bands = self.count.shape
+
+        inside = labels.ravel() > 0
+        if not inside.any():
+            return
+
+        values = np.ma.getdata(data).reshape(-1, bands)[inside]
+        valid = ~np.ma.getmaskarray(data).reshape(-1, bands)[inside]
+
+        # One bin per (zone, band) so all bands are done at once
+        bins = (labels.ravel()[inside, np.newaxis] - 1) * bands + \
+            np.arange(bands)
+        bins, values = bins[valid], values[valid].astype(np.float64)
+        size = zones * bands
+
+        n = np.bincount(bins, minlength=size)
+        total = np.bincount(bins, weights=values, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, total / n, 0)
+        m2 = np.bincount(bins, weights=(values - mean[bins]) ** 2,
+                         minlength=size)
+
+        count, acc_mean = self.count[t].ravel(), self.mean[t].ravel()
+        merged = count + n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mean - acc_mean
+            self.mean[t] = np.where(
+                merged > 0, acc_mean + delta * n / merged, 0
+            ).reshape(zones, bands)
+            self.m2[t] += (m2 + np.where(
+                merged > 0, delta ** 2 * count * n / merged, 0
+            )).reshape(zones, bands)
+
+        self.count[t] = merged.reshape(zones, bands)
+        self.total[t] += total.reshape(zones, bands)
+        np.minimum.at(self.low[t].reshape(-1), bins, values)
+        np.maximum.at(self.high[t].reshape(-1), bins, values)
+
+        if self.histogram is not None:
+            edges = self.edges
+            # Like np.histogram the last bin includes its right edge
+            idx = np.searchsorted(edges, values, side='right') - 1
+            idx[values == edges[-1]] = len(edges) - 2
+            keep = (idx >= 0) & (idx < len(edges) - 1)
+            nbins = len(edges) - 1
+            self.histogram[t] += np.bincount(
+                bins[keep] * nbins + idx[keep], minlength=size * nbins
+            ).reshape(zones, bands, nbins)
+
+    def result(self, stats):
+        """Return a dict of (time, zone, band) arrays for each of stats.
+
+        Statistics of zones without valid pixels are masked.
+        """
+        empty = self.count == 0
+        low = np.where(empty, 0, self.low).astype(self.dtype)
+        high = np.where(empty, 0, self.high).astype(self.dtype)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = {
+                'count': self.count,
+                'sum': self.total,
+                'mean': np.ma.masked_where(empty, self.mean),
+                'std': np.ma.masked_where(empty, np.sqrt(
+                    self.m2 / self.count)),
+                'min': np.ma.masked_where(empty, low),
+                'max': np.ma.masked_where(empty, high)
+            }
+
+        result = {stat: values[stat] for stat in stats}
+
+        if self.histogram is not None:
+            result['histogram'] = self.histogram
+            result['bin_edges'] = self.edges
+
+        return result
+
+
+def _strip_rows(rd, cols):
+    # Rows to read at a time,  a multiple of the block height so strips
+    # are block aligned and each time step's strip holds about CHUNK_SIZE
+    # bytes.
+    try:
+        block_rows = rd.reader.metadata['block_shapes'][
+            rd.band_indexes[0] - 1][0]
+    except (AttributeError, IndexError, KeyError):
+        block_rows = 1
+
+    row_bytes = max(1, cols * len(rd.band_indexes) *
+                    np.dtype(getattr(rd.reader, 'dtype', np.float64)).itemsize)
+    return max(1, file_reader.CHUNK_SIZE // (row_bytes * block_rows)) * \
+        block_rows
+
+
+def _edges(data, bins, hist_range):
+    if bins is None:
+        return None
+
+    if not np.isscalar(bins):
+        return np.asarray(bins, dtype=np.float64)
+
+    if hist_range is None:
+        hist_range = (np.min(data.min), np.max(data.max))
+    return np.linspace(hist_range[0], hist_range[1], int(bins) + 1)
+
+
+def zonal_stats(data, zones, stats=STATS, bins=None, hist_range=None,
+                all_touched=False):
+    """Summarize data under each of zones.
+
+    data is a RasterData or RasterDataCollection and zones a VectorData,
+    a list of polygons (annotations,  shapely or GeoJSON geometries) or a
+    single polygon,  in the coordinates of data.  The zones are
+    rasterized onto the raster grid a strip of blocks at a time,  and
+    each strip is read once for every time step,  so only a strip is in
+    memory at a time however many zones there are.  Overlapping zones
+    are drawn separately so pixels they share count toward each of them.
+
+    Returns a dict mapping each of stats to an array of shape (zones,
+    [time,] bands) without the time dimension for a RasterData and the
+    band dimension for single band data,  like get_data.  If bins (a
+    number of bins or the bin edges) is given 'histogram' holds the
+    counts of each zone with a trailing bins dimension and 'bin_edges'
+    the edges.  hist_range defaults to the min and max of data.
+    """
+    for stat in stats:
+        if stat not in STATS:
+            raise ValueError(
+                "'{}' is not a zonal statistic, choose from: {}".format(
+                    stat, ", ".join(STATS)))
+
+    collection = hasattr(data, '_items')
+    rd = data[0] if collection else data
+    steps = len(data) if collection else 1
+    bands = len(rd.band_indexes)
+    reader = rd.reader
+
+    affine = getattr(reader, 'affine', None)
+    if affine is None:
+        raise NotImplementedError(
+            "Zonal statistics need a reader with an affine transform")
+
+    geometries = _geometries(zones)
+    polygons = [shape(g) for g in geometries]
+    bounds = [_pixel_bounds(affine, p.bounds, reader.height, reader.width)
+              for p in polygons]
+    layers = _layers(polygons, bounds, all_touched)
+
+    acc = ZonalAccumulator(steps, len(geometries), bands,
+                           getattr(reader, 'dtype', np.float64),
+                           _edges(data, bins, hist_range))
+
+    if geometries:
+        (r0, c0) = [min(b[0][i] for b in bounds) for i in (0, 1)]
+        (r1, c1) = [max(b[1][i] for b in bounds) for i in (0, 1)]
+    else:
+        r0 = c0 = r1 = c1 = 0
+
+    rows = _strip_rows(rd, c1 - c0)
+    for row in range(r0 - r0 % rows, r1, rows):
+        window = ((max(row, r0), c0), (min(row + rows, r1), c1))
+        (wr0, _), (wr1, _) = window
+
+        # Only the zones that reach into this strip are drawn,  one label
+        # raster for each layer of zones that don't overlap
+        labels = []
+        for layer in layers:
+            shapes = [(geometries[z], z + 1) for z in layer
+                      if bounds[z][0][0] < wr1 and bounds[z][1][0] > wr0]
+            if shapes:
+                labels.append(rasterize(
+                    shapes, out_shape=(wr1 - wr0, c1 - c0), fill=0,
+                    transform=affine * Affine.translation(c0, wr0),
+                    all_touched=all_touched, dtype=np.int32))
+        if not labels:
+            continue
+
+        kwargs = dict(window=window, masked=True, axis=2, max_bytes=0)
+        if collection:
+            results = data._map('get_data', kwargs=kwargs)
+        else:
+            results = [data.get_data(**kwargs)]
+
+        for t, values in enumerate(results):
+            values = np.ma.asarray(values).reshape(
+                labels[0].shape + (bands,))
+            for layer_labels in labels:
+                acc.update(t, layer_labels, values)
+
+    result = acc.result(stats)
+
+    # (time, zone, band) => (zone, [time,] [band])
+    for key, value in result.items():
+        if key == 'bin_edges':
+            continue
+        value = np.moveaxis(value, 1, 0)
+        if not collection:
+            value = value[:, 0]
+        if bands == 1:
+            value = value[..., 0, :] if key == 'histogram' \
+                else value[..., 0]
+        result[key] = value
+
+    return result
@@ -297,13 +297,21 @@ setup(
     package_data={'geonotebook': ['templates/*.html']},
     entry_points={
         'geonotebook.wrappers.raster_schema': [
-            'file = geonotebook.wrappers.file_reader:FileIOReader'
+            'file = geonotebook.wrappers.file_reader:FileIOReader',
+            'http = geonotebook.wrappers.http_reader:HTTPReader',
+            'https = geonotebook.wrappers.http_reader:HTTPReader',
+            'netcdf = geonotebook.wrappers.multidim:MultidimIOReader',
+            'hdf5 = geonotebook.wrappers.multidim:MultidimIOReader',
+            'zarr = geonotebook.wrappers.multidim:MultidimIOReader',
+            'mem = geonotebook.wrappers.memory_reader:MemoryReader.from_uri'
         ],
         'geonotebook.wrappers.raster.file': [
             'geotiff = geonotebook.wrappers.file_reader:RasterIOReader',
             'tiff = geonotebook.wrappers.file_reader:RasterIOReader',
             'tif = geonotebook.wrappers.file_reader:RasterIOReader',
-            'nc = geonotebook.wrappers.file_reader:RasterIOReader',
+            'nc = geonotebook.wrappers.multidim:VariableReader',
+            'h5 = geonotebook.wrappers.multidim:VariableReader',
+            'zarr = geonotebook.wrappers.multidim:VariableReader',
             'vrt = geonotebook.wrappers.file_reader:VRTReader',
         ],
         'geonotebook.handlers.default': [
@@ -4,10 +4,13 @@ mpl.use('Agg')  # noqa
 from contextlib import contextmanager
 import os
 
+from affine import Affine
 import numpy as np
 import pytest
 
 from geonotebook import layers
+from geonotebook.cache import LRUCache
+from geonotebook.wrappers import file_reader, pool
 from geonotebook.wrappers import RasterData, RasterDataCollection
 from geonotebook.wrappers.file_reader import validate_index
 
@@ -211,6 +214,89 @@ def rdc_one():
     RasterData._default_schema = 'file'
 
 
+# Block reader fixtures,  RasterIOReaders backed by in-memory datasets
+# with 2x3 blocks that record each read
+class BlockDataset(object):
+    """Stand in for a rasterio dataset with 2x3 blocks."""
+
+    def __init__(self, data):
+        self.data = data
+        self.count, self.height, self.width = data.shape
+        self.block_shapes = [(2, 3)] * self.count
+        self.dtypes = [data.dtype.name] * self.count
+        self.nodatavals = [-9999.0] * self.count
+        self.transform = Affine.identity()
+        self.bounds = (0.0, float(self.height), float(self.width), 0.0)
+        self.res = (1.0, 1.0)
+        self.crs = None
+        self.reads = []
+
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def read(self, indexes, window=None):
+        (r0, r1), (c0, c1) = window
+        self.reads.append(window)
+
+        if isinstance(indexes, int):
+            return self.data[indexes - 1, r0:r1, c0:c1].copy()
+        return self.data[[i - 1 for i in indexes], r0:r1, c0:c1].copy()
+
+
+BLOCK_STEPS = 3
+
+
+def _step_data(t):
+    data = np.arange(2 * 5 * 7, dtype=np.float32).reshape(2, 5, 7) + 100 * t
+    data[0, 1, 1] = -9999.0
+    data[1, 4, 6] = -9999.0
+    return data
+
+
+@pytest.fixture
+def block_datasets(monkeypatch):
+    datasets = {'t{}'.format(t): BlockDataset(_step_data(t))
+                for t in range(BLOCK_STEPS)}
+
+    monkeypatch.setattr(file_reader, 'block_cache', LRUCache(1024 * 1024))
+    monkeypatch.setattr(file_reader, 'dataset_pool',
+                        pool.DatasetPool(opener=lambda path: datasets[path]))
+    monkeypatch.setitem(RasterData._concrete_schema, 'block',
+                        file_reader.RasterIOReader)
+    return datasets
+
+
+@pytest.fixture
+def block_rd(block_datasets):
+    return RasterData('block://t0')
+
+
+@pytest.fixture
+def block_rdc(block_datasets):
+    return RasterDataCollection(
+        ['block://t{}'.format(t) for t in range(BLOCK_STEPS)])
+
+
+def _block_expected(datasets):
+    # (time, rows, cols, bands) like RasterDataCollection.get_data
+    data = np.stack([np.moveaxis(datasets['t{}'.format(t)].data, 0, -1)
+                     for t in range(BLOCK_STEPS)])
+    return np.ma.masked_equal(data, -9999.0)
+
+
+@pytest.fixture
+def block_expected():
+    # Called with block_datasets once a test has changed them as it needs
+    return _block_expected
+
+
+@pytest.fixture
+def block_dataset():
+    return BlockDataset
+
+
 # Geonotebook Layer fixtures
 @pytest.fixture
 def glc():
@@ -1,7 +1,9 @@
+import numpy as np
 import pytest
 
 from geonotebook import annotations
-
+from geonotebook.cache import LRUCache
+from geonotebook.wrappers import memory_reader, raster, RasterData
 from . import annotations_data
 
 
@@ -112,3 +114,92 @@ def test_rectangle_overlapping_missing_data_and_data_bounds():
 @pytest.mark.skip(reason="Still needs to be implemented")
 def test_polygon_overlapping_missing_data_and_data_bounds():
     pass
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    monkeypatch.setattr(annotations, 'mask_cache', LRUCache(
+        1024 * 1024, sizeof=annotations._mask_cache_size))
+    monkeypatch.setattr(annotations, 'subset_cache', LRUCache(0))
+
+
+def _triangle():
+    # Pixel coordinates,  the block datasets have an identity transform
+    return annotations.Polygon([(1, 1), (6, 1), (6, 4), (1, 1)], None)
+
+
+def test_polygon_subset_shares_masks(caches, block_rd, block_rdc):
+    a = _triangle()
+
+    single = a.subset(block_rd)
+    steps = a.subset(block_rdc)
+
+    assert (steps[0] == single).all()
+    assert (steps.mask[0] == single.mask).all()
+    assert steps.mask[:, -1, 0].all() and not steps.mask[:, 0, -1].any()
+
+    # The window and mask were computed once for the shared grid
+    assert annotations.mask_cache.misses == 2
+    assert annotations.mask_cache.hits == 2
+
+    for value in annotations.mask_cache._items.values():
+        mask = value[1]
+        if isinstance(mask, np.ndarray):
+            assert mask.dtype == bool and not mask.flags.writeable
+
+
+def test_polygon_subset_collection(caches, block_rd, block_rdc):
+    a = _triangle()
+
+    # Nothing is cached yet,  the collection computes the mask itself
+    steps = a.subset(block_rdc)
+    single = a.subset(block_rd)
+
+    assert steps.shape[0] == len(block_rdc)
+    assert (steps.mask[0] == single.mask).all()
+    assert (steps[0] == single).all()
+
+
+def test_mask_cache_counts_vertices(caches, block_rd):
+    # A circle of many vertices
+    angles = np.linspace(0, 2 * np.pi, 5000)
+    a = annotations.Polygon(list(zip(3.5 + 2 * np.cos(angles),
+                                     2.5 + 2 * np.sin(angles))), None)
+    a.subset(block_rd)
+
+    sizes = [size for size, _ in annotations.mask_cache._items.values()]
+    # Thousands of vertices take far more than the two items of the tuple
+    assert max(sizes) > 5000 * 16
+    assert annotations.mask_cache.nbytes == sum(sizes)
+
+
+def test_polygon_subset_cache(caches, block_rd, block_datasets):
+    a = _triangle()
+    annotations.subset_cache.capacity = 1024 * 1024
+
+    first = a.subset(block_rd)
+    reads = len(block_datasets['t0'].reads)
+
+    assert a.subset(block_rd) is first
+    assert len(block_datasets['t0'].reads) == reads
+    # Different arguments are different results
+    assert a.subset(block_rd, masked=False) is not first
+
+
+def test_polygon_subset_decimated(caches, monkeypatch):
+    monkeypatch.setitem(raster.RasterData._concrete_schema,
+                        'mem', memory_reader.MemoryReader.from_uri)
+    rd = RasterData.from_array(np.ones((40, 40), dtype=np.float32),
+                               (0.0, 1.0, 0.0, 40.0, 0.0, -1.0), nodata=0.0)
+
+    # An L along the left and bottom edges of the grid
+    a = annotations.Polygon([(0, 0), (40, 0), (40, 10), (10, 10), (10, 40),
+                             (0, 40), (0, 0)], None)
+
+    full = a.subset(rd)
+    half = a.subset(rd, out_shape=(20, 20))
+
+    assert half.shape == (20, 20)
+    assert not half.mask[2, 2] and not half.mask[18, 18]
+    assert half.mask[2, 15]
+    assert (half.mask == full.mask[::2, ::2]).all()
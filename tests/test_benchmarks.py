@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pytest
+
+from geonotebook.cache import LRUCache
+from geonotebook.wrappers import file_reader, raster, RasterDataCollection
+from geonotebook.wrappers.executor import ReadExecutor
+
+# Benchmarks are slow and their timings depend on the machine,  run them
+# with: GEONOTEBOOK_BENCHMARKS=1 pytest -s tests/test_benchmarks.py
+pytestmark = pytest.mark.skipif(
+    not os.environ.get('GEONOTEBOOK_BENCHMARKS'),
+    reason='set GEONOTEBOOK_BENCHMARKS=1 to run benchmarks')
+
+
+@pytest.fixture(scope='module')
+def timeseries(tmpdir_factory):
+    rio = pytest.importorskip('rasterio')
+
+    tmpdir = tmpdir_factory.mktemp('timeseries')
+    data = np.random.RandomState(0).normal(size=(2, 2048, 2048)) \
+        .astype(np.float32)
+
+    paths = []
+    for t in range(16):
+        path = str(tmpdir.join('step_{:02d}.tif'.format(t)))
+        with rio.open(path, 'w', driver='GTiff', count=2, dtype='float32',
+                      width=2048, height=2048, tiled=True,
+                      blockxsize=256, blockysize=256,
+                      compress='deflate', nodata=-9999.0) as dst:
+            dst.write(data + t)
+        paths.append(path)
+
+    return paths
+
+
+def _time(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def test_rdc_get_data_scaling(timeseries, monkeypatch):
+    monkeypatch.setitem(raster.RasterData._concrete_schema,
+                        'file', file_reader.RasterIOReader)
+    # Disable the block cache so every read decodes the files again
+    monkeypatch.setattr(file_reader, 'block_cache', LRUCache(0))
+
+    rdc = RasterDataCollection(timeseries)
+    expected = None
+
+    cores = multiprocessing.cpu_count()
+    configs = [('serial', 1)] + [('thread', n) for n in (1, 2, 4, 8, 16)
+                                 if n <= max(cores, 2)]
+
+    print('\n{:>8} {:>8} {:>10} {:>8}'.format(
+        'executor', 'workers', 'seconds', 'speedup'))
+
+    baseline = None
+    for kind, workers in configs:
+        executor = ReadExecutor(kind, workers)
+        monkeypatch.setattr(raster, 'read_executor', executor)
+
+        data = rdc.get_data(masked=False, max_bytes=0)
+        if expected is None:
+            expected = data
+        assert (data == expected).all()
+
+        elapsed = _time(lambda: rdc.get_data(masked=False, max_bytes=0))
+        baseline = elapsed if baseline is None else baseline
+        print('{:>8} {:>8} {:>10.3f} {:>7.2f}x'.format(
+            kind, workers, elapsed, baseline / elapsed))
+
+        executor.shutdown()
+
+
+def test_mapnik_map_pooling(request, monkeypatch):
+    pytest.importorskip('mapnik')
+    rio = pytest.importorskip('rasterio')
+    # The provider also needs GDAL's python bindings and the tile server
+    # (TileStache) through the ktile package
+    provider_module = pytest.importorskip('geonotebook.vis.ktile.provider')
+    MapnikPythonProvider = provider_module.MapnikPythonProvider
+    from geonotebook.vis.ktile import workers
+
+    # Only written once the optional dependencies are there
+    timeseries = request.getfixturevalue('timeseries')
+
+    monkeypatch.setattr(workers, 'render_pool', None)
+
+    with rio.open(timeseries[0]) as src:
+        width, height = src.width, src.height
+        transform = list(src.transform.to_gdal())
+
+    provider = MapnikPythonProvider(
+        None, name='bench', path=timeseries[0], bands=[1],
+        raster_x_size=width, raster_y_size=height, transform=transform,
+        nodata=-9999.0, dtype='float32', gamma=0.8,
+        colormap=[{'quantity': q,
+                   'color': '#{:02x}0000'.format((q + 16) * 8)}
+                  for q in range(-16, 16)])
+    provider.generate_vrt()
+
+    # A 4x4 block of 256px tiles over the raster
+    srs = '+proj=longlat +datum=WGS84 +no_defs'
+    xmin, ymax, res = transform[0], transform[3], transform[1]
+    tiles = [(xmin + i * 256 * res, ymax - (j + 1) * 256 * res,
+              xmin + (i + 1) * 256 * res, ymax - j * 256 * res)
+             for i in range(4) for j in range(4)]
+
+    def render():
+        for box in tiles:
+            provider.renderArea(256, 256, srs, *(box + (0,)))
+
+    images = {}
+    for pooled in (False, True):
+        monkeypatch.setattr(provider, 'pool_maps', pooled)
+        images[pooled] = [provider.renderArea(256, 256, srs, *(box + (0,)))
+                          .tobytes() for box in tiles[:2]]
+    assert images[True] == images[False]
+
+    print('\n{:>8} {:>12}'.format('pooled', 'ms per tile'))
+
+    timings = {}
+    for pooled in (False, True):
+        monkeypatch.setattr(provider, 'pool_maps', pooled)
+        render()
+        timings[pooled] = _time(render) / len(tiles) * 1000
+        print('{:>8} {:>12.2f}'.format(str(pooled), timings[pooled]))
+
+    print('overhead removed: {:.2f} ms per tile'.format(
+        timings[False] - timings[True]))
+
+    # Pooled Maps render the same tiles without rebuilding anything
+    assert timings[True] < timings[False]
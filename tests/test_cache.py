@@ -0,0 +1,380 @@
+import numpy as np
+import pytest
+
+from geonotebook.cache import LRUCache
+from geonotebook.vis.ktile.cache import TierCache, TileCache
+from geonotebook.wrappers import buffers, file_reader
+from geonotebook.wrappers.pool import DatasetPool
+
+
+@pytest.fixture
+def block_reader(monkeypatch, block_dataset):
+    dataset = block_dataset(
+        np.arange(2 * 5 * 7, dtype=np.float32).reshape(2, 5, 7))
+
+    monkeypatch.setattr(file_reader, 'block_cache', LRUCache(1024 * 1024))
+    monkeypatch.setattr(file_reader, 'dataset_pool',
+                        DatasetPool(opener=lambda path: dataset))
+
+    return file_reader.RasterIOReader('block.tif')
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(30)
+    cache.put('a', b'x' * 10)
+    cache.put('b', b'x' * 10)
+    cache.put('c', b'x' * 10)
+
+    # Touch 'a' so 'b' becomes the least recently used item
+    cache.get('a')
+    cache.put('d', b'x' * 10)
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert cache.nbytes == 30
+    assert cache.evictions == 1
+
+
+def test_lru_skips_values_larger_than_capacity():
+    cache = LRUCache(10)
+    cache.put('a', b'x' * 11)
+    assert 'a' not in cache
+    assert cache.nbytes == 0
+
+
+def test_lru_shrinking_capacity_evicts():
+    cache = LRUCache(30)
+    cache.put('a', b'x' * 10)
+    cache.put('b', b'x' * 10)
+    cache.capacity = 10
+
+    assert len(cache) == 1
+    assert 'b' in cache
+
+
+def test_lru_stats():
+    cache = LRUCache(30)
+    cache.put('a', b'x')
+    cache.get('a')
+    cache.get('b')
+
+    assert cache.stats['hits'] == 1
+    assert cache.stats['misses'] == 1
+    assert cache.stats['hit_ratio'] == 0.5
+
+
+def test_block_read_matches_dataset(block_reader):
+    data = block_reader.dataset.data
+    window = block_reader.get_band_data(1, window=((1, 2), (4, 6)))
+
+    assert (window == data[0, 1:4, 2:6]).all()
+    assert (block_reader.get_band_data(2) == data[1]).all()
+
+
+def test_block_read_clips_to_extent(block_reader):
+    data = block_reader.dataset.data
+    window = block_reader.get_band_data(1, window=((-1, -1), (3, 100)))
+
+    assert (window == data[0, 0:3, 0:7]).all()
+
+
+def test_overlapping_reads_hit_cache(block_reader):
+    block_reader.get_band_data(1, window=((0, 0), (4, 6)))
+    reads = len(block_reader.dataset.reads)
+    misses = file_reader.block_cache.misses
+
+    block_reader.get_band_data(1, window=((1, 1), (3, 5)))
+
+    assert len(block_reader.dataset.reads) == reads
+    assert file_reader.block_cache.misses == misses
+    assert file_reader.block_cache.hits > 0
+
+
+def test_multiband_read_axis_order(block_reader):
+    data = block_reader.dataset.data
+    window = ((1, 2), (4, 6))
+
+    assert (block_reader.get_data([1, 2], window=window, axis=0) ==
+            data[:, 1:4, 2:6]).all()
+
+    last = block_reader.get_data([2, 1], window=window, axis=2)
+    assert last.shape == (3, 4, 2)
+    assert (last[..., 0] == data[1, 1:4, 2:6]).all()
+    assert (last[..., 1] == data[0, 1:4, 2:6]).all()
+
+
+def test_multiband_read_fetches_bands_together(block_reader):
+    block_reader.get_data([1, 2], window=((0, 0), (4, 6)))
+    assert len(block_reader.dataset.reads) == 1
+
+
+def test_multiband_masks_per_band_nodata(block_reader):
+    block_reader.dataset.nodatavals = [0.0, 36.0]
+    data = block_reader.get_data([1, 2], axis=0)
+
+    assert data.mask[0, 0, 0]
+    assert not data.mask[1, 0, 0]
+    assert data.mask[1, 0, 1]
+    assert data.mask.sum() == 2
+
+
+def test_pool_reuses_handles(block_dataset):
+    pool = DatasetPool(size=2, opener=lambda path: block_dataset(
+        np.zeros((1, 1, 1))))
+
+    a = pool.get('a.tif')
+    assert pool.get('a.tif') is a
+    assert pool.opens == 1
+    assert pool.hits == 1
+
+
+def test_pool_closes_least_recently_used(block_dataset):
+    pool = DatasetPool(size=2, opener=lambda path: block_dataset(
+        np.zeros((1, 1, 1))))
+
+    a, b = pool.get('a.tif'), pool.get('b.tif')
+    pool.get('a.tif')
+    pool.get('c.tif')
+
+    assert b.closed
+    assert not a.closed
+    assert pool.stats['open'] == 2
+
+
+def test_pool_handles_are_per_thread(block_dataset):
+    import threading
+
+    pool = DatasetPool(opener=lambda path: block_dataset(
+        np.zeros((1, 1, 1))))
+    handles = []
+
+    def _get():
+        handles.append(pool.get('a.tif'))
+
+    _get()
+    thread = threading.Thread(target=_get)
+    thread.start()
+    thread.join()
+
+    assert handles[0] is not handles[1]
+
+
+def test_pool_size_is_shared_by_threads(block_dataset):
+    import threading
+
+    pool = DatasetPool(size=2, opener=lambda path: block_dataset(
+        np.zeros((1, 1, 1))))
+    other = []
+    opened, release, done, finish = [threading.Event() for _ in range(4)]
+
+    def _get():
+        other.extend([pool.get('a.tif'), pool.get('b.tif')])
+        opened.set()
+        release.wait(10)
+        # Handles expired by other threads are closed on the next get
+        pool.get('b.tif')
+        done.set()
+        finish.wait(10)
+
+    thread = threading.Thread(target=_get)
+    thread.start()
+    assert opened.wait(10)
+
+    c = pool.get('c.tif')
+    assert not other[0].closed
+    release.set()
+    assert done.wait(10)
+
+    assert other[0].closed and not other[1].closed and not c.closed
+    assert pool.stats['open'] == 2
+
+    # Shrinking the pool expires handles of every thread
+    pool.size = 1
+    assert c.closed
+    finish.set()
+    thread.join()
+
+
+def test_pool_clear_closes_thread_handles(block_dataset):
+    import threading
+
+    pool = DatasetPool(opener=lambda path: block_dataset(
+        np.zeros((1, 1, 1))))
+    handles = []
+
+    def _get():
+        handles.append(pool.get('a.tif'))
+        pool.clear()
+
+    thread = threading.Thread(target=_get)
+    thread.start()
+    thread.join()
+
+    assert handles[0].closed
+    assert pool.stats['open'] == 0
+
+
+def test_pool_invalidate_closes_every_thread_handles(block_dataset):
+    import threading
+
+    pool = DatasetPool(opener=lambda path: block_dataset(
+        np.zeros((1, 1, 1))))
+    other = []
+    opened, release, done = [threading.Event() for _ in range(3)]
+
+    def _get():
+        other.append(pool.get('a.tif'))
+        opened.set()
+        release.wait(10)
+        # The invalidated handle is closed and reopened on the next get
+        other.append(pool.get('a.tif'))
+        done.set()
+
+    thread = threading.Thread(target=_get)
+    thread.start()
+    assert opened.wait(10)
+
+    a, b = pool.get('a.tif'), pool.get('b.tif')
+    pool.invalidate('a.tif')
+    assert a.closed and not b.closed
+    assert pool.get('a.tif') is not a
+
+    release.set()
+    assert done.wait(10)
+    thread.join()
+    assert other[0].closed and other[1] is not other[0]
+
+
+def test_read_into_out(block_reader):
+    data = block_reader.dataset.data
+    out = np.empty((3, 4, 2), dtype=np.float32)
+
+    result = block_reader.get_data([1, 2], window=((1, 2), (4, 6)), out=out)
+
+    assert np.may_share_memory(result, out)
+    assert (out[..., 0] == data[0, 1:4, 2:6]).all()
+    assert (out[..., 1] == data[1, 1:4, 2:6]).all()
+
+
+def test_read_into_masked_memmap(block_reader):
+    block_reader.dataset.nodatavals = [0.0, 36.0]
+    out = buffers.empty((2, 5, 7), np.float32, memmap=True, masked=True)
+
+    block_reader.get_data([1, 2], axis=0, out=out)
+
+    assert isinstance(out.data, np.memmap)
+    assert (out.data == block_reader.dataset.data).all()
+    assert out.mask[0, 0, 0] and out.mask[1, 0, 1]
+    assert out.mask.sum() == 2
+
+
+def test_large_read_into_out_uses_strips(block_reader, monkeypatch):
+    monkeypatch.setattr(file_reader, 'block_cache', LRUCache(0))
+    monkeypatch.setattr(file_reader, 'CHUNK_SIZE', 1)
+    out = np.empty((2, 5, 7), dtype=np.float32)
+
+    block_reader.get_data([1, 2], axis=0, masked=False, out=out)
+
+    # One block row (2 rows) at a time
+    assert len(block_reader.dataset.reads) == 3
+    assert (out == block_reader.dataset.data).all()
+
+
+def test_read_into_wrong_shape(block_reader):
+    with pytest.raises(ValueError):
+        block_reader.get_data([1, 2], out=np.empty((5, 7, 3)))
+
+
+def _tile(content):
+    return (200, {'Content-Type': 'image/png'}, content)
+
+
+def test_tile_cache_layer_stats():
+    cache = TileCache(1024)
+    cache.put(('k', 'a', 1, 0, 0, 'png'), _tile(b'x' * 100))
+    cache.put(('k', 'a', 1, 1, 0, 'png'), _tile(b'x' * 100))
+    cache.put(('k', 'b', 1, 0, 0, 'png'), _tile(b'x' * 50))
+    cache.put(('j', 'a', 1, 0, 0, 'png'), _tile(b'x' * 50))
+
+    assert cache.get(('k', 'a', 1, 0, 0, 'png')) == _tile(b'x' * 100)
+    assert cache.get(('k', 'a', 2, 0, 0, 'png')) is None
+    assert cache.get(('k', 'b', 1, 0, 0, 'png')) is not None
+
+    stats = cache.layer_stats('k')
+    assert stats['a']['hits'] == 1 and stats['a']['misses'] == 1
+    assert stats['a']['hit_ratio'] == 0.5
+    assert stats['a']['items'] == 2
+    assert stats['a']['nbytes'] == 2 * (100 + len('Content-Type') + 9)
+    assert stats['b']['hit_ratio'] == 1.0
+    assert cache.stats['hits'] == 2
+
+    # Tiles that were never read are reported too
+    assert cache.layer_stats('j')['a']['hit_ratio'] is None
+
+
+def test_tile_cache_drop():
+    cache = TileCache(1024)
+    for kernel, layer in [('k', 'a'), ('k', 'b'), ('j', 'a')]:
+        cache.put((kernel, layer, 1, 0, 0, 'png'), _tile(b'x' * 10))
+        cache.get((kernel, layer, 1, 0, 0, 'png'))
+
+    cache.drop('k', 'a')
+    assert set(cache.layer_stats('k')) == {'b'}
+
+    cache.drop('k')
+    assert cache.layer_stats('k') == {}
+    assert len(cache) == 1 and cache.layer_stats('j')['a']['items'] == 1
+
+
+class _Layer(object):
+    def name(self):
+        return 'a'
+
+
+class _Coord(object):
+    def __init__(self, row, column, zoom):
+        self.row, self.column, self.zoom = row, column, zoom
+
+
+def test_tier_cache_keeps_saved_tiles(mocker):
+    cache = mocker.Mock()
+    cache.read.return_value = None
+    tier = TierCache(cache, TileCache(1024), 'k')
+
+    # A tile cut from a metatile by TileStache
+    tier.save(b'x' * 10, _Layer(), _Coord(3, 2, 1), 'PNG')
+    cache.save.assert_called_once_with(b'x' * 10, mocker.ANY, mocker.ANY,
+                                       'PNG')
+
+    assert tier.tile_cache.get(('k', 'a', 1, 2, 3, 'png')) == \
+        (200, {'Content-Type': 'image/png'}, b'x' * 10)
+    assert tier.read(_Layer(), _Coord(3, 2, 1), 'PNG') is None
+
+    tier.remove(_Layer(), _Coord(3, 2, 1), 'PNG')
+    assert len(tier.tile_cache) == 0 and cache.remove.called
+
+
+def test_nodata_outside_dtype():
+    data = np.array([0, 1, 241, 255], dtype=np.uint8)
+    assert not buffers.nodata_mask(data, -9999.0).any()
+    assert buffers.nodata_mask(data, 241.0).tolist() == \
+        [False, False, True, False]
+
+    data = np.array([0, 1, -5], dtype=np.int32)
+    assert not buffers.nodata_mask(data, 0.5).any()
+    assert not buffers.nodata_mask(data, 2.0 ** 40).any()
+    assert buffers.nodata_mask(data, -5.0).tolist() == [False, False, True]
+
+    data = np.array([1e38, 0], dtype=np.float32)
+    assert not buffers.nodata_mask(data, 1e300).any()
+
+
+def test_single_band_unmasked(block_rd, block_datasets):
+    data = block_rd[1].get_data(masked=False)
+    assert not isinstance(data, np.ma.MaskedArray)
+    assert (data == block_datasets['t0'].data[0]).all()
+
+    data = block_rd[1].get_data(masked=False, out='memmap')
+    assert isinstance(data, np.memmap)
+    assert not isinstance(data, np.ma.MaskedArray)
+    assert data[1, 1] == -9999.0
@@ -0,0 +1,99 @@
+from affine import Affine
+import numpy as np
+import pytest
+
+from geonotebook.wrappers import file_reader, raster, RasterDataCollection
+from geonotebook.wrappers.catalog import MetadataCatalog
+from geonotebook.wrappers.pool import DatasetPool
+
+
+@pytest.fixture
+def pool(monkeypatch, block_dataset):
+    def _open(path):
+        dataset = block_dataset(np.zeros((3, 5, 7), dtype=np.float32))
+        dataset.transform = Affine(0.5, 0.0, 10.0, 0.0, -0.5, 20.0)
+        return dataset
+
+    pool = DatasetPool(opener=_open)
+    monkeypatch.setattr(file_reader, 'dataset_pool', pool)
+    return pool
+
+
+@pytest.fixture
+def paths(tmpdir):
+    paths = []
+    for name in ('a.tif', 'b.tif', 'c.tif'):
+        tmpdir.join(name).write('data')
+        paths.append(str(tmpdir.join(name)))
+    return paths
+
+
+def _readers(paths):
+    return [file_reader.RasterIOReader(p) for p in paths]
+
+
+def test_catalog_gathers_missing_metadata(pool, paths):
+    readers = _readers(paths)
+    metadata = MetadataCatalog().load(readers)
+
+    assert pool.opens == 3
+    assert [md['count'] for md in metadata] == [3, 3, 3]
+    assert readers[0].metadata is metadata[0]
+
+
+def test_catalog_is_persisted(pool, paths, tmpdir):
+    MetadataCatalog().load(_readers(paths))
+    assert tmpdir.join('.geonotebook_catalog.json').check()
+
+    opens = pool.opens
+    readers = _readers(paths)
+    MetadataCatalog().load(readers)
+
+    assert [r.count for r in readers] == [3, 3, 3]
+    assert readers[0].bounds == (0.0, 0.0, 7.0, 5.0)
+    assert pool.opens == opens
+
+
+def test_catalog_invalidated_by_size(pool, paths, tmpdir):
+    catalog = MetadataCatalog()
+    catalog.load(_readers(paths))
+    opens = pool.opens
+
+    tmpdir.join('b.tif').write('rewritten')
+    catalog.load(_readers(paths))
+
+    assert pool.opens == opens + 1
+
+
+def test_catalog_skips_readers_without_files(pool, paths):
+    class NoPathReader(object):
+        count = 1
+
+    reader = NoPathReader()
+    assert MetadataCatalog().load([reader, _readers(paths)[0]])[0] is None
+    assert not hasattr(reader, 'metadata')
+
+
+def test_index_uses_catalogued_transform(pool, paths):
+    reader = _readers(paths)[0]
+    MetadataCatalog().load([reader])
+
+    assert reader.index(10.0, 20.0) == (0, 0)
+    assert reader.index(11.2, 18.6) == (2, 2)
+
+
+def test_collection_loads_catalog_lazily(pool, paths, monkeypatch):
+    monkeypatch.setitem(raster.RasterData._concrete_schema,
+                        'file', file_reader.RasterIOReader)
+    rdc = RasterDataCollection(['file://' + p for p in paths], verify=False)
+    assert pool.opens == 1
+
+    # Slices share the collection's readers,  and only need their first
+    steps = rdc[1:]
+    assert steps._readers == rdc._readers[1:]
+    assert pool.opens == 2
+
+    assert [rd.count for rd in steps] == [3, 3]
+    assert pool.opens == 3
+    assert [rd.count for rd in rdc] == [3, 3, 3]
+    assert pool.opens == 3
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from geonotebook.wrappers.executor import ReadExecutor
+
+
+def _slow_square(x):
+    # Finish later items first to check results are yielded in order
+    time.sleep(0.01 * (5 - x))
+    return x * x
+
+
+@pytest.mark.parametrize('kind', ['serial', 'thread'])
+def test_map_preserves_order(kind):
+    executor = ReadExecutor(kind, workers=3)
+    assert list(executor.map(_slow_square, range(5))) == [0, 1, 4, 9, 16]
+    executor.shutdown()
+
+
+def test_map_limits_queued_calls():
+    executor = ReadExecutor('thread', workers=1)
+    submitted = []
+    release = threading.Event()
+
+    def _items():
+        for i in range(10):
+            submitted.append(i)
+            yield i
+
+    def _wait(x):
+        release.wait()
+        return x
+
+    results = executor.map(_wait, _items())
+    release.set()
+    assert next(results) == 0
+    # One worker allows two calls to be queued ahead of the consumer
+    assert len(submitted) == 3
+
+    assert list(results) == list(range(1, 10))
+    executor.shutdown()
+
+
+def test_map_raises_worker_exceptions():
+    def _fail(x):
+        raise ValueError(x)
+
+    with pytest.raises(ValueError):
+        list(ReadExecutor('serial').map(_fail, [1]))
+
+
+def test_unknown_executor():
+    with pytest.raises(NotImplementedError):
+        ReadExecutor('gpu')
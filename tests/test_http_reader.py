@@ -0,0 +1,210 @@
+from email.utils import formatdate
+import multiprocessing
+import os
+import re
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from six.moves import BaseHTTPServer, socketserver
+
+from geonotebook.cache import LRUCache
+from geonotebook.wrappers import file_reader, raster, RasterData
+from geonotebook.wrappers.http_reader import HTTPReader
+from geonotebook.wrappers.pool import DatasetPool
+from geonotebook.wrappers.stats import BandStats
+
+
+class RangeRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serve files from server.root with support for Range requests."""
+
+    def log_message(self, *args):
+        pass
+
+    def _file(self):
+        path = os.path.join(self.server.root, self.path.lstrip('/'))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return None
+        self.modified = formatdate(os.path.getmtime(path), usegmt=True)
+        with open(path, 'rb') as fh:
+            return fh.read()
+
+    def end_headers(self):
+        if getattr(self, 'modified', None) is not None:
+            self.send_header('Last-Modified', self.modified)
+        BaseHTTPServer.BaseHTTPRequestHandler.end_headers(self)
+
+    def do_HEAD(self):
+        data = self._file()
+        if data is not None:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.end_headers()
+
+    def do_GET(self):
+        data = self._file()
+        if data is None:
+            return
+
+        match = re.match(r'bytes=(\d+)-(\d*)$',
+                         self.headers.get('Range', ''))
+        if match is None:
+            self.server.requests.append((self.path, None))
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        start = int(match.group(1))
+        stop = min(int(match.group(2) or len(data) - 1), len(data) - 1)
+        self.server.requests.append((self.path, (start, stop)))
+
+        self.send_response(206)
+        self.send_header('Content-Range',
+                         'bytes {}-{}/{}'.format(start, stop, len(data)))
+        self.send_header('Content-Length', str(stop - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        self.wfile.write(data[start:stop + 1])
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+def _serve(root, requests, ports):
+    # Runs in its own process,  some GDAL calls (e.g. reading overviews)
+    # hold the GIL while they make requests.
+    httpd = _Server(('127.0.0.1', 0), RangeRequestHandler)
+    httpd.root, httpd.requests = root, requests
+    ports.put(httpd.server_port)
+    httpd.serve_forever()
+
+
+def _write_cog(path, data):
+    with rasterio.open(path, 'w', driver='GTiff',
+                       count=2, dtype='float32', width=512, height=512,
+                       tiled=True, blockxsize=64, blockysize=64,
+                       interleave='pixel', crs='EPSG:4326',
+                       transform=from_origin(-75.0, 43.0, 0.01, 0.01)) as dst:
+        dst.write(data)
+        dst.build_overviews([2, 4, 8], Resampling.average)
+
+
+@pytest.fixture
+def server(tmpdir, monkeypatch):
+    monkeypatch.setitem(raster.RasterData._concrete_schema,
+                        'http', HTTPReader)
+    monkeypatch.setattr(file_reader, 'block_cache', LRUCache(16 * 1024 ** 2))
+    monkeypatch.setattr(file_reader, 'dataset_pool', DatasetPool())
+
+    data = np.random.RandomState(0).rand(2, 512, 512).astype(np.float32)
+    _write_cog(str(tmpdir.join('cog.tif')), data)
+
+    manager = multiprocessing.Manager()
+    requests, ports = manager.list(), manager.Queue()
+    process = multiprocessing.Process(
+        target=_serve, args=(str(tmpdir), requests, ports))
+    process.daemon = True
+    process.start()
+
+    uri = 'http://127.0.0.1:{}/cog.tif'.format(ports.get(timeout=10))
+    yield requests, uri, data
+
+    process.terminate()
+    process.join()
+    manager.shutdown()
+
+
+def test_http_reader_reads(server):
+    _, uri, data = server
+    rd = RasterData(uri)
+
+    assert rd.count == 2
+    assert rd.reader.metadata['overviews'] == [[2, 4, 8], [2, 4, 8]]
+    assert (rd.get_data(window=((10, 20), (200, 300))) ==
+            np.moveaxis(data[:, 10:200, 20:300], 0, -1)).all()
+    assert rd[1].ix(-74.995, 42.995) == data[0, 0, 0]
+
+
+def test_http_reader_coalesces_ranges(server):
+    requests, uri, data = server
+    rd = RasterData(uri)
+    rd.count
+    del requests[:]
+
+    # A row of eight adjacent tiles
+    assert (rd[1].get_data(window=((64, 0), (128, 512))) ==
+            data[0, 64:128]).all()
+    assert 0 < len(requests) < 8
+
+
+def test_http_reader_caches_blocks(server):
+    requests, uri, data = server
+    rd = RasterData(uri)
+
+    rd.get_data(window=((0, 0), (256, 256)))
+    count = len(requests)
+
+    assert (rd.get_data(window=((0, 0), (256, 256))) ==
+            np.moveaxis(data[:, :256, :256], 0, -1)).all()
+    assert len(requests) == count
+
+
+def test_http_reader_prefetches_overviews(server):
+    requests, uri, _ = server
+    rd = RasterData(uri)
+    rd.count
+    count = len(requests)
+
+    assert rd.get_data(out_shape=(64, 64)).shape == (64, 64, 2)
+    assert len(requests) == count
+
+
+def test_http_reader_stats_from_overview(server):
+    requests, uri, data = server
+    rd = RasterData(uri)
+    rd.count
+    count = len(requests)
+
+    assert rd[1].min >= data[0].min()
+    assert rd[1].max <= data[0].max()
+    assert rd[2].mean == pytest.approx(data[1].mean(), abs=1e-3)
+    assert rd.reader.get_band_stats(1)[BandStats.COUNT] == 512 * 512
+    assert len(requests) == count
+
+    # Other readers of the uri share them
+    assert RasterData(uri)[2].mean == rd[2].mean
+
+
+def test_http_reader_sees_rewritten_objects(server, tmpdir):
+    _, uri, data = server
+    rd = RasterData(uri)
+    assert (rd.get_data(window=((0, 0), (64, 64))) ==
+            np.moveaxis(data[:, :64, :64], 0, -1)).all()
+    mean = rd[2].mean
+
+    # Rewrite the object with a Last-Modified a minute later
+    path = str(tmpdir.join('cog.tif'))
+    _write_cog(path, data + 1)
+    mtime = os.path.getmtime(path) + 60
+    os.utime(path, (mtime, mtime))
+
+    rewritten = RasterData(uri)
+    assert rewritten.reader.cache_key != rd.reader.cache_key
+    assert (rewritten.get_data(window=((0, 0), (64, 64))) ==
+            np.moveaxis(data[:, :64, :64] + 1, 0, -1)).all()
+    assert rewritten[2].mean == pytest.approx(mean + 1, abs=1e-3)
+
+
+def test_http_reader_ktile_path(server):
+    ktile = pytest.importorskip('geonotebook.vis.ktile.ktile')
+    _, uri, _ = server
+
+    options = ktile.Ktile(None)._dynamic_vrt_options(RasterData(uri)[1], {})
+    assert options['path'] == '/vsicurl/' + uri
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from geonotebook.vis.ktile import ktile
+from geonotebook.wrappers import memory_reader, raster, RasterData
+
+
+@pytest.fixture
+def rd(monkeypatch):
+    monkeypatch.setitem(raster.RasterData._concrete_schema,
+                        'mem', memory_reader.MemoryReader.from_uri)
+    return RasterData.from_array(np.zeros((10, 10), dtype=np.float32),
+                                 (0.0, 1.0, 0.0, 10.0, 0.0, -1.0),
+                                 name='zeros')
+
+
+def test_layer_dict(rd):
+    layer_dict = ktile.Ktile(None)._layer_dict(rd, None, {'opacity': 0.5})
+
+    options = layer_dict['provider']['kwargs']
+    assert options['name'] == 'zeros' and options['opacity'] == 0.5
+    assert options['path'] == rd.reader.spill()
+    assert 'metatile' not in layer_dict
+
+
+def test_layer_dict_metatile(rd):
+    layer_dict = ktile.Ktile(None)._layer_dict(
+        rd, 'zeros', {'metatile': 4, 'metatile_buffer': 64})
+
+    assert layer_dict['metatile'] == {'rows': 4, 'columns': 4, 'buffer': 64}
+    assert 'metatile' not in layer_dict['provider']['kwargs']
+    assert 'metatile_buffer' not in layer_dict['provider']['kwargs']
+
+    layer_dict = ktile.Ktile(None)._layer_dict(rd, 'zeros', {'metatile': 2})
+    assert layer_dict['metatile']['buffer'] == ktile.DEFAULT_METATILE_BUFFER
+
+
+def test_ingest_many(rd, mocker):
+    post = mocker.patch('geonotebook.vis.ktile.ktile.requests.post')
+    post.return_value.status_code = 200
+    post.return_value.json.return_value = {
+        'layers': {'a': 'url/k/a', 'b': 'url/k/b'}, 'errors': {}}
+
+    server = ktile.Ktile(None, url='url')
+    assert server.ingest_many([rd, rd], names=['a', 'b'], kernel_id='k',
+                              metatile=2) == ['url/k/a', 'url/k/b']
+
+    (url,), kwargs = post.call_args
+    assert url == 'url/k/layers'
+    assert set(kwargs['json']['layers']) == {'a', 'b'}
+    assert kwargs['json']['layers']['a']['metatile']['rows'] == 2
+
+    post.return_value.json.return_value = {
+        'layers': {'a': 'url/k/a'}, 'errors': {'b': ['Traceback']}}
+    with pytest.raises(RuntimeError):
+        server.ingest_many([rd, rd], names=['a', 'b'], kernel_id='k')
+
+
+def test_layer_dict_warped(monkeypatch):
+    monkeypatch.setitem(raster.RasterData._concrete_schema,
+                        'mem', memory_reader.MemoryReader.from_uri)
+    rd = RasterData.from_array(np.zeros((10, 10), dtype=np.float32),
+                               (-75.0, 0.01, 0.0, 43.0, 0.0, -0.01),
+                               crs='EPSG:4326', name='zeros')
+    warped = rd.warp('EPSG:3857')
+    options = ktile.Ktile(None)._layer_dict(warped, None, {})['provider'][
+        'kwargs']
+
+    # The warped grid,  not the source's
+    assert options['path'] == warped.reader.spill() != rd.reader.spill()
+    assert options['transform'] == warped.reader.metadata['transform']
@@ -1,8 +1,11 @@
 import sys
+import threading
 
 import pytest
 
 from geonotebook import layers
+from geonotebook.vis.utils import tiles
+from geonotebook.wrappers.executor import ReadExecutor
 from .conftest import RDMock
 
 pytestmark = pytest.mark.usefixtures("geonotebook_ini")
@@ -253,3 +256,149 @@ def test_timeseries_out_of_range(visserver, rasterdata_list):
 
     with pytest.raises(IndexError):
         tsl.idx(4)
+
+
+@pytest.fixture
+def prefetch(mocker, monkeypatch, visserver):
+    monkeypatch.setattr(layers, 'prefetch_executor',
+                        ReadExecutor('thread', workers=2))
+    visserver.ingest.side_effect = \
+        lambda data, name=None, **kwargs: "http://bogus_url.com/" + data.name
+    visserver.ingest_many.side_effect = \
+        lambda data, names=None, **kwargs: ["http://bogus_url.com/" + d.name
+                                            for d in data]
+    yield visserver
+    layers.prefetch_executor.shutdown()
+
+
+def _ingested(visserver):
+    # Names of the data ingested,  in order
+    names = []
+    for name, args, _ in visserver.mock_calls:
+        if name == 'ingest':
+            names.append(args[0].name)
+        elif name == 'ingest_many':
+            names.extend(d.name for d in args[0])
+    return names
+
+
+def test_timeseries_layer_prefetch(mocker, prefetch, rasterdata_list):
+    tsl = layers.TimeSeriesLayer('tsl', None, rasterdata_list,
+                                 prefetch_steps=1)
+    mocker.patch.object(tsl, '_remote', create=True)
+    layers.prefetch_executor.shutdown()
+
+    assert _ingested(prefetch) == ['test_data1', 'test_data2']
+    assert tsl._vis_urls[1] == "http://bogus_url.com/test_data2"
+
+    tsl.forward()
+    layers.prefetch_executor.shutdown()
+
+    # The next step was ready,  only the one after it was ingested
+    assert tsl.vis_url == "http://bogus_url.com/test_data2"
+    assert _ingested(prefetch) == ['test_data1', 'test_data2', 'test_data3']
+    assert tsl._pending == {}
+
+
+def test_timeseries_layer_waits_for_prefetch(mocker, prefetch,
+                                             rasterdata_list):
+    started, release = threading.Event(), threading.Event()
+
+    def _ingest(data, name=None, **kwargs):
+        if data.name == 'test_data2':
+            started.set()
+            release.wait(10)
+        return "http://bogus_url.com/" + data.name
+    prefetch.ingest.side_effect = _ingest
+
+    # A plain list of RasterData works too
+    tsl = layers.TimeSeriesLayer('tsl', None, list(rasterdata_list),
+                                 prefetch_steps=1)
+    mocker.patch.object(tsl, '_remote', create=True)
+    assert started.wait(10)
+
+    threading.Timer(0.1, release.set).start()
+    tsl.forward()
+
+    assert tsl.vis_url == "http://bogus_url.com/test_data2"
+    assert _ingested(prefetch).count('test_data2') == 1
+
+
+def test_timeseries_layer_waits_for_step_only(mocker, prefetch,
+                                              rasterdata_list):
+    started, release, done = \
+        threading.Event(), threading.Event(), threading.Event()
+
+    def _ingest(data, name=None, **kwargs):
+        if data.name == 'test_data3':
+            started.set()
+            release.wait(10)
+            done.set()
+        return "http://bogus_url.com/" + data.name
+    prefetch.ingest.side_effect = _ingest
+    prefetch.warm.side_effect = lambda vis_url, tiles: release.wait(10)
+    del prefetch.ingest_many
+
+    tsl = layers.TimeSeriesLayer('tsl', None, rasterdata_list,
+                                 prefetch_steps=2, warm_tiles=[(0, 0, 1)])
+    mocker.patch.object(tsl, '_remote', create=True)
+    assert started.wait(10)
+
+    # Neither the rest of the batch nor warming its tiles hold up a step
+    # whose url is known
+    tsl.forward()
+    assert tsl.vis_url == "http://bogus_url.com/test_data2"
+    assert not done.is_set()
+
+    release.set()
+    layers.prefetch_executor.shutdown()
+    assert _ingested(prefetch) == ['test_data1', 'test_data2', 'test_data3']
+
+
+def test_timeseries_layer_prefetch_batches(monkeypatch, prefetch,
+                                           rasterdata_list):
+    tsl = layers.TimeSeriesLayer('tsl', None, rasterdata_list)
+    layers.prefetch_executor.shutdown()
+    assert prefetch.ingest_many.call_count == 0
+
+    # All remaining steps with one bulk request
+    tsl.prefetch(range(len(rasterdata_list)))
+    layers.prefetch_executor.shutdown()
+    assert prefetch.ingest_many.call_count == 1
+    assert _ingested(prefetch) == ['test_data1', 'test_data2', 'test_data3']
+    assert prefetch.ingest_many.call_args[1]['names'] == \
+        [tsl._step_name(1), tsl._step_name(2)]
+
+    # Or in batches of at most prefetch_batch steps
+    monkeypatch.setattr(tsl, 'prefetch_batch', 1)
+    tsl._vis_urls[1:] = [None, None]
+    tsl.prefetch([1, 2])
+    layers.prefetch_executor.shutdown()
+    assert prefetch.ingest_many.call_count == 1
+    assert prefetch.ingest.call_count == 3
+
+
+def test_timeseries_layer_prefetch_disabled(prefetch, rasterdata_list):
+    layers.TimeSeriesLayer('tsl', None, rasterdata_list)
+    layers.prefetch_executor.shutdown()
+
+    assert _ingested(prefetch) == ['test_data1']
+
+
+def test_timeseries_layer_warm_tiles(prefetch, rasterdata_list):
+    tiles = [(0, 0, 1), (1, 0, 1)]
+    layers.TimeSeriesLayer('tsl', None, rasterdata_list, prefetch_steps=2,
+                           warm_tiles=tiles)
+    layers.prefetch_executor.shutdown()
+
+    assert sorted(c[0] for c in prefetch.warm.call_args_list) == [
+        ("http://bogus_url.com/test_data2", tiles),
+        ("http://bogus_url.com/test_data3", tiles)]
+
+
+def test_tiles():
+    assert tiles((-180, -85, 180, 85), 1) == \
+        [(0, 0, 1), (1, 0, 1), (0, 1, 1), (1, 1, 1)]
+    assert tiles((-73.9, 40.7, -73.8, 40.8), 10) == \
+        [(301, 384, 10), (302, 384, 10), (301, 385, 10), (302, 385, 10)]
+    assert tiles((-73.9, 40.7, -73.8, 40.8), 0) == [(0, 0, 0)]
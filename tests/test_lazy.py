@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+
+def test_lazy_shape(block_rd, block_rdc):
+    assert block_rd.to_lazy().shape == (5, 7, 2)
+    assert block_rd.to_lazy().chunks == (2, 3, 2)
+    assert block_rd[1].to_lazy().shape == (5, 7)
+
+    assert block_rdc.to_lazy().shape == (3, 5, 7, 2)
+    assert block_rdc.to_lazy().chunks == (1, 2, 3, 2)
+    assert block_rdc[:, 2].to_lazy().shape == (3, 5, 7)
+
+
+def test_lazy_slicing_is_lazy(block_rd, block_datasets):
+    view = block_rd.to_lazy()[1:4, 2:6]
+
+    assert view.shape == (3, 4, 2)
+    assert block_datasets['t0'].reads == []
+
+
+def test_lazy_read_matches_get_data(block_rd, block_rdc, block_datasets,
+                                    block_expected):
+    expected = block_expected(block_datasets)
+
+    assert (block_rd.to_lazy().read() == block_rd.get_data()).all()
+    assert (np.asarray(block_rdc.to_lazy()) == expected.data).all()
+    assert (block_rdc.to_lazy().read().mask == expected.mask).all()
+
+
+@pytest.mark.parametrize('key', [
+    (slice(1, 4), slice(2, 6)),
+    (slice(None, None, 2), slice(6, 0, -3), 1),
+    (Ellipsis, 0),
+    (4, slice(None)),
+    (-1, -1)
+])
+def test_lazy_indexing(block_rd, block_datasets, key, block_expected):
+    expected = block_expected(block_datasets)[0][key]
+    result = block_rd.to_lazy()[key]
+
+    if np.ndim(expected) == 0:
+        assert result == expected
+    else:
+        assert result.shape == expected.shape
+        assert (np.ma.getdata(result.read()) == expected.data).all()
+        assert (np.ma.getmaskarray(result.read()) ==
+                np.ma.getmaskarray(expected)).all()
+
+
+def test_lazy_collection_indexing(block_rdc, block_datasets, block_expected):
+    expected = block_expected(block_datasets)
+
+    assert (block_rdc.to_lazy()[1:, 2:4, ..., 0].read() ==
+            expected[1:, 2:4, :, 0]).all()
+    assert block_rdc.to_lazy()[2, 0, 0, 1] == expected[2, 0, 0, 1]
+
+
+def test_lazy_reads_only_touched_blocks(block_rdc, block_datasets):
+    block_rdc.to_lazy()[1, 0:2, 3:5].read()
+
+    assert block_datasets['t0'].reads == []
+    assert block_datasets['t2'].reads == []
+    # A single block of both bands
+    assert block_datasets['t1'].reads == [((0, 2), (3, 6))]
+
+
+@pytest.mark.parametrize('axis', [None, 0, 1, -1, (1, 2)])
+def test_lazy_reductions(block_rdc, block_datasets, axis, block_expected):
+    lazy, expected = block_rdc.to_lazy(), block_expected(block_datasets)
+
+    assert np.allclose(lazy.sum(axis=axis), expected.sum(axis=axis))
+    assert np.allclose(lazy.mean(axis=axis), expected.mean(axis=axis))
+    assert np.allclose(lazy.std(axis=axis), expected.std(axis=axis))
+    assert np.allclose(lazy.min(axis=axis), expected.min(axis=axis))
+    assert np.allclose(lazy.max(axis=axis), expected.max(axis=axis))
+    assert np.all(lazy.count(axis=axis) == expected.count(axis=axis))
+
+
+def test_lazy_reduction_of_view(block_rdc, block_datasets, block_expected):
+    expected = block_expected(block_datasets)[:, 1:3, 2:5, 0]
+
+    assert block_rdc.to_lazy()[:, 1:3, 2:5, 0].mean() == \
+        pytest.approx(expected.mean())
+    # Chunk by chunk,  only the four blocks under the view
+    assert sorted(block_datasets['t0'].reads) == [
+        ((0, 2), (0, 3)), ((0, 2), (3, 6)), ((2, 4), (0, 3)), ((2, 4), (3, 6))]
+
+
+def test_lazy_reduction_fully_masked(block_rd, block_datasets):
+    block_datasets['t0'].data[0] = -9999.0
+    assert block_rd[1].to_lazy().max() is np.ma.masked
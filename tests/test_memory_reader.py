@@ -0,0 +1,121 @@
+import gc
+import os
+
+from affine import Affine
+import numpy as np
+import pytest
+import rasterio
+
+from geonotebook.annotations import Rectangle
+from geonotebook.vis.ktile.ktile import Ktile
+from geonotebook.wrappers import (memory_reader,
+                                  raster,
+                                  RasterData,
+                                  RasterDataCollection)
+from geonotebook.wrappers.executor import ReadExecutor
+
+
+TRANSFORM = Affine(0.5, 0, 10.0, 0, -0.5, 43.0)
+
+
+@pytest.fixture
+def data(monkeypatch):
+    monkeypatch.setitem(raster.RasterData._concrete_schema,
+                        'mem', memory_reader.MemoryReader.from_uri)
+
+    data = np.arange(20 * 30 * 2, dtype=np.float32).reshape(20, 30, 2)
+    data[:2, :2, 0] = -9999.0
+    return data
+
+
+@pytest.fixture
+def rd(data):
+    return RasterData.from_array(data, TRANSFORM, crs='EPSG:4326',
+                                 nodata=-9999.0, name='result')
+
+
+def test_from_array(rd, data):
+    assert rd.count == 2
+    assert rd.name == 'result'
+    assert rd.reader.crs == 'EPSG:4326'
+    assert rd.shape.bounds == (10.0, 33.0, 25.0, 43.0)
+
+    result = rd.get_data()
+    assert (result == np.ma.masked_equal(data, -9999.0)).all()
+    assert result.mask[:2, :2, 0].all()
+    assert (rd[2].get_data(window=((3, 4), (10, 12))) ==
+            data[3:10, 4:12, 1]).all()
+    assert (rd.get_data(out_shape=(10, 15), masked=False) ==
+            data[1::2, 1::2]).all()
+
+
+def test_memory_uri(rd):
+    assert rd.reader.uri == 'mem://result'
+    assert RasterData('mem://result').reader is rd.reader
+
+    with pytest.raises(ValueError):
+        RasterData('mem://missing')
+
+
+def test_masked_and_band_first_arrays(data):
+    masked = np.ma.masked_equal(data, -9999.0)
+    rd = RasterData.from_array(masked, TRANSFORM)
+    assert rd.nodata == masked.fill_value
+    assert (rd.get_data() == masked).all()
+
+    rd = RasterData.from_array(np.moveaxis(data, 2, 0), TRANSFORM, axis=0)
+    assert (rd.get_data(masked=False) == data).all()
+    assert RasterData.from_array(data[..., 0], TRANSFORM).count == 1
+
+
+def test_stats_ix_and_subset(rd, data):
+    band = data[..., 0]
+    assert rd[1].min == band[band != -9999.0].min()
+    assert rd[2].max == data[..., 1].max()
+    assert rd[2].mean == pytest.approx(data[..., 1].mean())
+
+    assert rd.ix(10.75, 42.25).tolist() == data[1, 1].tolist()
+
+    rect = Rectangle([(12, 38), (14, 38), (14, 40), (12, 40), (12, 38)],
+                     None)
+    assert (rd.subset(rect) == data[6:10, 4:8]).all()
+
+
+def test_spill(data):
+    rd = RasterData.from_array(data, TRANSFORM, crs='EPSG:4326',
+                               nodata=-9999.0)
+    path = rd.reader.spill()
+    assert rd.reader.spill() == path
+
+    with rasterio.open(path) as dataset:
+        assert dataset.nodata == -9999.0
+        assert dataset.crs.to_string() == 'EPSG:4326'
+        assert (dataset.read() == np.moveaxis(data, 2, 0)).all()
+
+    options = Ktile(None)._dynamic_vrt_options(rd, {})
+    assert options['path'] == path
+    assert list(options['bands']) == [1, 2]
+
+    # The file goes with the array
+    del rd
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def test_collection_with_process_executor(data, monkeypatch):
+    executor = ReadExecutor('process', 2)
+    monkeypatch.setattr(raster, 'read_executor', executor)
+    # Start the processes first so they don't inherit the arrays
+    assert list(executor.map(abs, [-1, -2])) == [1, 2]
+
+    steps = [RasterData.from_array(data + t, TRANSFORM, name='t{}'.format(t))
+             for t in range(3)]
+    rdc = RasterDataCollection([rd.uri for rd in steps])
+
+    # The arrays only exist in this process,  they are read here
+    result = rdc.get_data(masked=False)
+    assert (result == np.stack([data + t for t in range(3)])).all()
+    assert (rdc.ix(10.75, 42.25) ==
+            [(data + t)[1, 1].tolist() for t in range(3)]).all()
+
+    executor.shutdown()
@@ -0,0 +1,178 @@
+import itertools
+import json
+import os
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.shutil import copy
+from rasterio.transform import from_origin
+
+from geonotebook.cache import LRUCache
+from geonotebook.wrappers import (file_reader,
+                                  multidim,
+                                  raster,
+                                  RasterData,
+                                  RasterDataCollection)
+from geonotebook.wrappers.pool import DatasetPool
+
+
+TIMES = [0, 31, 59]
+
+
+def _write_zarr_array(root, name, data, chunks, dims, fill_value=None):
+    # An uncompressed Zarr (v2) array,  see
+    # https://zarr.readthedocs.io/en/stable/spec/v2.html
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    with open(os.path.join(path, '.zarray'), 'w') as fh:
+        json.dump({'zarr_format': 2, 'shape': list(data.shape),
+                   'chunks': list(chunks), 'dtype': data.dtype.str,
+                   'compressor': None, 'fill_value': fill_value,
+                   'order': 'C', 'filters': None}, fh)
+    with open(os.path.join(path, '.zattrs'), 'w') as fh:
+        json.dump({'_ARRAY_DIMENSIONS': dims}, fh)
+
+    for starts in itertools.product(*[range(0, s, c) for s, c in
+                                      zip(data.shape, chunks)]):
+        chunk = np.zeros(chunks, dtype=data.dtype)
+        values = data[tuple(slice(s, s + c) for s, c in zip(starts, chunks))]
+        chunk[tuple(slice(0, n) for n in values.shape)] = values
+
+        key = '.'.join(str(s // c) for s, c in zip(starts, chunks))
+        with open(os.path.join(path, key), 'wb') as fh:
+            fh.write(chunk.tobytes())
+
+
+@pytest.fixture
+def data(monkeypatch):
+    for scheme in ('netcdf', 'zarr'):
+        monkeypatch.setitem(raster.RasterData._concrete_schema,
+                            scheme, multidim.MultidimIOReader)
+    monkeypatch.setitem(raster.RasterData._concrete_schema,
+                        'file', file_reader.FileIOReader)
+    monkeypatch.setitem(file_reader._file_readers,
+                        'nc', multidim.VariableReader)
+    monkeypatch.setattr(file_reader, 'block_cache', LRUCache(16 * 1024 ** 2))
+    monkeypatch.setattr(file_reader, 'dataset_pool', DatasetPool())
+
+    data = np.arange(3 * 20 * 30, dtype=np.float32).reshape(3, 20, 30)
+    data[1, :2, :2] = -9999.0
+    return data
+
+
+@pytest.fixture
+def zarr(tmpdir, data):
+    root = str(tmpdir.join('data.zarr'))
+    os.makedirs(root)
+    with open(os.path.join(root, '.zgroup'), 'w') as fh:
+        json.dump({'zarr_format': 2}, fh)
+
+    _write_zarr_array(root, 'tas', data, (1, 10, 15),
+                      ['time', 'y', 'x'], -9999.0)
+    _write_zarr_array(root, 'pr', data * 2, (3, 20, 30),
+                      ['time', 'y', 'x'], -9999.0)
+    _write_zarr_array(root, 'time', np.array(TIMES, dtype='<f8'), (3,),
+                      ['time'])
+    _write_zarr_array(root, 'x', np.arange(30, dtype='<f8') * 0.5 + 10.25,
+                      (30,), ['x'])
+    _write_zarr_array(root, 'y', 43 - np.arange(20, dtype='<f8') * 0.5 - 0.25,
+                      (20,), ['y'])
+
+    return 'zarr://' + root
+
+
+@pytest.fixture
+def netcdf(tmpdir, data):
+    tif, path = str(tmpdir.join('data.tif')), str(tmpdir.join('data.nc'))
+    with rasterio.open(tif, 'w', driver='GTiff', count=3, dtype='float32',
+                       width=30, height=20, nodata=-9999.0, crs='EPSG:4326',
+                       transform=from_origin(10.0, 43.0, 0.5, 0.5)) as dst:
+        dst.write(data)
+        # Written by the netCDF driver as a time dimension
+        dst.update_tags(NETCDF_DIM_EXTRA='{time}',
+                        NETCDF_DIM_time_DEF='{3,6}',
+                        NETCDF_DIM_time_VALUES='{0,31,59}')
+        for index, time in enumerate(TIMES, 1):
+            dst.update_tags(index, NETCDF_DIM_time=str(time),
+                            NETCDF_VARNAME='tas')
+
+    copy(tif, path, driver='netCDF', FORMAT='NC4')
+    return 'file://' + path
+
+
+def test_variables(zarr):
+    assert set(multidim.variables(zarr)) == {'tas', 'pr', 'time', 'x', 'y'}
+
+    with pytest.raises(ValueError):
+        RasterData(zarr).count
+
+
+def test_variable_reader(zarr, data):
+    rd = RasterData(multidim.make_uri(zarr, 'tas'))
+
+    assert rd.count == 3
+    assert rd.reader.metadata['block_shapes'] == [[10, 15]] * 3
+    assert rd.reader.metadata['steps'] == [[['time', str(t)]] for t in TIMES]
+    assert rd.shape.bounds == (10.0, 33.0, 25.0, 43.0)
+    assert (rd.get_data(masked=False) == np.moveaxis(data, 0, -1)).all()
+
+
+def test_from_variable(zarr, data):
+    rdc = RasterDataCollection.from_variable(zarr, 'tas')
+
+    assert len(rdc) == 3
+    assert rdc.get_names() == ['tas_time=0', 'tas_time=31', 'tas_time=59']
+    assert rdc[1].count == 1
+
+    expected = np.ma.masked_equal(data, -9999.0)
+    result = rdc.get_data()
+    assert (result.mask == expected.mask).all()
+    assert (result == expected).all()
+
+    assert (rdc[2].get_data(window=((5, 12), (15, 22))) ==
+            data[2, 5:15, 12:22]).all()
+    assert rdc[1].min == data[1][data[1] != -9999.0].min()
+    assert rdc.ix(10.3, 42.7).tolist() == [0, None, 1200]
+
+
+def test_steps_share_the_variable(zarr, data, mocker):
+    rdc = RasterDataCollection.from_variable(zarr, 'tas')
+    spy = mocker.spy(multidim.VariableReader, '_read_raw')
+
+    for rd in rdc:
+        rd.get_data()
+    opens, reads = file_reader.dataset_pool.opens, spy.call_count
+
+    # Moving between steps doesn't reopen the file or reread chunks
+    assert opens == 1
+    assert len(set(rd.reader.parent for rd in rdc)) == 1
+    for rd in rdc:
+        rd.get_data()
+    assert RasterData(rdc[0].uri).get_data().shape == (20, 30)
+    assert file_reader.dataset_pool.opens == opens
+    assert spy.call_count == reads
+
+
+def test_netcdf_file(netcdf, data):
+    rd = RasterData(netcdf)
+
+    assert rd.count == 3
+    assert rd.reader.crs == 'EPSG:4326'
+    assert (rd.get_data(masked=False) == np.moveaxis(data, 0, -1)).all()
+
+    rdc = RasterDataCollection.from_variable(netcdf)
+    assert rdc.get_names() == ['data_time=0', 'data_time=31', 'data_time=59']
+    assert (rdc[2].get_data() == data[2]).all()
+
+    named = RasterDataCollection.from_variable(netcdf, 'tas')
+    assert (named[0].get_data() == data[0]).all()
+
+
+def test_step_stats_read_only_the_step(zarr, data, mocker):
+    rdc = RasterDataCollection.from_variable(zarr, 'tas')
+    spy = mocker.spy(multidim.VariableReader, '_read_raw')
+
+    assert rdc[2].max == data[2].max()
+    assert spy.call_count > 0
+    assert all(call[0][1] == [3] for call in spy.call_args_list)
@@ -0,0 +1,86 @@
+import math
+
+import numpy as np
+
+
+def test_index_arrays(block_rd, block_rdc):
+    xs, ys = np.array([0.5, 6.2, -1.5]), np.array([[0.0], [4.9]])
+
+    rows, cols = block_rd.index(xs, ys)
+
+    assert rows.shape == cols.shape == (2, 3)
+    for (i, j), row in np.ndenumerate(rows):
+        assert (row, cols[i, j]) == block_rd.index(xs[j], ys[i, 0])
+
+    rows, cols = block_rdc.index(xs, ys[0], op=math.ceil)
+    assert rows.tolist() == [0, 0, 0]
+    assert cols.tolist() == [1, 7, -1]
+
+
+def test_ix_points(block_rd, block_datasets, block_expected):
+    expected = block_expected(block_datasets)[0]
+    xs, ys = np.array([0, 6, 2, 5, 1]), np.array([0, 4, 3, 0, 1])
+
+    data = block_rd.ix(xs, ys)
+
+    assert data.shape == (5, 2)
+    assert (data == expected[ys, xs]).all()
+    assert (data.mask == expected.mask[ys, xs]).all()
+
+
+def test_ix_points_single_band(block_rd, block_datasets):
+    data = block_rd[2].ix([0.5, 3.5], [0.5, 2.5])
+    assert data.shape == (2,)
+    assert (data == block_datasets['t0'].data[1, [0, 2], [0, 3]]).all()
+
+
+def test_ix_points_outside_are_masked(block_rd):
+    data = block_rd.ix([-1, 3, 7], [0, 10, 0])
+    assert data.mask.all()
+
+
+def test_ix_points_decode_each_block_once(block_rd, block_datasets):
+    # Two points in each of two blocks
+    block_rd.ix([0, 1, 4, 5], [0, 1, 2, 3])
+    assert sorted(block_datasets['t0'].reads) == [
+        ((0, 2), (0, 3)), ((2, 4), (3, 6))]
+
+
+def test_rdc_ix_points(block_rdc, block_datasets, block_expected):
+    expected = block_expected(block_datasets)
+    xs, ys = np.array([0, 6, 1, -5]), np.array([0, 4, 1, 0])
+
+    data = block_rdc.ix(xs, ys)
+
+    assert data.shape == (3, 4, 2)
+    assert (data[:, :3] == expected[:, ys[:3], xs[:3]]).all()
+    assert (data.mask[:, :3] == expected.mask[:, ys[:3], xs[:3]]).all()
+    assert data.mask[:, 3].all()
+
+
+def test_extract_points(block_rdc, block_datasets, block_expected):
+    expected = block_expected(block_datasets)
+    points = [(0, 0), (6, 4), (1, 1), (-5, 0)]
+
+    data, names = block_rdc.extract_points(points)
+
+    assert data.shape == (4, 3, 2)
+    assert names == ['t0', 't1', 't2']
+    for k, (x, y) in enumerate(points[:3]):
+        assert (data[k] == expected[:, y, x]).all()
+        assert (data.mask[k] == expected.mask[:, y, x]).all()
+    assert data.mask[3].all()
+
+
+def test_extract_points_single_band(block_rdc, block_datasets):
+    data, _ = block_rdc[:, 1].extract_points(np.array([[2, 3], [4, 1]]))
+
+    assert data.shape == (2, 3, 1)
+    assert (data[0, :, 0] == [block_datasets['t{}'.format(t)].data[0, 3, 2]
+                              for t in range(3)]).all()
+
+
+def test_extract_points_reads_each_block_once(block_rdc, block_datasets):
+    block_rdc.extract_points([(0, 0), (1, 1), (2, 0)])
+    for dataset in block_datasets.values():
+        assert dataset.reads == [((0, 2), (0, 3))]
@@ -0,0 +1,100 @@
+from concurrent.futures import wait
+import threading
+
+import pytest
+
+from geonotebook.vis.ktile.scheduler import TileScheduler
+
+
+@pytest.fixture
+def scheduler():
+    return TileScheduler(workers=1)
+
+
+def _hold(scheduler, kernel_id='hold'):
+    # Keep the only worker busy until the returned event is set
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    future = scheduler.submit(kernel_id, 0, block)
+    started.wait(5)
+    return future, release
+
+
+def test_scheduler_renders(scheduler):
+    future = scheduler.submit('k', 3, lambda x, y: x + y, 1, 2)
+    assert future.result(5) == 3
+
+    def fail():
+        raise ValueError('bad tile')
+
+    with pytest.raises(ValueError):
+        scheduler.submit('k', 3, fail).result(5)
+
+
+def test_scheduler_is_fair_between_kernels(scheduler):
+    held, release = _hold(scheduler)
+    order = []
+
+    futures = [scheduler.submit('a', 5, order.append, ('a', i))
+               for i in range(4)]
+    futures += [scheduler.submit('b', 5, order.append, ('b', i))
+                for i in range(2)]
+
+    release.set()
+    wait(futures, 5)
+
+    assert order == [('a', 0), ('b', 0), ('a', 1), ('b', 1),
+                     ('a', 2), ('a', 3)]
+
+
+def test_scheduler_prefers_current_zoom(scheduler):
+    held, release = _hold(scheduler, 'k')
+    order = []
+
+    futures = [scheduler.submit('k', zoom, order.append, zoom)
+               for zoom in (4, 4, 5, 6, 6)]
+
+    release.set()
+    wait(futures, 5)
+
+    assert order == [6, 6, 4, 4, 5]
+
+
+def test_scheduler_drops_cancelled(scheduler):
+    held, release = _hold(scheduler)
+    rendered = []
+
+    dropped = scheduler.submit('k', 1, rendered.append, 'dropped')
+    kept = scheduler.submit('k', 1, rendered.append, 'kept')
+    assert scheduler.stats('k')['queued'] == 2
+
+    assert dropped.cancel()
+    assert scheduler.stats('k')['queued'] == 1
+
+    release.set()
+    kept.result(5)
+
+    assert rendered == ['kept']
+    assert scheduler.stats()['cancelled'] == 1
+
+
+def test_scheduler_stats(scheduler):
+    held, release = _hold(scheduler)
+    queued = [scheduler.submit('k', 1, lambda: None) for _ in range(3)]
+
+    stats = scheduler.stats()
+    assert stats['queued'] == 3 and stats['workers'] == 1
+
+    release.set()
+    wait(queued, 5)
+
+    stats = scheduler.stats('k')
+    assert stats['queued'] == 0 and stats['rendered'] == 3
+    assert stats['max_wait'] >= stats['mean_wait'] > 0
+
+    scheduler.forget('k')
+    assert scheduler.stats('k')['rendered'] == 0
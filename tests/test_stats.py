@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from geonotebook.wrappers.stats import (BandStats,
+                                        compute_stats,
+                                        read_sidecar,
+                                        write_sidecar)
+
+
+@pytest.fixture
+def bands():
+    data = np.random.RandomState(42).normal(10, 3, (2, 40, 30))
+    return np.ma.masked_values(np.where(data > 15, -9999.0, data), -9999.0)
+
+
+def test_streamed_stats_match_numpy(bands):
+    # Stream the bands in strips of 7 rows
+    chunks = (bands[:, r:r + 7, :] for r in range(0, 40, 7))
+    stats = compute_stats(chunks, [1, 2], 40 * 30)
+
+    for index, band in zip([1, 2], bands):
+        assert stats[index][BandStats.MIN] == band.min()
+        assert stats[index][BandStats.MAX] == band.max()
+        assert stats[index][BandStats.MEAN] == pytest.approx(band.mean())
+        assert stats[index][BandStats.STDDEV] == pytest.approx(band.std())
+        assert stats[index][BandStats.COUNT] == band.count()
+        assert stats[index][BandStats.VALID_PERCENT] == \
+            pytest.approx(100.0 * band.count() / band.size)
+
+
+def test_fully_masked_band():
+    band = np.ma.masked_all((1, 3, 3))
+    stats = compute_stats([band], [1], 9)
+
+    assert stats[1][BandStats.COUNT] == 0
+    assert stats[1][BandStats.MIN] is None
+
+
+def test_sidecar_round_trip(tmpdir, bands):
+    path = tmpdir.join('data.tif')
+    path.write('')
+
+    stats = compute_stats([bands], [1, 2], 40 * 30)
+    assert write_sidecar(str(path), stats)
+
+    assert read_sidecar(str(path)) == stats
+
+
+def test_sidecar_preserves_existing_metadata(tmpdir, bands):
+    path = tmpdir.join('data.tif')
+    path.write('')
+    tmpdir.join('data.tif.aux.xml').write(
+        '<PAMDataset><Metadata><MDI key="AREA_OR_POINT">Area</MDI>'
+        '</Metadata></PAMDataset>')
+
+    write_sidecar(str(path), compute_stats([bands], [1, 2], 40 * 30))
+
+    assert 'AREA_OR_POINT' in tmpdir.join('data.tif.aux.xml').read()
+    assert set(read_sidecar(str(path)).keys()) == {1, 2}
+
+
+def test_stale_sidecar_is_ignored(tmpdir, bands):
+    path = tmpdir.join('data.tif')
+    path.write('')
+    write_sidecar(str(path), compute_stats([bands], [1, 2], 40 * 30))
+
+    # Dataset rewritten after its statistics were computed
+    path.setmtime(tmpdir.join('data.tif.aux.xml').mtime() + 10)
+
+    assert read_sidecar(str(path)) == {}
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.warp import reproject, Resampling
+
+from geonotebook.cache import LRUCache
+from geonotebook.wrappers import file_reader, raster, RasterData, warp
+from geonotebook.wrappers.pool import DatasetPool
+
+
+@pytest.fixture
+def geotiff(tmpdir, monkeypatch):
+    monkeypatch.setitem(raster.RasterData._concrete_schema,
+                        'file', file_reader.RasterIOReader)
+    monkeypatch.setattr(file_reader, 'block_cache', LRUCache(16 * 1024 ** 2))
+    monkeypatch.setattr(file_reader, 'dataset_pool', DatasetPool())
+
+    data = np.random.RandomState(0).rand(2, 64, 96).astype(np.float32)
+    data[0, :4, :4] = -9999.0
+
+    path = str(tmpdir.join('data.tif'))
+    with rasterio.open(path, 'w', driver='GTiff', count=2, dtype='float32',
+                       width=96, height=64, tiled=True, blockxsize=16,
+                       blockysize=16, nodata=-9999.0, crs='EPSG:4326',
+                       transform=from_origin(-75.0, 43.0, 0.01, 0.01)) as dst:
+        dst.write(data)
+
+    return 'file://' + path, data
+
+
+def _expected(rd, data):
+    reader = rd.reader
+    out = np.empty((2, reader.height, reader.width), dtype=np.float32)
+    reproject(data, out, src_transform=from_origin(-75.0, 43.0, 0.01, 0.01),
+              src_crs=reader.src_crs, src_nodata=-9999.0,
+              dst_transform=reader.affine, dst_crs=reader.dst_crs,
+              dst_nodata=-9999.0, resampling=Resampling.nearest)
+    return np.ma.masked_equal(np.moveaxis(out, 0, -1), -9999.0)
+
+
+def test_warp_same_crs_is_identity(geotiff):
+    uri, data = geotiff
+    rd = RasterData(uri).warp('EPSG:4326')
+
+    assert rd.shape.bounds == RasterData(uri).shape.bounds
+    assert (rd.get_data() == np.ma.masked_equal(
+        np.moveaxis(data, 0, -1), -9999.0)).all()
+
+
+def test_warp_matches_reproject(geotiff):
+    uri, data = geotiff
+    rd = RasterData(uri).warp('EPSG:3857')
+
+    assert rd.reader.crs == 'EPSG:3857'
+    expected = _expected(rd, data)
+    result = rd.get_data()
+
+    assert result.shape == expected.shape
+    assert (result.mask == expected.mask).all()
+    assert (result == expected).all()
+
+
+def test_warp_window_and_resolution(geotiff):
+    uri, data = geotiff
+    rd = RasterData(uri).warp('EPSG:3857', resolution=2000)
+
+    assert rd.reader.res == (2000, 2000)
+    expected = _expected(rd, data)
+    window = ((1, 2), (3, 4))
+    assert (rd.get_data(window=window) == expected[1:3, 2:4]).all()
+
+
+def test_warped_view_is_cached(geotiff, mocker):
+    uri, _ = geotiff
+    rd = RasterData(uri)
+
+    assert rd.warp('EPSG:3857') is rd.warp('EPSG:3857')
+
+    spy = mocker.spy(warp, 'reproject')
+    first = rd.get_data(dst_crs='EPSG:3857')
+    calls = spy.call_count
+
+    # Warped blocks come from the block cache the second time around
+    assert (rd.get_data(dst_crs='EPSG:3857') == first).all()
+    assert spy.call_count == calls
+
+
+def test_collection_get_data_dst_crs(geotiff):
+    uri, data = geotiff
+    rdc = raster.RasterDataCollection([uri, uri])
+    expected = _expected(RasterData(uri).warp('EPSG:3857'), data)
+
+    result = rdc.get_data(dst_crs='EPSG:3857')
+    assert result.shape == (2,) + expected.shape
+    assert (result[1] == expected).all()
+
+
+def test_warp_ix(geotiff):
+    uri, data = geotiff
+    rd = RasterData(uri).warp('EPSG:3857')
+
+    x, y = rd.reader.affine * (10.5, 20.5)
+    assert rd.ix(x, y)[0] == _expected(rd, data)[20, 10, 0]
+
+
+def test_warp_bilinear_ignores_nodata(geotiff):
+    uri, _ = geotiff
+    result = RasterData(uri).get_data(dst_crs='EPSG:3857',
+                                      resampling='bilinear')
+
+    # Only band one's nodata corner is masked,  and it isn't blended in
+    assert result.min() >= 0
+    assert result[..., 0].mask.any()
+
+
+def test_warp_spill(geotiff):
+    uri, data = geotiff
+    rd = RasterData(uri).warp('EPSG:3857')
+
+    with rasterio.open(rd.reader.spill()) as src:
+        assert src.crs == rasterio.crs.CRS.from_string('EPSG:3857')
+        assert src.transform == rd.reader.affine
+        result = np.ma.masked_equal(np.moveaxis(src.read(), 0, -1), -9999.0)
+        assert (result == _expected(rd, data)).all()
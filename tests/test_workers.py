@@ -0,0 +1,101 @@
+import os
+
+from PIL import Image
+import pytest
+import six
+
+from geonotebook.vis.ktile import workers
+
+
+def _render(width, height):
+    # Encodes a tile as a render process would
+    buff = six.BytesIO()
+    Image.new('RGBA', (width, height), (255, 0, 0, 255)).save(buff, 'PNG')
+    return os.getpid(), buff.getvalue()
+
+
+# Layers known to the process,  as render processes keep their providers
+_known = set()
+
+
+def _render_known(key, args, config=None):
+    if key not in _known:
+        if config is None:
+            raise workers.UnknownLayerError(key)
+        _known.add(key)
+    return config is not None
+
+
+def _crash():
+    os._exit(1)
+
+
+@pytest.fixture
+def pool():
+    pool = workers.RenderPool(processes=2, fn=_render)
+    yield pool
+    pool.shutdown()
+
+
+def test_render_pool(pool):
+    pid, data = pool.render(4, 4)
+
+    assert pid != os.getpid()
+    assert Image.open(six.BytesIO(data)).size == (4, 4)
+
+
+def test_render_pool_survives_crashes(pool):
+    pool.render(4, 4)
+
+    pool.fn = _crash
+    with pytest.raises(RuntimeError):
+        pool.render()
+
+    pool.fn = _render
+    assert pool.render(2, 2)[0] != os.getpid()
+
+
+def test_render_layer_sends_config_once(mocker):
+    pool = workers.RenderPool(processes=1, fn=_render_known)
+    config = mocker.Mock(return_value={'kwargs': {}})
+
+    try:
+        assert pool.render_layer('layer', config, ())
+        assert not pool.render_layer('layer', config, ())
+        assert config.call_count == 1
+    finally:
+        pool.shutdown()
+
+
+def test_render_tile_unknown_layer():
+    with pytest.raises(workers.UnknownLayerError):
+        workers.render_tile('unknown', ())
+
+
+def test_encoded_image():
+    data = _render(8, 4)[1]
+    image = workers.EncodedImage(data)
+
+    buff = six.BytesIO()
+    image.save(buff, 'png')
+    assert buff.getvalue() == data
+
+    # Other formats, and anything else TileStache does with images,
+    # go through PIL
+    buff = six.BytesIO()
+    image.convert('RGB').save(buff, 'JPEG')
+    assert Image.open(buff).format == 'JPEG'
+    assert image.size == (8, 4)
+
+
+def test_set_backend(monkeypatch):
+    monkeypatch.setattr(workers, 'render_pool', None)
+
+    workers.set_backend('process', 3)
+    assert workers.render_pool.processes == 3
+
+    workers.set_backend('thread')
+    assert workers.render_pool is None
+
+    with pytest.raises(NotImplementedError):
+        workers.set_backend('cluster')
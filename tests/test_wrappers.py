@@ -2,7 +2,8 @@ import numpy as np
 import pytest
 
 from geonotebook.annotations import Rectangle
-from geonotebook.wrappers import RasterData, RasterDataCollection
+from geonotebook.wrappers import raster, RasterData, RasterDataCollection
+from geonotebook.wrappers.executor import ReadExecutor
 
 from . import wrappers_data
 from .conftest import enable_mock
@@ -322,3 +323,80 @@ def test_rdc_index(rdc_rect, mocker):
     idx = mocker.spy(RasterData, 'index')
     assert rdc_rect.index(0, 0) == (0, 0)
     assert idx.call_count == 1
+
+
+def test_get_data_over_read_budget(rect):
+    # rect is 2 bands of 3x5 float64 pixels,  240 bytes
+    with pytest.raises(RuntimeError):
+        rect.get_data(max_bytes=100)
+
+    assert rect.get_data(max_bytes=240).shape == (5, 3, 2)
+    assert rect.get_data(max_bytes=0).shape == (5, 3, 2)
+
+
+def test_read_shape(rect):
+    assert rect.read_shape() is None
+    assert rect.read_shape(out_shape=(1, 2)) == (1, 2)
+    assert rect.read_shape(max_bytes=100, downsample=True) == (1, 3)
+
+
+def test_read_budget_downsample_default(rect, monkeypatch):
+    monkeypatch.setattr(RasterData, 'downsample_large_reads', True)
+    monkeypatch.setattr(RasterData, 'max_read_bytes', 100)
+    assert rect.read_shape() == (1, 3)
+
+
+def test_rdc_get_data_over_read_budget(rdc_rect):
+    # Budget applies to all three time steps together
+    with pytest.raises(RuntimeError):
+        rdc_rect.get_data(max_bytes=500)
+
+    assert rdc_rect.get_data(max_bytes=720).shape == (3, 5, 3, 2)
+
+
+def test_getitem_views_are_memoized(coords):
+    assert coords[1] is coords[1]
+    assert coords[[1, 2]] is coords[[1, 2]]
+    assert coords[1].reader is coords.reader
+
+
+def test_rdc_getitem_views_are_memoized(rdc_rect):
+    assert rdc_rect[0] is rdc_rect[0]
+    assert rdc_rect[0, 1] is rdc_rect[0, [1]]
+    assert list(rdc_rect)[1] is rdc_rect[1]
+
+
+@pytest.mark.parametrize('kind', ['serial', 'thread'])
+def test_rdc_executors(rdc_rect, monkeypatch, kind):
+    monkeypatch.setattr(raster, 'read_executor', ReadExecutor(kind, 2))
+
+    assert (rdc_rect.get_data() == wrappers_data.rdc_get_data).all()
+    assert (rdc_rect.ix(0, 0) == [[100., 2.],
+                                  [200., 2.],
+                                  [300., 2.]]).all()
+
+
+def test_get_data_out(rect):
+    # Mock readers don't support out=,  their result is copied into it
+    out = np.empty_like(rect.get_data().data)
+    data = rect.get_data(out=out)
+
+    assert np.may_share_memory(data, out)
+    assert (data == rect.get_data()).all()
+
+
+def test_rdc_get_data_out(rdc_rect):
+    expected = rdc_rect.get_data()
+    out = np.ma.MaskedArray(np.empty_like(expected.data),
+                            mask=np.empty(expected.shape, dtype=bool))
+
+    assert rdc_rect.get_data(out=out) is out
+    assert (out == wrappers_data.rdc_get_data).all()
+    assert (out.mask == expected.mask).all()
+
+
+def test_ix_points_fallback(coords):
+    # Mock readers have no sample(), points are sampled one at a time
+    data = coords.ix([0, 0], [0, 0])
+    assert data.shape == (2, len(coords))
+    assert (data[0] == coords.ix(0, 0)).all()
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+from shapely.geometry import box, mapping
+
+from geonotebook.wrappers import zonal
+
+
+# Zones in pixel coordinates,  the block datasets have an identity transform
+ZONES = [box(1, 1, 4, 3), box(4, 0, 7, 5), box(0, 3, 2, 5)]
+SLICES = [(slice(1, 3), slice(1, 4)),
+          (slice(0, 5), slice(4, 7)),
+          (slice(3, 5), slice(0, 2))]
+
+
+def _expected(data, stat):
+    # data is (..., rows, cols, bands),  returns (zones, ..., bands)
+    values = []
+    for rows, cols in SLICES:
+        zone = data[..., rows, cols, :]
+        axes = (-3, -2)
+        if stat == 'count':
+            values.append(zone.count(axis=axes))
+        else:
+            values.append(getattr(zone, stat)(axis=axes))
+    return np.ma.stack(values)
+
+
+@pytest.mark.parametrize('stat', zonal.STATS)
+def test_zonal_stats(block_rd, block_datasets, stat, block_expected):
+    result = block_rd.zonal_stats(ZONES)
+    expected = _expected(block_expected(block_datasets)[0], stat)
+
+    assert result[stat].shape == (3, 2)
+    assert np.allclose(result[stat], expected)
+
+
+def test_zonal_stats_single_band(block_rd, block_datasets, block_expected):
+    result = block_rd[2].zonal_stats(ZONES, stats=['mean'])
+    expected = _expected(block_expected(block_datasets)[0], 'mean')
+
+    assert list(result) == ['mean']
+    assert np.allclose(result['mean'], expected[:, 1])
+
+
+@pytest.mark.parametrize('stat', zonal.STATS)
+def test_zonal_stats_collection(block_rdc, block_datasets, stat,
+                                block_expected):
+    result = block_rdc.zonal_stats(ZONES)
+    expected = _expected(block_expected(block_datasets), stat)
+
+    assert result[stat].shape == (3, 3, 2)
+    assert np.allclose(result[stat], expected)
+
+
+def test_zonal_stats_reads_each_strip_once(block_rdc, block_datasets,
+                                           monkeypatch):
+    # Strips of a single block row
+    monkeypatch.setattr(zonal.file_reader, 'CHUNK_SIZE', 1)
+    block_rdc.zonal_stats(ZONES)
+
+    for dataset in block_datasets.values():
+        assert len(dataset.reads) == len(set(dataset.reads))
+        assert sorted(set(rows for rows, _ in dataset.reads)) == \
+            [(0, 2), (2, 4), (4, 5)]
+
+
+def test_zonal_stats_geometries(block_rd):
+    expected = block_rd.zonal_stats(ZONES)['mean']
+
+    assert np.allclose(
+        block_rd.zonal_stats([mapping(z) for z in ZONES])['mean'], expected)
+    features = [{'type': 'Feature', 'properties': {}, 'geometry': mapping(z)}
+                for z in ZONES]
+    assert np.allclose(block_rd.zonal_stats(features)['mean'], expected)
+    assert np.allclose(block_rd.zonal_stats(ZONES[0])['mean'], expected[:1])
+
+
+@pytest.mark.parametrize('all_touched', [False, True])
+def test_zonal_stats_overlapping(block_rd, all_touched):
+    # The second zone covers the first,  the third overlaps both
+    zones = [box(1, 1, 4, 3), box(0, 0, 7, 5), box(2, 2, 6, 4)]
+    result = block_rd.zonal_stats(zones, all_touched=all_touched)
+
+    for z, zone in enumerate(zones):
+        alone = block_rd.zonal_stats(zone, all_touched=all_touched)
+        for stat in zonal.STATS:
+            assert np.allclose(result[stat][z], alone[stat][0])
+
+
+def test_zonal_stats_outside_and_masked(block_rd, block_datasets):
+    block_datasets['t0'].data[:, 1:3, 1:4] = -9999.0
+    result = block_rd.zonal_stats([ZONES[0], box(20, 20, 30, 30)])
+
+    assert (result['count'] == 0).all()
+    assert result['mean'].mask.all()
+    assert result['min'].mask.all()
+    assert (result['sum'] == 0).all()
+
+
+def test_zonal_stats_histogram(block_rd, block_datasets, block_expected):
+    edges = [0, 10, 20, 30, 80]
+    result = block_rd.zonal_stats(ZONES, bins=edges)
+    data = block_expected(block_datasets)[0]
+
+    assert result['histogram'].shape == (3, 2, 4)
+    assert (result['bin_edges'] == edges).all()
+    for z, (rows, cols) in enumerate(SLICES):
+        for b in range(2):
+            values = data[rows, cols, b].compressed()
+            assert (result['histogram'][z, b] ==
+                    np.histogram(values, bins=edges)[0]).all()
+
+
+def test_zonal_stats_invalid_stat(block_rd):
+    with pytest.raises(ValueError):
+        block_rd.zonal_stats(ZONES, stats=['median'])